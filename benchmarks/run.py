@@ -0,0 +1,164 @@
+"""Executor benchmark: the goals in benchmarks/goals against a local static copy of
+their sites (benchmarks/site), planned by the deterministic mock LLM provider, so the
+numbers measure core.executor / core.healer overhead rather than the network or a model.
+
+    python -m benchmarks.run [--iterations 3] [--latency-ms 0] [--jitter-ms 0] [--goal NAME]
+                             [--async] [--headed] [--plan-cache] [--capture SPEC]
+                             [--out runs/bench/<ts>] [--baseline FILE] [--tolerance 0.2]
+
+Per goal and iteration it records wall time and the per-phase self times of the run
+(launch, plan, resolve, act, screenshot, assert, report; core.phases), prints the
+medians and writes them to <out>/bench.json. With --baseline (a previous bench.json)
+it exits 1 when a phase median grew by more than --tolerance and BENCH_MIN_DELTA_MS.
+"""
+import os, sys, json, time, asyncio, argparse, statistics, threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+_MIN_DELTA_MS = float(os.getenv("BENCH_MIN_DELTA_MS", "50"))
+
+def _args():
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    ap.add_argument("--iterations", type=int, default=3)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="simulated model latency per call")
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--goal", action="append", help="only goals whose file name contains this")
+    ap.add_argument("--async", dest="use_async", action="store_true")
+    ap.add_argument("--headed", action="store_true")
+    ap.add_argument("--plan-cache", action="store_true", help="keep the plan cache on (off: every step is planned)")
+    ap.add_argument("--capture", default=None)
+    ap.add_argument("--out", default=os.path.join("runs", "bench", time.strftime("%Y%m%d_%H%M%S")))
+    ap.add_argument("--baseline")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    return ap.parse_args()
+
+def _isolate(out, a):
+    """Mock provider + fresh state stores, set before core modules read their env."""
+    state = os.path.join(out, "state")
+    os.environ.update({
+        "LLM_PROVIDER": "mock",
+        "MOCK_LLM_PLANS": os.path.join(HERE, "plans.json"),
+        "MOCK_LLM_LATENCY_MS": str(a.latency_ms),
+        "MOCK_LLM_JITTER_MS": str(a.jitter_ms),
+        "PLAN_CACHE": "1" if a.plan_cache else "0",
+        "PLAN_CACHE_PATH": os.path.join(state, "plan_cache.sqlite"),
+        "HEALER_STATS_PATH": os.path.join(state, "healer_stats.sqlite"),
+        "ALIASES_DB": os.path.join(state, "aliases.sqlite"),
+        "NOISE_RULES_PATH": os.path.join(state, "noise_rules.sqlite"),
+        "TIMINGS_PATH": os.path.join(state, "timings.sqlite"),
+        "METRICS_PATH": os.path.join(state, "metrics.sqlite"),
+        "METRICS_PROM_PATH": os.path.join(out, "metrics", "playwright_use.prom"),
+        "METRICS_JSON_PATH": os.path.join(out, "metrics", "metrics.json"),
+        "REPLAY_DIR": os.path.join(state, "replay"),
+    })
+    os.makedirs(state, exist_ok=True)
+
+class _Quiet(SimpleHTTPRequestHandler):
+    def log_message(self, *a):
+        pass
+
+def serve_site():
+    """Serve benchmarks/site on an ephemeral localhost port; returns (server, base URL)."""
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), partial(_Quiet, directory=os.path.join(HERE, "site")))
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_address[1]}"
+
+def _goals(filters):
+    from core.util import load_goal_spec, goal_files
+    out = []
+    for path in goal_files(os.path.join(HERE, "goals")):
+        if not filters or any(f in os.path.basename(path) for f in filters):
+            out.append(load_goal_spec(path))
+    return out
+
+def _run_one(g, base, out_dir, a):
+    from core.reporter import write_report
+    url = base + g["url"]
+    opts = {"capture": a.capture} if a.capture else {}
+    started = time.time()
+    t0 = time.perf_counter()
+    if a.use_async:
+        from core.async_executor import run_goal as run_goal_async
+        out_dir, srec, arec = asyncio.run(run_goal_async(g["name"], url, g["steps"], g["assertions"],
+                                                         headless=not a.headed, out_dir=out_dir, **opts))
+    else:
+        from core.executor import run_goal
+        out_dir, srec, arec = run_goal(g["name"], url, g["steps"], g["assertions"],
+                                       headless=not a.headed, out_dir=out_dir, **opts)
+    write_report(out_dir, g["name"], url, started, srec, arec)
+    wall = (time.perf_counter() - t0) * 1000.0
+    with open(os.path.join(out_dir, "report.json"), "r", encoding="utf-8") as f:
+        phases = json.load(f).get("phases") or {}
+    green = all(r["status"] == "pass" for r in srec) and all(r["passed"] for r in arec)
+    return {"wall_ms": round(wall, 1), "green": green, "phases": phases}
+
+def _median(runs, key):
+    vals = [r["phases"].get(key, 0.0) if key != "wall_ms" else r["wall_ms"] for r in runs]
+    return round(statistics.median(vals), 1) if vals else 0.0
+
+def summarize(results):
+    """{goal: {wall_ms, <phase>: median ms, green: all iterations green}}."""
+    from core.phases import PHASES
+    out = {}
+    for name, runs in results.items():
+        row = {"wall_ms": _median(runs, "wall_ms")}
+        row.update({p: _median(runs, p) for p in PHASES})
+        row["green"] = all(r["green"] for r in runs)
+        out[name] = row
+    return out
+
+def regressions(summary, baseline, tolerance):
+    bad = []
+    for name, row in summary.items():
+        old = baseline.get(name) or {}
+        for k, v in row.items():
+            if k == "green" or not isinstance(old.get(k), (int, float)):
+                continue
+            if v > old[k] * (1 + tolerance) and v - old[k] > _MIN_DELTA_MS:
+                bad.append(f"{name} {k}: {old[k]:.0f} -> {v:.0f} ms")
+    return bad
+
+def _table(summary):
+    from core.phases import PHASES
+    cols = ["wall_ms", *PHASES]
+    width = max([len(n) for n in summary] + [4])
+    lines = [f"{'goal':<{width}} " + " ".join(f"{c:>10}" for c in cols) + "  green"]
+    for name, row in summary.items():
+        lines.append(f"{name:<{width}} " + " ".join(f"{row[c]:>10.0f}" for c in cols) + f"  {row['green']}")
+    return "\n".join(lines)
+
+def main():
+    a = _args()
+    _isolate(a.out, a)
+    sys.path.insert(0, os.path.dirname(HERE))
+    srv, base = serve_site()
+    try:
+        goals = _goals(a.goal)
+        results = {g["name"]: [] for g in goals}
+        for it in range(1, a.iterations + 1):
+            for g in goals:
+                out_dir = os.path.join(a.out, f"{g['name'].replace(' ', '_')}_{it}")
+                results[g["name"]].append(_run_one(g, base, out_dir, a))
+    finally:
+        srv.shutdown()
+    summary = summarize(results)
+    from core.llm import get_provider
+    meta = {"iterations": a.iterations, "latency_ms": a.latency_ms, "jitter_ms": a.jitter_ms, "async": a.use_async,
+            "plan_cache": a.plan_cache, "llm_calls": get_provider("mock").calls}
+    with open(os.path.join(a.out, "bench.json"), "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "summary": summary, "runs": results}, f, indent=2)
+    print(_table(summary))
+    print(f"\nmedian ms over {a.iterations} iteration(s); mock LLM calls: {meta['llm_calls']}; "
+          f"details: {os.path.join(a.out, 'bench.json')}")
+    code = 0 if all(r["green"] for r in summary.values()) else 2
+    if a.baseline:
+        with open(a.baseline, "r", encoding="utf-8") as f:
+            bad = regressions(summary, json.load(f).get("summary") or {}, a.tolerance)
+        for b in bad:
+            print(f"REGRESSION {b}")
+        code = code or (1 if bad else 0)
+    sys.exit(code)
+
+if __name__ == "__main__":
+    main()
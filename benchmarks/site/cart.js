@@ -0,0 +1,6 @@
+const cart = {
+  items() { return JSON.parse(sessionStorage.getItem('cart') || '[]'); },
+  add(name) { const it = this.items(); it.push(name); sessionStorage.setItem('cart', JSON.stringify(it)); this.badge(); },
+  badge() { const b = document.getElementById('badge'); if (b) b.textContent = this.items().length || ''; },
+};
+cart.badge();
@@ -0,0 +1,312 @@
+import os, re, time, asyncio
+
+# ---- deterministic assertion engine ----
+# Goal assertions in plain English are compiled into predicates where the wording
+# allows it (URL/title contains, page shows text, input value, element text, element
+# count) and evaluated against the live page: one evaluate per frame for all compiled
+# assertions together, re-polled until they hold or ASSERT_TIMEOUT_MS passes (like
+# Playwright's expect). Claims that do not compile are left to the LLM oracle.
+ASSERT_TIMEOUT_MS = int(os.getenv("ASSERT_TIMEOUT_MS", "2000"))
+_POLL_S = 0.1
+
+_Q = r"""['"“‘](?P<{}>.+?)['"”’]"""
+_NEG = r"(?P<neg>does not |doesn't |do not |don't |is not |isn't |no longer )?"
+_NUMS = {"no": 0, "zero": 0, "one": 1, "a": 1, "an": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+         "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10}
+
+# subject [not] verb [modifiers] 'value'
+_SVO = re.compile(
+    r"^(?P<subj>.+?)\s+" + _NEG +
+    r"(?P<verb>contains?|includes?|has|have|shows?|displays?|reads?|equals?|is|are|starts with|ends with)\s+"
+    r"(?P<mods>(?:(?:the|an?|exact|exactly|text|value|word|words|message|phrase|label|equal to|set to|string)\s+)*)"
+    + _Q.format("value") + r"$", re.I)
+# URL contains x (quotes optional, as the executor always accepted)
+_URL = re.compile(r"^(?:the )?(?:current )?url " + _NEG + r"(?:contains|includes) (?P<value>.+)$", re.I)
+# 'text' is [not] visible / shown / displayed / present
+_VISIBLE = re.compile(
+    r"^(?:the\s+)?(?:(?P<kind>text|message|button|link|heading|tab|element)\s+)?" + _Q.format("value") +
+    r"\s+(?P<neg>is not |isn't |are not |aren't )?(?:is |are )?(?:visible|shown|displayed|present)(?: on the page)?$", re.I)
+# there are [exactly|at least|at most] N elements matching 'css'
+_COUNT = re.compile(
+    r"^there (?:is|are) (?P<cmp>exactly |at least |at most |more than |fewer than |less than )?(?P<n>\d+|\w+) "
+    r"(?:elements?|items?|matches|nodes?)(?: matching| for)? " + _Q.format("sel") + r"$", re.I)
+# 'css' appears/matches [exactly|at least|at most] N times
+_COUNT2 = re.compile(
+    r"^" + _Q.format("sel") + r" (?:appears|matches|occurs|is present|exists) "
+    r"(?P<cmp>exactly |at least |at most |more than |fewer than |less than )?(?P<n>\d+|\w+) times?$", re.I)
+
+_KIND_SEL = {
+    "button": "button, [role=button], input[type=submit], input[type=button]",
+    "link": "a, [role=link]",
+    "heading": "h1, h2, h3, h4, h5, h6, [role=heading]",
+    "header": "h1, h2, h3, h4, h5, h6, [role=heading]",
+    "tab": "[role=tab]",
+    "alert": "[role=alert], [role=status], .alert, .toast",
+    "error message": "[role=alert], .error, .invalid-feedback, [aria-invalid=true] ~ *",
+}
+_FIELD = re.compile(r"\b(input|field|text ?box|textarea|search box|text area)\b", re.I)
+_PAGE = re.compile(r"^(?:the\s+)?(?:(?:final|current|resulting|last|whole|)\s*)?(?:page|screen|site|body|document|view)"
+                   r"(?:\s+(?:body|content|text))?$", re.I)
+_CSS = re.compile(r"^[#.\[]|^[a-z][a-z0-9-]*(?:[#.\[:\s>]|$)", re.I)
+# "... inside the single iframe" / "in the nested iframe" / "in the 'SingleFrame' frame" /
+# "in the frame named 'x'" / "in the iframe with src 'x.html'": the claim is checked in
+# that frame only. single/child/outer = a direct child of the page (depth 1),
+# nested/inner = a frame inside a child frame (depth 2).
+_FRAME = re.compile(
+    r"\s*\b(?:in|inside|within|of|on)\s+(?:the\s+|an?\s+)?(?:" + _Q.format("fname") + r"\s+)?"
+    r"(?:(?P<which>single|child|outer|top-level|first-level|nested|inner|innermost)\s+)?i?frame\b"
+    r"(?P<nest>\s+(?:with ?in|within|inside|in)\s+(?:an?|the|another)\s+i?frame\b)?"
+    r"(?:\s+(?P<how>named|called|with name|with src|with source|whose src contains|loading)\s+" + _Q.format("fval") + r")?",
+    re.I)
+_FRAME_DEPTH = {"single": 1, "child": 1, "outer": 1, "top-level": 1, "first-level": 1,
+                "nested": 2, "inner": 2, "innermost": 2}
+
+def _frame_scope(subj):
+    """(subject without the frame phrase, frame spec) or (subj, None) if no frame is named;
+    the spec is False when a frame is named in a way we cannot pin down."""
+    if not re.search(r"\bi?frames?\b", re.sub(_Q.format("q"), "", subj), re.I):
+        return subj, None
+    m = _FRAME.search(subj)
+    if not m:
+        return subj, False
+    rest = (subj[:m.start()] + subj[m.end():]).strip()
+    if re.search(r"\bi?frames?\b", re.sub(_Q.format("q"), "", rest), re.I):
+        return subj, False
+    how = (m.group("how") or "").lower()
+    if m.group("fval") and ("src" in how or how == "loading"):
+        return rest, {"src": m.group("fval")}
+    if m.group("fval") or m.group("fname"):
+        return rest, {"name": m.group("fval") or m.group("fname")}
+    if m.group("nest"):
+        return rest, {"depth": 2}
+    return rest, {"depth": _FRAME_DEPTH.get((m.group("which") or "single").lower(), 1)}
+
+def _count(n):
+    n = n.strip().lower()
+    return int(n) if n.isdigit() else _NUMS.get(n)
+
+def _cmp(word):
+    return {"exactly": "==", "at least": ">=", "at most": "<=", "more than": ">", "fewer than": "<",
+            "less than": "<"}.get((word or "").strip().lower(), "==")
+
+def compile_claim(text):
+    """Predicate dict for an assertion, or None if it needs the LLM oracle."""
+    claim = re.sub(r"\s+", " ", (text or "").strip()).rstrip(".")
+    m = _URL.match(claim)
+    if m:
+        return {"kind": "url", "op": "contains", "value": m.group("value").strip(" '\"“”‘’"), "neg": bool(m.group("neg"))}
+    m = _COUNT.match(claim) or _COUNT2.match(claim)
+    if m:
+        n = _count(m.group("n"))
+        return None if n is None else {"kind": "count", "sel": m.group("sel"), "cmp": _cmp(m.group("cmp")), "n": n}
+    m = _VISIBLE.match(claim)
+    if m:
+        kind = (m.group("kind") or "text").lower()
+        if kind in ("text", "message"):
+            return {"kind": "text", "value": m.group("value"), "neg": bool(m.group("neg"))}
+        sel = _KIND_SEL.get(kind) or "*"
+        return {"kind": "element", "sel": sel, "value": m.group("value"), "neg": bool(m.group("neg")), "visible": True}
+    m = _SVO.match(claim)
+    if not m:
+        return None
+    subj = m.group("subj").strip()
+    verb, mods = m.group("verb").lower(), m.group("mods").lower()
+    pred = {"value": m.group("value"), "neg": bool(m.group("neg"))}
+    exact = "exact" in mods or verb in ("is", "are", "equals", "equal", "reads", "read") or re.search(r"(equal|set) to", mods)
+    op = "starts" if verb == "starts with" else "ends" if verb == "ends with" else "equals" if exact else "contains"
+    subj, frame = _frame_scope(subj)
+    if frame is False:
+        return None  # names a frame we cannot pin down; the oracle can
+    if frame:
+        pred["frame"] = frame
+    sl = subj.lower()
+    quoted = re.search(_Q.format("q"), subj)
+    if re.fullmatch(r"(?:the )?(?:current |page |browser )?url", sl):
+        return dict(pred, kind="url", op=op)
+    if re.fullmatch(r"(?:the )?(?:page |document |browser |tab )?title", sl):
+        return dict(pred, kind="title", op=op)
+    if _FIELD.search(sl):
+        return dict(pred, kind="value", op=op, label=quoted.group("q") if quoted else None)
+    if _PAGE.match(sl):
+        return dict(pred, kind="text", op="contains")
+    if quoted and _CSS.match(quoted.group("q")) and re.search(r"\b(element|selector)\b", sl):
+        return dict(pred, kind="element", sel=quoted.group("q"), op=op, visible=False)
+    base = re.sub(r"^(?:the|a|an) ", "", sl)
+    if base in _KIND_SEL:
+        return dict(pred, kind="element", sel=_KIND_SEL[base], op=op, visible=True)
+    return None
+
+# Collects raw facts for every predicate in one pass over a frame's document;
+# matching happens in Python so sync and async share it.
+_FACTS_JS = r"""
+(preds) => {
+  const norm = (s) => String(s || '').replace(/\s+/g, ' ').trim();
+  const visible = (el) => {
+    const r = el.getBoundingClientRect();
+    if (!r.width || !r.height) return false;
+    const cs = getComputedStyle(el);
+    return cs.visibility !== 'hidden' && cs.display !== 'none';
+  };
+  const labelOf = (el) => {
+    const parts = [el.getAttribute('aria-label'), el.getAttribute('placeholder'), el.name, el.id];
+    if (el.labels) for (const l of el.labels) parts.push(l.textContent);
+    const lb = el.getAttribute('aria-labelledby');
+    if (lb) for (const i of lb.split(/\s+/)) parts.push((document.getElementById(i) || {}).textContent);
+    return norm(parts.filter(Boolean).join(' | ')).toLowerCase();
+  };
+  let bodyText = null;
+  const body = () => bodyText !== null ? bodyText : (bodyText = norm(document.body ? document.body.innerText : ''));
+  return preds.map((p) => {
+    try {
+      if (p.kind === 'title') return {title: document.title};
+      if (p.kind === 'text') return {has: body().toLowerCase().includes(norm(p.value).toLowerCase())};
+      if (p.kind === 'value') {
+        const values = [];
+        for (const el of document.querySelectorAll('input, textarea, select, [contenteditable=""], [contenteditable=true]')) {
+          if (['hidden', 'checkbox', 'radio', 'submit', 'button'].includes((el.type || '').toLowerCase())) continue;
+          if (p.label && !labelOf(el).includes(norm(p.label).toLowerCase())) continue;
+          values.push(String(el.isContentEditable ? el.innerText : (el.value ?? '')));
+          if (values.length >= 50) break;
+        }
+        return {values};
+      }
+      if (p.kind === 'element' || p.kind === 'count') {
+        const texts = []; let count = 0;
+        for (const el of document.querySelectorAll(p.sel)) {
+          if (p.visible && !visible(el)) continue;
+          count++;
+          if (p.kind === 'element' && texts.length < 50) texts.push(norm(el.innerText || el.textContent || el.value));
+        }
+        return {count, texts};
+      }
+    } catch (e) { return {error: String(e)}; }
+    return {};
+  });
+}
+"""
+
+def _match(op, have, want):
+    h, w = re.sub(r"\s+", " ", str(have or "")).strip(), re.sub(r"\s+", " ", str(want or "")).strip()
+    if op == "equals":
+        return h == w  # exact claims stay case-sensitive
+    h, w = h.lower(), w.lower()
+    if op == "starts":
+        return h.startswith(w)
+    if op == "ends":
+        return h.endswith(w)
+    return w in h
+
+def _short(values, n=5):
+    vals = [v if len(v) <= 80 else v[:80] + "…" for v in values[:n]]
+    return repr(vals) + (f" (+{len(values) - n} more)" if len(values) > n else "")
+
+def _in_scope(spec, info):
+    if "depth" in spec:
+        return info["depth"] == spec["depth"]
+    if "name" in spec:
+        return (info["name"] or "").lower() == spec["name"].lower()
+    return spec["src"].lower() in (info["url"] or "").lower()
+
+def _scope_str(spec):
+    k, v = next(iter(spec.items()))
+    return f"frame {k} {v!r}" if k != "depth" else ("child frame" if v == 1 else f"frame at depth {v}")
+
+def _judge(pred, url, frames):
+    """(passed, explanation) from per-frame facts [(frame info, facts)]."""
+    kind, neg = pred["kind"], pred.get("neg")
+    spec = pred.get("frame")
+    if spec and kind != "url":
+        frames = [(info, f) for info, f in frames if _in_scope(spec, info)]
+        if not frames:
+            return bool(neg), f"No {_scope_str(spec)} on the page"
+    if kind == "url":
+        ok = _match(pred["op"], url, pred["value"])
+        return ok != bool(neg), f"URL was {url}"
+    if kind == "title":
+        title = next((f.get("title") for info, f in frames if info["main"] or spec), "")
+        return _match(pred["op"], title, pred["value"]) != bool(neg), f"Title was {title!r}"
+    if kind == "text":
+        where = [k for k, (_, f) in enumerate(frames) if f.get("has")]
+        ok = bool(where)
+        return ok != bool(neg), (f"Text {pred['value']!r} " + ("found" if ok else "not found")
+                                 + f" in visible text of {len(frames)} frame(s)")
+    if kind == "value":
+        values = [v for _, f in frames for v in f.get("values") or []]
+        ok = any(_match(pred["op"], v, pred["value"]) for v in values)
+        return ok != bool(neg), f"Values of {len(values)} matching inputs: {_short(values)}"
+    if kind == "element":
+        texts = [t for _, f in frames for t in f.get("texts") or []]
+        ok = any(_match(pred.get("op", "contains"), t, pred["value"]) for t in texts)
+        return ok != bool(neg), f"{len(texts)} element(s) matching {pred['sel']!r}: {_short(texts)}"
+    if kind == "count":
+        n = sum(f.get("count") or 0 for _, f in frames)
+        want, cmp = pred["n"], pred["cmp"]
+        ok = {"==": n == want, ">=": n >= want, "<=": n <= want, ">": n > want, "<": n < want}[cmp]
+        return ok, f"{n} element(s) match {pred['sel']!r} (expected {cmp} {want})"
+    return False, f"unknown predicate {kind}"
+
+def _dom(preds, pending):
+    return [j for j in pending if preds[j]["kind"] != "url"]
+
+def _frame_info(page, fr):
+    """main flag, depth below the page (main = 0), name and URL of a frame."""
+    depth, p = 0, fr
+    while p.parent_frame is not None:
+        depth, p = depth + 1, p.parent_frame
+    return {"main": fr == page.main_frame, "depth": depth, "name": fr.name, "url": fr.url}
+
+def _facts(page, preds):
+    out = []
+    for fr in page.frames:
+        try:
+            out.append((_frame_info(page, fr), fr.evaluate(_FACTS_JS, preds)))
+        except Exception:
+            pass  # detached / cross-process frame that went away
+    return out
+
+async def _facts_async(page, preds):
+    out = []
+    for fr in page.frames:
+        try:
+            out.append((_frame_info(page, fr), await fr.evaluate(_FACTS_JS, preds)))
+        except Exception:
+            pass
+    return out
+
+def _assemble(preds, pending, url, frames, verdicts):
+    facts = {j: [] for j in pending}
+    for info, per in frames:
+        for j, f in zip(_dom(preds, pending), per or []):
+            facts[j].append((info, f))
+    for j in pending:
+        verdicts[j] = _judge(preds[j], url, facts[j])
+    return [j for j in pending if not verdicts[j][0]]
+
+def check(page, claims, timeout_ms=None):
+    """{index: (passed, explanation)} for the claims (1-based) that compile.
+    Failing predicates are re-evaluated until they hold or the timeout passes.
+    """
+    preds = {j: p for j, p in ((j, compile_claim(c)) for j, c in enumerate(claims, start=1)) if p}
+    verdicts = {}
+    pending = list(preds)
+    deadline = time.time() + (ASSERT_TIMEOUT_MS if timeout_ms is None else timeout_ms) / 1000
+    while pending:
+        dom = [preds[j] for j in _dom(preds, pending)]
+        pending = _assemble(preds, pending, page.url, _facts(page, dom) if dom else [], verdicts)
+        if not pending or time.time() >= deadline:
+            break
+        time.sleep(_POLL_S)
+    return verdicts
+
+async def check_async(page, claims, timeout_ms=None):
+    preds = {j: p for j, p in ((j, compile_claim(c)) for j, c in enumerate(claims, start=1)) if p}
+    verdicts = {}
+    pending = list(preds)
+    deadline = time.time() + (ASSERT_TIMEOUT_MS if timeout_ms is None else timeout_ms) / 1000
+    while pending:
+        dom = [preds[j] for j in _dom(preds, pending)]
+        pending = _assemble(preds, pending, page.url, await _facts_async(page, dom) if dom else [], verdicts)
+        if not pending or time.time() >= deadline:
+            break
+        await asyncio.sleep(_POLL_S)
+    return verdicts
@@ -0,0 +1,568 @@
+"""asyncio execution engine mirroring core.executor on playwright.async_api.
+Step bookkeeping is shared with the sync engine (core.steps); only page calls are awaited here.
+
+Many goals can share one event loop and one browser process; blocking LLM calls
+(planner/oracle) run in worker threads so they overlap with page work of other goals.
+"""
+import os, re, time, asyncio
+from playwright.async_api import async_playwright, expect
+from .planner import plan_step, plan_goal, remember_plan
+from .oracle import assert_url_contains, judge_many
+from .assertions import check_async as check_claims
+from .snapshot import snapshot_for, install_async as install_snapshot
+from .waits import HIGHLIGHT_JS, fast_mode, settle_async, stable_async, text_changed_async
+from .replay import describe_async, pinned_async, first_pin, scripted_actions
+from .steps import (
+    Step, Verdicts, goal_dir, goal_scope_async, context_options, watch_page, replay_script, write_scripts,
+    is_url, radio_token, with_check_click, plan_window, stash_plans, first_target,
+    _mklog, _safe, _safe_filename, _save_state, _goal_outcome,
+    _CSS_RX, _MONTH_RX, _DAY_RX, _DATEPICKERS, _CAL_NEXT, _CAL_PREV, _CHOICE_CONTAINER,
+)
+from .noise import install_async as install_noise, dismiss_async as dismiss_noise
+from . import capture as cap
+from . import network as net
+from . import har as hm
+from . import metrics
+from .phases import phase, timed_async, mark_step
+from .session import ensure_state_async
+from .async_healer import (
+    find_in_frames, find_input, find_clickable, combo_select, date_set, file_upload,
+    _find_checkbox, _find_radio, _hit,
+)
+
+async def _highlight(el):
+    if fast_mode():
+        return
+    try:
+        await el.evaluate(HIGHLIGHT_JS)
+    except:
+        pass
+
+async def _after_fill_settle(page, el):
+    try: await el.dispatch_event("input")
+    except: pass
+    try: await el.dispatch_event("change")
+    except: pass
+    try:
+        await el.blur()
+    except:
+        try: await page.keyboard.press("Tab")
+        except: pass
+
+async def _retype(page, el, value):
+    try:
+        await el.click()
+        try: await page.keyboard.press("Control+A")
+        except:
+            try: await page.keyboard.press("Meta+A")
+            except: pass
+    except:
+        pass
+    await page.keyboard.type(value or "", delay=20)
+
+async def _click_in_datepicker(page, hint):
+    """Calendar-aware shortcuts; returns True if the click was handled."""
+    cal = None
+    for c in (page.locator(sel).first for sel in _DATEPICKERS):
+        if await _hit(c, True):
+            cal = c
+            break
+    if not cal:
+        return False
+    mh = hint.strip()
+    if _MONTH_RX.match(mh):
+        for _ in range(24):
+            title = None
+            try: title = ((await cal.locator(".ui-datepicker-title").first.text_content()) or "").strip()
+            except: pass
+            if title and re.search(re.escape(mh), title, re.I):
+                break
+            btn = None
+            for b in (cal.locator(sel).first for sel in _CAL_NEXT + _CAL_PREV):
+                if await _hit(b) and await b.is_enabled():
+                    btn = b
+                    break
+            if btn is None:
+                break
+            await btn.click()
+            if not (title and await text_changed_async(cal.locator(".ui-datepicker-title").first, title)):
+                await settle_async(page)
+        return True
+    m = _DAY_RX.match(mh)
+    if m:
+        day = m.group(1)
+        cell = cal.locator(f".ui-datepicker-calendar td a:has-text('{day}')").first
+        if await _hit(cell, True):
+            await cell.click()
+            return True
+        cell = cal.get_by_text(re.compile(rf"^\s*{day}\s*$", re.I)).first
+        if await _hit(cell):
+            await cell.click()
+            return True
+    return False
+
+async def _toggle_choice(page, el, hint):
+    """Checkbox/radio/switch normalization; returns True if the click was handled."""
+    itype = ((await el.get_attribute("type")) or "").lower()
+    role = ((await el.get_attribute("role")) or "").lower()
+    has_aria_checked = (await el.get_attribute("aria-checked")) is not None
+    for kind in ("checkbox", "radio"):
+        if itype != kind:
+            try:
+                container = el.locator(_CHOICE_CONTAINER).first
+                if await _hit(container):
+                    inp = container.locator(f"input[type='{kind}']").first
+                    if await _hit(inp):
+                        el, itype = inp, kind
+            except:
+                pass
+    if itype == "checkbox":
+        try:
+            await el.check()
+            try:
+                if not await el.is_checked():
+                    await el.check(force=True)
+            except: pass
+            return True
+        except:
+            try:
+                lbl = el.locator("xpath=ancestor::label[1]").first
+                if await _hit(lbl):
+                    await lbl.click()
+                    return True
+            except: pass
+    if itype == "radio" or role == "radio":
+        try:
+            await el.check()
+            try:
+                if not await el.is_checked():
+                    lbl = el.locator("xpath=ancestor::label[1]").first
+                    if await _hit(lbl):
+                        await lbl.click()
+            except: pass
+            return True
+        except:
+            try:
+                lbl = el.locator("xpath=ancestor::label[1]").first
+                if await _hit(lbl):
+                    await lbl.click()
+                    return True
+            except: pass
+        try:
+            token = radio_token(hint)
+            if token:
+                alt = page.locator(f"input[type='radio'][value*='{token}' i]").first
+                if await _hit(alt):
+                    await alt.check()
+                    return True
+        except: pass
+    elif role in ("checkbox", "switch") or has_aria_checked:
+        await el.click()
+        return True
+    return False
+
+async def _wait_for_hint(page, hint):
+    el = None
+    for finder in (find_input, _find_checkbox, find_in_frames):
+        try:
+            el = await finder(page, hint)
+        except:
+            el = None
+        if el:
+            break
+    if el is not None:
+        try:
+            el = el.first
+            try: await el.scroll_into_view_if_needed()
+            except: pass
+            await el.wait_for(state="visible")
+        except:
+            await page.wait_for_selector(hint, state="visible")
+        return
+    if _CSS_RX.match(hint):
+        for scope in [page] + list(page.frames):
+            try:
+                loc = scope.locator(hint).first
+                if await loc.count() > 0:
+                    await loc.wait_for(state="visible")
+                    return
+            except:
+                pass
+        return
+    try:
+        await page.get_by_text(re.compile(hint, re.I)).first.wait_for(state="visible")
+    except:
+        await page.wait_for_selector(hint, state="visible")
+
+async def _remember(page, resolved, el, prefix=""):
+    """Record the selector of the element an action used (for the replay script).
+    Locators from the resolver or a replay pin already carry it; only the rest cost
+    an extra evaluate."""
+    if resolved is None or el is None:
+        return
+    d = snapshot_for(page).pin_of(el) or await describe_async(el)
+    if d:
+        resolved[prefix + "selector"] = d["selector"]
+        if d["frame"]:
+            resolved[prefix + "frame"] = d["frame"]
+
+@timed_async("act")
+async def _run_action(page, atype, target, value, pin=None, resolved=None):
+    if atype == "navigate":
+        dest = (value or target or "").strip()
+        if not is_url(dest):
+            return None
+        await page.goto(dest, wait_until="networkidle")
+
+    elif atype == "click":
+        hint = (target or value or "")
+        try:
+            if await _click_in_datepicker(page, hint):
+                return None
+        except:
+            pass
+        el = await pinned_async(page, pin)
+        if el is None:
+            for finder in (_find_checkbox, _find_radio, find_clickable, find_in_frames):
+                try:
+                    el = await finder(page, hint)
+                except:
+                    el = None
+                if el:
+                    break
+        if not el:
+            raise RuntimeError(f"Target not found for click: {target}")
+        await _remember(page, resolved, el)
+        try: await el.scroll_into_view_if_needed()
+        except: pass
+        await _highlight(el)
+        try: await el.wait_for(state="visible", timeout=5000)
+        except: pass
+        try:
+            if await _toggle_choice(page, el, hint):
+                return None
+        except:
+            pass
+        try:
+            await el.click(timeout=8000)
+        except Exception as e:
+            try:
+                await el.click(timeout=8000, force=True)
+            except:
+                try: await el.evaluate("e => e.click()")
+                except: raise e
+
+    elif atype == "fill":
+        el = (await pinned_async(page, pin) or await find_input(page, target or "")
+              or await find_in_frames(page, target or ""))
+        if not el:
+            raise RuntimeError(f"Target not found for fill: {target}")
+        await _remember(page, resolved, el)
+        try: await el.scroll_into_view_if_needed()
+        except: pass
+        await _highlight(el)
+        try: await el.wait_for(state="visible", timeout=5000)
+        except: pass
+        try: await el.click(timeout=2000)
+        except: pass
+        await stable_async(el)
+        try:
+            await el.fill(value or "")
+        except Exception:
+            await _retype(page, el, value)
+        try:
+            if (value or "") != ((await el.evaluate("e => e.value")) or ""):
+                await _retype(page, el, value)
+        except:
+            pass
+        await _after_fill_settle(page, el)
+
+    elif atype == "press":
+        await page.keyboard.press(value or "Enter")
+
+    elif atype == "select":
+        el = await pinned_async(page, pin) or await find_in_frames(page, target or "")
+        if not el: raise RuntimeError(f"Target not found for select: {target}")
+        await _remember(page, resolved, el)
+        await el.select_option(value)
+
+    elif atype == "wait_for":
+        if str(value).isdigit():
+            await page.wait_for_timeout(int(value))
+        else:
+            await settle_async(page)
+
+    elif atype == "wait_for_selector":
+        hint = (value or target or "").strip()
+        if not hint:
+            await settle_async(page)
+        else:
+            await _wait_for_hint(page, hint)
+
+    elif atype == "assert_url_contains":
+        ok, _ = assert_url_contains(page, value or target)
+        if not ok: raise AssertionError(f"URL does not contain {value or target}")
+
+    elif atype == "assert_text":
+        el = await pinned_async(page, pin) or await find_in_frames(page, target or "")
+        if not el: raise RuntimeError(f"Target not found for assert_text: {target}")
+        await _remember(page, resolved, el)
+        await expect(el.first).to_be_visible()
+
+    elif atype == "combo_select":
+        await combo_select(page, target or "", value or "")
+
+    elif atype == "date_set":
+        await date_set(page, target or "", value or "")
+
+    elif atype == "file_upload":
+        await file_upload(page, target or "upload", value)
+
+    elif atype == "hover":
+        el = await pinned_async(page, pin) or await find_in_frames(page, target or "")
+        await _remember(page, resolved, el)
+        await _highlight(el)
+        await el.hover()
+
+    elif atype == "scroll_into_view":
+        el = await pinned_async(page, pin) or await find_in_frames(page, target or "")
+        await _remember(page, resolved, el)
+        await _highlight(el)
+        await el.scroll_into_view_if_needed()
+
+    elif atype == "drag_and_drop":
+        src = await pinned_async(page, pin) or await find_in_frames(page, target or "")
+        dst = await pinned_async(page, pin, "value_selector", "value_frame") or await find_in_frames(page, value or "")
+        await _remember(page, resolved, src)
+        await _remember(page, resolved, dst, "value_")
+        await _highlight(src); await _highlight(dst)
+        await src.drag_to(dst)
+
+    else:
+        return f"Unknown action type: {atype}; skipped."
+
+    return None
+
+async def _target_resolves(page, atype, hint):
+    try:
+        if atype == "click":
+            el = await _find_checkbox(page, hint) or await find_clickable(page, hint) or await find_in_frames(page, hint)
+        elif atype == "fill":
+            el = await find_input(page, hint) or await find_in_frames(page, hint)
+        else:
+            el = await find_in_frames(page, hint)
+        return el is not None and await el.count() > 0
+    except Exception:
+        return False
+
+async def _plan(page, html, i, steps, base_url, pending, plan_ahead, log):
+    """Async counterpart of core.executor._plan (look-ahead plans, revalidated)."""
+    desc = steps[i-1]["description"]
+    acts, ahead = pending.pop(i, None), True
+    if plan_ahead and acts is None:
+        try:
+            plans = await asyncio.to_thread(plan_goal, html, plan_window(steps, i, plan_ahead), base_url)
+            acts, ahead = stash_plans(plans, i, pending, log), False
+        except Exception as e:
+            log(f"WARN {i}: plan-ahead failed: {_safe(e)}")
+    if acts:
+        first = first_target(acts)
+        if first is None or await _target_resolves(page, *first):
+            if ahead:
+                await asyncio.to_thread(remember_plan, html, desc, base_url, acts)
+            return acts
+        log(f"PLAN {i}: look-ahead plan does not resolve on the live page; re-planning")
+    return await asyncio.to_thread(plan_step, html, desc, base_url)
+
+async def _replay_still_valid(page, actions):
+    a = first_pin(actions)
+    return a is None or await pinned_async(page, a) is not None
+
+async def run_goal(name, url, steps, assertions, headless=True, browser=None, out_dir=None, plan_ahead=0, replay=False, fast=None,
+                   capture=None, storage_state=None, save_state=None, network=None, har=None):
+    """Async counterpart of core.executor.run_goal with the same return shape."""
+    out_dir = goal_dir(name, out_dir)
+    log = _mklog(out_dir)
+    pol = cap.policy(capture)
+    har = hm.mode(har)
+    replay = replay or har == "replay"
+    async with goal_scope_async(out_dir, log, fast, har) as goal:
+        if browser is not None:
+            srec, arec = await _run_in_browser(browser, headless, out_dir, log, name, url, steps, assertions, plan_ahead, replay, pol,
+                                               storage_state, save_state, network, har)
+        else:
+            async with async_playwright() as p:
+                browser = await _launch_browser(p, headless)
+                try:
+                    srec, arec = await _run_in_browser(browser, headless, out_dir, log, name, url, steps, assertions, plan_ahead, replay, pol,
+                                                       storage_state, save_state, network, har)
+                finally:
+                    await browser.close()
+        goal["outcome"] = _goal_outcome(srec, arec)
+    return out_dir, srec, arec
+
+@timed_async("launch")
+async def _launch_browser(p, headless=True):
+    launch_args = {}
+    if not headless:
+        launch_args["args"] = ["--start-maximized", "--window-size=1920,1080"]
+    t0 = time.perf_counter()
+    browser = await p.chromium.launch(headless=headless, **launch_args)
+    metrics.inc("browser_launches_total")
+    metrics.observe("browser_launch_seconds", time.perf_counter() - t0)
+    return browser
+
+async def _run_in_browser(browser, headless, out_dir, log, name, url, steps, assertions, plan_ahead, replay, pol,
+                          storage_state=None, save_state=None, network=None, har=None):
+    step_records = []
+    assertion_records = []
+    pending = {}
+    script = replay_script(name, replay, log)
+    executed = []
+    failed = True
+    routing = None
+    misses = None  # HAR replay: requests the recording could not answer
+    with phase("launch"):
+        context = await browser.new_context(**context_options(pol, out_dir, har, storage_state, headless, log))
+    try:
+        await cap.start_async(context, pol)
+        await install_noise(context)
+        await install_snapshot(context)
+        if har == "replay":
+            misses = await hm.replay_async(context, name, log)  # already offline; no blocking/caching on top
+        else:
+            routing = await net.install_async(context, net.policy(url, network), url, log)
+        with phase("launch"):
+            page = await context.new_page()
+        watch_page(page, log)
+
+        if url:
+            log(f"INIT navigate -> {url}")
+            with phase("act"):
+                await page.goto(url, wait_until="domcontentloaded")
+
+        for i, s in enumerate(steps, start=1):
+            mark_step(i)
+            step = Step(i, s["description"])
+            await cap.chunk_async(context, pol)
+            try:
+                snap = snapshot_for(page)
+                with phase("noise"):
+                    dismissed = await dismiss_noise(page, log)
+                if dismissed:
+                    snap.invalidate()
+                log(f"STEP {i}: {step.desc}")
+
+                actions = scripted_actions(script, i, step.desc)
+                if actions and not await _replay_still_valid(page, actions):
+                    log(f"REPLAY {i}: recorded selectors no longer match; re-planning")
+                    actions = None
+                if actions:
+                    step.planned(actions, True, log)
+                else:
+                    with phase("plan"):
+                        step.html = await snap.digest_async()
+                        # LLM calls block; _plan runs them off-loop so other goals keep driving their pages
+                        actions = await _plan(page, step.html, i, steps, url or page.url, pending, plan_ahead, log)
+                    step.planned(actions, False, log)
+                actions = with_check_click(step.desc, actions, log, i)
+
+                for act in actions:
+                    todo = step.begin(act, log)
+                    if todo is None:
+                        continue
+                    atype, target, value, resolved = todo
+                    err = await _run_action(page, atype, target, value, pin=act, resolved=resolved)
+                    step.ran(atype, resolved, err, snap, log)
+
+                if cap.step_screenshot(pol):
+                    step.screenshot = os.path.join(out_dir, _safe_filename("step", i))
+                    with phase("screenshot"):
+                        await page.screenshot(path=step.screenshot, full_page=False)
+            except Exception as e:
+                step.fail(e, url or page.url, log)
+                if pol["screenshots"] != "off":
+                    step.screenshot = os.path.join(out_dir, _safe_filename("step_fail", i))
+                    try:
+                        with phase("screenshot"):
+                            await page.screenshot(path=step.screenshot, full_page=False)
+                    except: step.screenshot = None
+            finally:
+                await cap.chunk_end_async(context, pol, out_dir, f"step_{i}", step.status == "fail")
+                record, entry = step.end(out_dir)
+                step_records.append(record)
+                executed.append(entry)
+
+        mark_step(None)
+        await cap.chunk_async(context, pol)
+        verdicts = Verdicts(assertions)
+        try:
+            with phase("assert"):
+                compiled = await check_claims(page, assertions)
+        except Exception as e:
+            log(f"WARN assertion checks failed: {_safe(e)}")
+            compiled = {}
+        fuzzy = verdicts.checked(compiled, log)
+        if fuzzy and har == "replay":
+            verdicts.offline(log)
+        elif fuzzy:
+            try:
+                with phase("assert"):
+                    html = await snapshot_for(page).digest_async()
+                    verdicts.judged(await asyncio.to_thread(judge_many, html, fuzzy))
+            except Exception as e:
+                verdicts.judge_failed(e)
+        assertion_records = verdicts.records()
+        if misses:
+            assertion_records.append(hm.miss_record(misses, len(assertion_records) + 1))
+
+        failed = _goal_outcome(step_records, assertion_records) != "pass"
+        await cap.chunk_end_async(context, pol, out_dir, "assertions", not all(r["passed"] for r in assertion_records))
+        await cap.stop_async(context, pol, out_dir, failed)
+        if save_state and not failed:
+            await asyncio.to_thread(_save_state, await context.storage_state(), save_state)
+            log(f"STATE storage_state -> {save_state}")
+        await asyncio.to_thread(write_scripts, out_dir, name, url, executed, not failed, log)
+    finally:
+        if routing:
+            log(f"NET {routing.summary()}")
+        try: await context.close()
+        except: pass
+        cap.prune(out_dir, pol, failed, step_records)
+        hm.keep(har, out_dir, name, failed, log)
+    return step_records, assertion_records
+
+async def run_goals(goals, concurrency=4, headless=True, out_root="runs", indices=None, on_done=None, **run_opts):
+    """Run goal specs (dicts from core.util.load_goal_spec) concurrently on one browser.
+    Goals start in list order; `indices` numbers their out dirs (default 1..n).
+    Returns [(goal, out_dir, step_records, assertion_records)] in input order; a goal
+    that raises is returned with the exception in place of its records.
+    `on_done(goal, out_dir, step_records, assertion_records, started)` runs in a worker
+    thread as each goal finishes (`started` = its own time.time() at start).
+    """
+    sem = asyncio.Semaphore(max(1, int(concurrency)))
+    async with async_playwright() as p:
+        browser = await _launch_browser(p, headless)
+        try:
+            async def run(idx, g):
+                out_dir = os.path.join(out_root, f"{idx:03d}_{g['name'].replace(' ','_')}")
+                try:
+                    state = await ensure_state_async(g.get("setup"), os.path.dirname(g.get("path") or ""), out_root,
+                                                     browser=browser, headless=headless, **run_opts)
+                    return (g,) + await run_goal(g["name"], g["url"], g["steps"], g["assertions"],
+                                                 headless=headless, browser=browser, out_dir=out_dir,
+                                                 storage_state=state, network=g.get("network"),
+                                                 **cap.for_goal(g, run_opts))
+                except Exception as e:
+                    return (g, out_dir, e, None)
+
+            async def one(idx, g):
+                async with sem:
+                    started = time.time()
+                    out = await run(idx, g)
+                    if on_done is not None:
+                        await asyncio.to_thread(on_done, *out, started)
+                    return out
+            return await asyncio.gather(*(one(k, g) for k, g in zip(indices or range(1, len(goals) + 1), goals)))
+        finally:
+            await browser.close()
@@ -0,0 +1,302 @@
+"""Async counterparts of the finders in core.healer (playwright.async_api).
+Locator builders are shared with the sync module; only the probing is awaited.
+"""
+import re, time
+from datetime import datetime
+from playwright.async_api import Page
+from .util import update_aliases, host_of
+from .healer import (
+    _by_placeholder, _by_label, _TARGET_STRATEGIES, _input_candidates, _choice_candidates,
+    _guess_selectors, _intent_selectors, _alias_selectors, _LEARNABLE, _CLICK_STRATEGIES,
+    _select_css, _is_custom_combo, _COMBO_TRIGGER, _COMBO_SEARCH, _option_candidates, _DATE_NEXT, _DATE_PREV,
+)
+from . import resolver, healstats
+from .waits import settle_async
+from .snapshot import snapshot_for
+from .phases import timed_async
+
+async def _hit(loc, visible=False):
+    """True if the locator matches (and, optionally, its first match is visible)."""
+    try:
+        if not loc or await loc.count() == 0:
+            return False
+        return (await loc.first.is_visible()) if visible else True
+    except:
+        return False
+
+async def _first_match(cands):
+    """First candidate locator that matches (its .first), or None."""
+    try:
+        for loc in cands:
+            if await _hit(loc):
+                return loc.first
+    except:
+        pass
+    return None
+
+async def _resolve(page: Page, scope, hint: str, kind: str, **kw):
+    snap = snapshot_for(page)
+    key = (id(scope), hint, kind, repr(sorted(kw.items())))
+    known = snap.recall(key)
+    host = host_of(page.url)
+    order = healstats.order_for(host, kind, resolver.ORDER[kind])
+    loc, info = await resolver.resolve_async(scope, hint, kind, order=order, known=known, **kw)
+    if not (info or {}).get("memo"):
+        healstats.record_resolution(host, kind, info, order)
+        if loc is not None:
+            snap.remember(key, info, info.get("version"))
+    if loc is not None:
+        snap.pin(loc, info["selector"], None if scope is page else scope.url)
+    return loc, info
+
+# -------- high-level finders --------
+async def find_target(page: Page, hint: str):
+    """Prefer structured signals first, generic text LAST."""
+    for strat in _TARGET_STRATEGIES:
+        el = strat(page, hint)
+        if await _hit(el):
+            return el
+    return None
+
+async def _resolve_in_frames(page: Page, hint: str):
+    for scope in [page] + [fr for fr in page.frames if fr != page.main_frame]:
+        try:
+            loc, _ = await _resolve(page, scope, hint, "target")
+        except Exception:
+            if scope is page:
+                raise
+            continue
+        if loc is not None:
+            return loc
+    return None
+
+@timed_async("resolve")
+async def find_in_frames(page: Page, hint: str):
+    if resolver.ENABLED:
+        try:
+            return await _resolve_in_frames(page, hint)
+        except Exception:
+            pass
+    el = await find_target(page, hint)
+    if el:
+        return el
+    for fr in page.frames:
+        try:
+            el = await find_target(fr, hint)
+            if el:
+                return el
+        except:
+            pass
+    return None
+
+# -------- input-specific resolution for fill() --------
+async def _first_visible_textarea(page: Page):
+    try:
+        loc = page.locator("textarea")
+        count = await loc.count()
+        for i in range(min(count, 6)):
+            item = loc.nth(i)
+            if await item.is_visible():
+                return item
+    except:
+        pass
+    return None
+
+@timed_async("resolve")
+async def find_input(page: Page, hint: str):
+    """Resolve an INPUT/TEXTAREA for fill() reliably."""
+    if resolver.ENABLED:
+        try:
+            loc, info = await _resolve(page, page, hint, "input",
+                                       aliases=_alias_selectors(page, hint), guesses=_guess_selectors(hint))
+            if loc is not None and info["strategy"] == "testid" and info["stable"]:
+                try: update_aliases(page.url, hint, info["selector"])
+                except: pass
+            return loc
+        except Exception:
+            pass
+    try:
+        for loc, sel in _input_candidates(page, hint):
+            if await _hit(loc):
+                if sel:
+                    try: update_aliases(page.url, hint, sel)
+                    except: pass
+                return loc.first
+    except:
+        pass
+    return await _first_visible_textarea(page)
+
+# -------- strong clickable resolver --------
+@timed_async("resolve")
+async def find_clickable(page: Page, hint: str):
+    """Async port of core.healer.find_clickable (same priority order)."""
+    if resolver.ENABLED:
+        try:
+            loc, info = await _resolve(page, page, hint, "clickable",
+                                       aliases=_alias_selectors(page, hint), intents=_intent_selectors(hint))
+            if loc is not None and info["strategy"] in _LEARNABLE and info["stable"]:
+                try: update_aliases(page.url, hint, info["selector"])
+                except: pass
+            return loc
+        except Exception:
+            pass
+    rx = re.compile(hint, re.I)
+    host = host_of(page.url)
+    for name in healstats.order_for(host, "clickable", resolver.ORDER["clickable"]):
+        t0 = time.perf_counter()
+        found = None
+        try:
+            for loc, sel in _CLICK_STRATEGIES[name](page, hint, rx):
+                if await _hit(loc, True):
+                    found = loc.first, sel
+                    break
+        except Exception:
+            pass
+        healstats.record(host, "clickable", name, bool(found), (time.perf_counter() - t0) * 1000)
+        if found:
+            loc, sel = found
+            if sel:
+                try: update_aliases(page.url, hint, sel)
+                except: pass
+            return loc
+    return None
+
+@timed_async("resolve")
+async def _find_checkbox(page, hint: str):
+    return await _first_match(_choice_candidates(page, "checkbox", hint))
+
+@timed_async("resolve")
+async def _find_radio(page, hint: str):
+    return await _first_match(_choice_candidates(page, "radio", hint))
+
+# -------- adapters: combobox / date / file upload --------
+async def combo_select(page: Page, hint: str, value: str):
+    rx = re.compile(hint, re.I)
+    sel = page.get_by_label(rx)
+    try:
+        if await _hit(sel) and await sel.first.evaluate("e => e.tagName.toLowerCase()") == "select":
+            await sel.first.select_option(label=value)
+            return
+    except:
+        pass
+    for css in _select_css(hint):
+        try:
+            s2 = page.locator(css).first
+            if await _hit(s2):
+                await s2.select_option(label=value)
+                return
+        except:
+            pass
+
+    if _is_custom_combo(hint):
+        trigger = page.locator(_COMBO_TRIGGER).first
+        if await _hit(trigger):
+            await trigger.click()
+            try:
+                typebox = page.locator(_COMBO_SEARCH).first
+                if await _hit(typebox):
+                    await typebox.fill(value)
+                else:
+                    await page.keyboard.type(value)
+            except:
+                await page.keyboard.type(value)
+            opts = await _first_match(_option_candidates(page, value, select2=True))
+            if opts is None:
+                auto = page.locator(f".ui-autocomplete li:has-text('{value}')").first
+                if await _hit(auto):
+                    await auto.click()
+                    try: await page.keyboard.press("Escape")
+                    except: pass
+                    return
+                try:
+                    await page.keyboard.press("Enter")
+                    await page.keyboard.press("Escape")
+                    return
+                except:
+                    pass
+                raise RuntimeError(f"Option not found in combobox: {value}")
+            await opts.click()
+            try: await page.keyboard.press("Escape")
+            except: pass
+            try: await page.mouse.click(5, 5)
+            except: pass
+            return
+
+    cb = page.get_by_role("combobox", name=rx)
+    if not await _hit(cb):
+        cb = await find_in_frames(page, hint)
+    if cb is None or not await _hit(cb):
+        raise RuntimeError(f"Combobox not found: {hint}")
+    await cb.first.click()
+    try:
+        inner_input = cb.locator("input").first
+        if await _hit(inner_input):
+            await inner_input.fill(value)
+        else:
+            await page.keyboard.type(value)
+    except:
+        await page.keyboard.type(value)
+    options = await _first_match(_option_candidates(page, value))
+    if options is None:
+        await page.keyboard.press("End"); await settle_async(page)
+        await page.keyboard.press("Home"); await settle_async(page)
+        options = await _first_match(_option_candidates(page, value))
+    if options is None:
+        raise RuntimeError(f"Option not found in combobox: {value}")
+    await options.click()
+
+async def date_set(page: Page, hint: str, iso_value: str):
+    el = await find_in_frames(page, hint) or page.locator("input[type='date']").first
+    try:
+        if await _hit(el) and await el.evaluate("e => e.type") == "date":
+            await el.fill(iso_value)
+            await el.dispatch_event("change")
+            return
+    except:
+        pass
+
+    tgt = await find_in_frames(page, hint) or _by_placeholder(page, hint) or _by_label(page, hint)
+    tgt = tgt.first if tgt is not None else None
+    if tgt is None or not await _hit(tgt):
+        raise RuntimeError(f"Date field not found: {hint}")
+    await tgt.click()
+
+    dt = datetime.fromisoformat(iso_value)
+
+    async def click_if_visible(selectors):
+        for sel in selectors:
+            btn = page.locator(sel)
+            if await _hit(btn, True):
+                await btn.first.click()
+                return True
+        return False
+
+    month_label = f"{dt.strftime('%B')} {dt.year}"
+    for _ in range(24):
+        if await page.get_by_text(re.compile(f"^{re.escape(month_label)}$", re.I)).count() > 0:
+            break
+        if not await click_if_visible(_DATE_NEXT):
+            if not await click_if_visible(_DATE_PREV):
+                break
+        await settle_async(page)
+
+    day = str(dt.day)
+    cand = page.get_by_role("gridcell", name=re.compile(f"^{day}$")).first
+    if not await _hit(cand):
+        cand = page.get_by_text(re.compile(f"^{day}$")).first
+    if not await _hit(cand):
+        raise RuntimeError(f"Day not found in calendar: {iso_value}")
+    await cand.click()
+
+async def file_upload(page: Page, hint: str, file_path: str):
+    input_el = page.locator("input[type='file']").first
+    if not await _hit(input_el):
+        btn = await find_in_frames(page, hint) or page.get_by_role("button", name=re.compile(hint, re.I)).first
+        if await _hit(btn):
+            await btn.first.click()
+            try: await page.locator("input[type='file']").first.wait_for(state="attached", timeout=1000)
+            except: pass
+        input_el = page.locator("input[type='file']").first
+    if not await _hit(input_el):
+        raise RuntimeError("File input not found after attempting to open chooser.")
+    await input_el.set_input_files(file_path)
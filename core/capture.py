@@ -0,0 +1,126 @@
+import os
+
+# ---- artifact capture policies ----
+# Per artifact kind (trace, video, screenshots) one of:
+#   off                nothing is recorded
+#   on-failure         only the failing part: step_fail_*.png, a trace chunk per failing
+#                      step (trace_step_<i>.zip) or for the assertions (trace_assertions.zip);
+#                      video cannot start after the fact, so it behaves like retain-on-failure
+#   retain-on-failure  record everything, delete it when the goal is green
+#   always             record and keep everything (the previous behavior)
+# A spec is a mode for all kinds ("on-failure"), a comma list ("trace=off,video=off")
+# or a mapping (goal YAML `capture:`). Later specs override earlier ones:
+# CAPTURE env < goal YAML < --capture.
+KINDS = ("trace", "video", "screenshots")
+MODES = ("off", "on-failure", "retain-on-failure", "always")
+
+def _mode(value):
+    if value is True:
+        return "always"
+    if value is False or value is None:
+        return "off"  # YAML reads a bare `off` as false
+    m = str(value).strip().lower().replace("_", "-")
+    if m not in MODES:
+        raise ValueError(f"capture mode must be one of {', '.join(MODES)}: {value!r}")
+    return m
+
+def parse(spec):
+    """Capture spec (str, mapping or None) -> {kind: mode} for the kinds it names."""
+    if not spec:
+        return {}
+    if isinstance(spec, dict):
+        items = spec.items()
+    elif "=" in str(spec):
+        items = [part.split("=", 1) for part in str(spec).split(",") if part.strip()]
+    else:
+        return {k: _mode(spec) for k in KINDS}
+    out = {}
+    for kind, mode in items:
+        kind = str(kind).strip().lower()
+        if kind == "screenshot":
+            kind = "screenshots"
+        if kind not in KINDS:
+            raise ValueError(f"capture kind must be one of {', '.join(KINDS)}: {kind!r}")
+        out[kind] = _mode(mode)
+    return out
+
+def policy(*specs):
+    """Full {kind: mode} from the CAPTURE env default overridden by `specs` in order."""
+    pol = dict.fromkeys(KINDS, "always")
+    for spec in (os.getenv("CAPTURE"),) + specs:
+        pol.update(parse(spec))
+    return pol
+
+def for_goal(goal, run_opts):
+    """run_goal kwargs for a goal spec: its `capture:` under the run-wide --capture."""
+    return dict(run_opts, capture=policy(goal.get("capture"), run_opts.get("capture")))
+
+def keep(mode, failed):
+    return mode == "always" or (mode != "off" and failed)
+
+def context_options(pol, out_dir):
+    """new_context() kwargs; video is only recorded when some policy may keep it."""
+    return {"record_video_dir": out_dir} if pol["video"] != "off" else {}
+
+def step_screenshot(pol):
+    """Screenshot after every passing step (failure screenshots need only mode != off)."""
+    return pol["screenshots"] in ("always", "retain-on-failure")
+
+def _trace_chunks(pol):
+    return pol["trace"] == "on-failure"
+
+def start(context, pol):
+    if pol["trace"] != "off":
+        context.tracing.start(screenshots=True, snapshots=True, sources=True)
+
+def chunk(context, pol):
+    """Begin a trace chunk for one step (on-failure traces only)."""
+    if _trace_chunks(pol):
+        try: context.tracing.start_chunk()
+        except Exception: pass
+
+def chunk_end(context, pol, out_dir, label, failed):
+    if _trace_chunks(pol):
+        try: context.tracing.stop_chunk(path=os.path.join(out_dir, f"trace_{label}.zip") if failed else None)
+        except Exception: pass
+
+def stop(context, pol, out_dir, failed):
+    if pol["trace"] == "off":
+        return
+    whole = not _trace_chunks(pol) and keep(pol["trace"], failed)
+    context.tracing.stop(path=os.path.join(out_dir, "trace.zip") if whole else None)
+
+async def start_async(context, pol):
+    if pol["trace"] != "off":
+        await context.tracing.start(screenshots=True, snapshots=True, sources=True)
+
+async def chunk_async(context, pol):
+    if _trace_chunks(pol):
+        try: await context.tracing.start_chunk()
+        except Exception: pass
+
+async def chunk_end_async(context, pol, out_dir, label, failed):
+    if _trace_chunks(pol):
+        try: await context.tracing.stop_chunk(path=os.path.join(out_dir, f"trace_{label}.zip") if failed else None)
+        except Exception: pass
+
+async def stop_async(context, pol, out_dir, failed):
+    if pol["trace"] == "off":
+        return
+    whole = not _trace_chunks(pol) and keep(pol["trace"], failed)
+    await context.tracing.stop(path=os.path.join(out_dir, "trace.zip") if whole else None)
+
+def prune(out_dir, pol, failed, step_records):
+    """After the context is closed: drop videos/screenshots a policy does not keep."""
+    doomed = []
+    if not keep(pol["video"], failed):
+        doomed += [f for f in os.listdir(out_dir) if f.endswith(".webm")]
+    if not keep(pol["screenshots"], failed):
+        for r in step_records:
+            if r.get("screenshot"):
+                doomed.append(r["screenshot"])
+                r["screenshot"] = None
+    for f in doomed:
+        try: os.remove(os.path.join(out_dir, f))
+        except OSError: pass
+    return doomed
@@ -0,0 +1,128 @@
+import os
+
+# ---- compact page digest for LLM prompts ----
+# Instead of the first N characters of raw HTML (mostly <head>, scripts and CSS),
+# prompts get an accessibility-tree style digest: one line per interactive element
+# with a stable id, plus headings, labels and visible text, bounded by a token budget.
+DIGEST_TOKENS = int(os.getenv("DOM_DIGEST_TOKENS", "1500"))
+
+DIGEST_JS = r"""
+() => {
+  const items = [];
+  let order = 0, eid = 0;
+  const norm = (s, n) => { s = String(s || '').replace(/\s+/g, ' ').trim(); return n && s.length > n ? s.slice(0, n) + '…' : s; };
+  const visible = (el) => {
+    const r = el.getBoundingClientRect();
+    if (!r.width || !r.height) return false;
+    const cs = getComputedStyle(el);
+    return cs.visibility !== 'hidden' && cs.display !== 'none';
+  };
+  const role = (el) => {
+    const r = el.getAttribute('role'); if (r) return r.split(/\s+/)[0];
+    const t = el.tagName;
+    if (t === 'A') return 'link';
+    if (t === 'BUTTON' || t === 'SUMMARY') return 'button';
+    if (t === 'SELECT') return 'combobox';
+    if (t === 'TEXTAREA') return 'textbox';
+    if (t === 'INPUT') {
+      const ty = (el.type || 'text').toLowerCase();
+      if (['button', 'submit', 'reset', 'image'].includes(ty)) return 'button';
+      if (['checkbox', 'radio', 'file', 'range', 'date', 'hidden'].includes(ty)) return ty === 'range' ? 'slider' : ty;
+      return 'textbox';
+    }
+    if (el.isContentEditable) return 'textbox';
+    return 'clickable';
+  };
+  const name = (el) => {
+    const al = el.getAttribute('aria-label'); if (al) return norm(al, 80);
+    const lb = el.getAttribute('aria-labelledby');
+    if (lb) { const t = lb.split(/\s+/).map(i => (document.getElementById(i) || {}).textContent || '').join(' '); if (norm(t)) return norm(t, 80); }
+    if (el.labels && el.labels.length) return norm(Array.from(el.labels).map(l => l.textContent).join(' '), 80);
+    if (el.tagName === 'INPUT' && ['button', 'submit', 'reset'].includes((el.type || '').toLowerCase())) return norm(el.value, 80);
+    if (['INPUT', 'TEXTAREA', 'SELECT'].includes(el.tagName)) return norm(el.getAttribute('placeholder') || el.getAttribute('title'), 80);
+    const t = norm(el.innerText || el.textContent, 80); if (t) return t;
+    const img = el.querySelector('img[alt]'); if (img) return norm(img.alt, 80);
+    return norm(el.getAttribute('title'), 80);
+  };
+  const INTERACTIVE = 'a[href], button, input, select, textarea, summary, [role=button], [role=link], [role=checkbox], [role=radio], [role=tab], [role=menuitem], [role=option], [role=combobox], [role=switch], [role=textbox], [contenteditable=""], [contenteditable=true], [onclick]';
+  const HEADINGS = new Set(['H1', 'H2', 'H3', 'H4']);
+  const TEXTUAL = new Set(['P', 'LI', 'TD', 'TH', 'SPAN', 'DIV', 'LABEL', 'DT', 'DD', 'LEGEND', 'CAPTION', 'STRONG', 'EM', 'SMALL']);
+  const attrs = (el) => {
+    const out = [];
+    if (el.id) out.push('#' + el.id);
+    for (const a of ['name', 'data-test', 'data-testid', 'placeholder']) { const v = el.getAttribute(a); if (v) out.push(`${a}=${norm(v, 40)}`); }
+    if (el.tagName === 'INPUT' && el.type && !['text', 'submit', 'button'].includes(el.type)) out.push('type=' + el.type);
+    if (el.tagName === 'A') { const h = el.getAttribute('href') || ''; if (h && !h.startsWith('javascript')) out.push('href=' + norm(h.replace(/^https?:\/\/[^/]+/, ''), 60)); }
+    if (el.tagName === 'SELECT') out.push('options=' + Array.from(el.options).slice(0, 8).map(o => norm(o.text, 24)).join('|'));
+    if ('value' in el && el.tagName !== 'BUTTON' && el.type !== 'submit' && el.value && el.type !== 'password') out.push('value=' + norm(el.value, 40));
+    if (el.checked) out.push('checked');
+    if (el.disabled) out.push('disabled');
+    return out.join(' ');
+  };
+  const ownText = (el) => norm(Array.from(el.childNodes).filter(n => n.nodeType === 3).map(n => n.textContent).join(' '), 160);
+  const walk = (root, depth) => {
+    for (const el of root.querySelectorAll('*')) {
+      if (['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE', 'HEAD', 'META', 'LINK'].includes(el.tagName)) continue;
+      if (el.tagName === 'IFRAME') {
+        items.push({o: order++, p: 0, d: depth, t: `[frame] ${norm(el.getAttribute('name') || el.id || el.getAttribute('title') || '', 40)} src=${norm(el.getAttribute('src'), 60)}`});
+        try { if (el.contentDocument) walk(el.contentDocument, depth + 1); } catch (e) { /* cross-origin */ }
+        continue;
+      }
+      if (el.matches(INTERACTIVE)) {
+        if (el.type === 'hidden' || !visible(el)) continue;
+        eid += 1;
+        const n = name(el);
+        items.push({o: order++, p: 0, d: depth, t: `[e${eid}] ${role(el)}${n ? ` "${n}"` : ''}${attrs(el) ? ' ' + attrs(el) : ''}`});
+      } else if (HEADINGS.has(el.tagName)) {
+        const t = norm(el.innerText || el.textContent, 120);
+        if (t && visible(el)) items.push({o: order++, p: 1, d: depth, t: `${el.tagName.toLowerCase()}: ${t}`});
+      } else if (TEXTUAL.has(el.tagName) && !el.closest('a, button, label, [role=button]')) {
+        const t = ownText(el);
+        if (t && t.length > 1 && visible(el)) items.push({o: order++, p: 2, d: depth, t: `text: ${t}`});
+      }
+      if (el.shadowRoot) walk(el.shadowRoot, depth);
+    }
+  };
+  walk(document, 0);
+  return {title: document.title, url: location.href, items};
+}
+"""
+
+def _approx_tokens(s: str):
+    return max(1, len(s) // 4)
+
+def render_digest(data, max_tokens=None):
+    """Assemble the digest text within `max_tokens`: interactive elements first,
+    then headings, then plain text; output stays in document order.
+    """
+    budget = DIGEST_TOKENS if max_tokens is None else max_tokens
+    head = f"Title: {data.get('title') or ''}\nURL: {data.get('url') or ''}"
+    used = _approx_tokens(head)
+    keep = []
+    items = data.get("items") or []
+    for it in sorted(items, key=lambda x: (x["p"], x["o"])):
+        line = "  " * it.get("d", 0) + it["t"]
+        cost = _approx_tokens(line) + 1
+        if used + cost > budget:
+            if it["p"] == 0:
+                continue  # a shorter interactive line may still fit
+            break
+        used += cost
+        keep.append((it["o"], line))
+    keep.sort()
+    dropped = len(items) - len(keep)
+    tail = f"\n… {dropped} more nodes omitted" if dropped > 0 else ""
+    return head + "\n" + "\n".join(l for _, l in keep) + tail
+
+def dom_digest(page, max_tokens=None):
+    """Digest of the live page; falls back to raw HTML if the script cannot run."""
+    try:
+        return render_digest(page.evaluate(DIGEST_JS), max_tokens)
+    except Exception:
+        return page.content()
+
+async def dom_digest_async(page, max_tokens=None):
+    try:
+        return render_digest(await page.evaluate(DIGEST_JS), max_tokens)
+    except Exception:
+        return await page.content()
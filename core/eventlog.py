@@ -0,0 +1,112 @@
+import os, re, json, time, queue, threading
+
+# ---- buffered, structured run log ----
+# Playwright callbacks (request/response/console) only enqueue a dict; a background
+# thread batches records into `events.jsonl` with one open file handle per run.
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+_STATIC_TYPES = {"image", "stylesheet", "font", "media"}
+_STATIC_RX = re.compile(r"\.(png|jpe?g|gif|webp|avif|svg|ico|css|woff2?|ttf|otf|eot|mp4|webm|mp3)(\?|#|$)", re.I)
+
+def _parse_sample(spec: str):
+    """"REQ=0.1,RES=0.1" -> {"REQ": 0.1, "RES": 0.1}"""
+    out = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            k, v = part.split("=", 1)
+            try:
+                out[k.strip().upper()] = max(0.0, min(1.0, float(v)))
+            except ValueError:
+                pass
+    return out
+
+def _category(msg: str):
+    m = re.match(r"[A-Z][A-Z-]*", msg or "")
+    return m.group(0) if m else "MISC"
+
+def _default_level(cat: str):
+    if cat == "FAIL":
+        return "error"
+    if cat == "WARN":
+        return "warning"
+    if cat in ("REQ", "RES", "CONSOLE"):
+        return "debug"
+    return "info"
+
+class EventLog:
+    """Callable logger: log("STEP 1: ...") or log("REQ GET url", resource_type="image").
+    Category is the leading upper-case word of the message; level defaults from it.
+    Configure via EVENT_LOG_LEVEL, EVENT_LOG_SAMPLE ("REQ=0.1,RES=0.1") and
+    EVENT_LOG_STATIC=0 (drop REQ/RES for images, CSS, fonts and media).
+    """
+
+    def __init__(self, path, level=None, sample=None, keep_static=None, flush_interval=0.25):
+        self.path = path
+        self.min_level = LEVELS.get((level or os.getenv("EVENT_LOG_LEVEL", "debug")).lower(), 10)
+        self.sample = _parse_sample(os.getenv("EVENT_LOG_SAMPLE", "")) if sample is None else dict(sample)
+        if keep_static is None:
+            keep_static = os.getenv("EVENT_LOG_STATIC", "1").strip().lower() not in ("0", "false", "no", "off")
+        self.keep_static = keep_static
+        self.flush_interval = flush_interval
+        self._seen = {}
+        self._q = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._drain, name="eventlog-writer", daemon=True)
+        self._thread.start()
+
+    def _sampled_out(self, cat):
+        rate = self.sample.get(cat)
+        if rate is None or rate >= 1.0:
+            return False
+        # deterministic: keep floor(n*rate) of the first n events of the category
+        n = self._seen.get(cat, 0)
+        self._seen[cat] = n + 1
+        return int((n + 1) * rate) == int(n * rate)
+
+    def __call__(self, msg, level=None, category=None, **fields):
+        if self._closed:
+            return
+        cat = category or _category(msg)
+        lvl = level or _default_level(cat)
+        if LEVELS.get(lvl, 20) < self.min_level:
+            return
+        if cat in ("REQ", "RES") and not self.keep_static:
+            if fields.get("resource_type") in _STATIC_TYPES or _STATIC_RX.search(str(fields.get("url") or msg)):
+                return
+        if self._sampled_out(cat):
+            return
+        rec = {"ts": round(time.time(), 3), "level": lvl, "cat": cat, "msg": msg}
+        if fields:
+            rec.update(fields)
+        self._q.put(rec)
+
+    def _drain(self):
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                try:
+                    rec = self._q.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                batch = [rec]
+                while True:
+                    try:
+                        batch.append(self._q.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = False
+                for r in batch:
+                    if r is None:
+                        stop = True
+                        continue
+                    f.write(json.dumps(r, ensure_ascii=False, default=str) + "\n")
+                f.flush()
+                if stop:
+                    return
+
+    def close(self):
+        """Flush everything queued so far and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._q.put(None)
+        self._thread.join(timeout=10)
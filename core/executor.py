@@ -1,460 +1,311 @@
-import os, time, traceback, json, re
+import os, re, time
 from playwright.sync_api import sync_playwright, expect
-from .planner import plan_step
-from .healer import find_in_frames, combo_select, date_set, file_upload, find_input, find_clickable
-from .oracle import assert_url_contains, fuzzy_page_assertion
-
-def _safe_filename(prefix, idx):
-    return f"{prefix}_{idx:03d}.png"
-
-def _mklog(out_dir):
-    log_path = os.path.join(out_dir, "events.log")
-    def log(msg):
-        ts = time.strftime("%H:%M:%S")
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(f"[{ts}] {msg}\n")
-    return log
-
-def _safe(s: str, limit: int = 800):
-    s = str(s).replace("\r", "").replace("\x00", "")
-    return s if len(s) <= limit else s[:limit] + "…"
+from .planner import plan_step, plan_goal, remember_plan
+from .healer import find_in_frames, combo_select, date_set, file_upload, find_input, find_clickable, _find_checkbox, _find_radio, _hit
+from .oracle import assert_url_contains, judge_many
+from .assertions import check as check_claims
+from .snapshot import snapshot_for, install as install_snapshot
+from .noise import install as install_noise, dismiss as dismiss_noise
+from .waits import HIGHLIGHT_JS, fast_mode, settle, stable, text_changed
+from .replay import describe, pinned, first_pin, scripted_actions
+from .steps import (
+    Step, Verdicts, goal_dir, goal_scope, context_options, watch_page, replay_script, write_scripts,
+    is_url, radio_token, with_check_click, plan_window, stash_plans, first_target,
+    _mklog, _safe, _safe_filename, _save_state, _goal_outcome,
+    _CSS_RX, _MONTH_RX, _DAY_RX, _DATEPICKERS, _CAL_NEXT, _CAL_PREV, _CHOICE_CONTAINER,
+)
+from . import capture as cap
+from . import network as net
+from . import har as hm
+from . import metrics
+from .phases import phase, timed, mark_step
 
 def _highlight(el):
+    """Outline the element for one painted frame; skipped in fast mode."""
+    if fast_mode():
+        return
     try:
-        el.evaluate("e => { e.__old_outline = e.style.outline; e.style.outline='3px solid magenta' }")
-        time.sleep(0.05)
-        el.evaluate("e => { if(e.__old_outline!==undefined) e.style.outline=e.__old_outline }")
+        el.evaluate(HIGHLIGHT_JS)
     except:
         pass
 
-def _dismiss_noise(page):
-    selectors = [
-        "#onetrust-accept-btn-handler",
-        "button#onetrust-accept-btn-handler",
-        "button:has-text('Accept All')",
-        "button:has-text('I Accept')",
-        "text=/Accept All/i",
-        "[data-testid=close-toast]",
-        "button:has-text('Got it')",
-    ]
-    for sel in selectors:
-        try:
-            loc = page.locator(sel)
-            if loc.count() > 0 and loc.first.is_visible():
-                loc.first.click()
-                page.wait_for_timeout(150)
-        except:
-            pass
-
-def _find_checkbox(page, hint: str):
-    rx = re.compile(hint or "", re.I)
-    try:
-        loc = page.get_by_role("checkbox", name=rx)
-        if loc.count() > 0:
-            return loc.first
-    except:
-        pass
-    # Prefer direct input matches by name/aria-label
-    try:
-        loc = page.locator(
-            f"input[type='checkbox'][name*='{hint}' i], input[type='checkbox'][aria-label*='{hint}' i]"
-        ).first
-        if loc and loc.count() > 0:
-            return loc
-    except:
-        pass
-    try:
-        # Descendant input inside a matching label
-        loc = page.locator(
-            "xpath=(//label[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'), "
-            + f"'{(hint or '').lower()}')]//input[@type='checkbox'])[1]"
-        ).first
-        if loc and loc.count() > 0:
-            return loc
-    except:
-        pass
-    try:
-        # Nearby input before/after a matching label
-        loc = page.locator(
-            "xpath=(//label[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'), "
-            + f"'{(hint or '').lower()}')]/following::input[@type='checkbox'] | "
-            "//label[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'), "
-            + f"'{(hint or '').lower()}')]/preceding::input[@type='checkbox'])[1]"
-        ).first
-        if loc and loc.count() > 0:
-            return loc
-    except:
-        pass
-    try:
-        node = page.get_by_text(rx, exact=False).first
-        if node and node.count() > 0:
-            container = node.locator("xpath=ancestor-or-self::*[self::label or self::div or self::section or self::form][1]").first
-            if container and container.count() > 0:
-                cb = container.locator("input[type='checkbox']").first
-                if cb and cb.count() > 0:
-                    return cb
-    except:
-        pass
-    return None
-
 def _after_fill_settle(page, el):
     """Trigger validations that require blur/change."""
-    try:
-        el.dispatch_event("input")
+    try: el.dispatch_event("input")
     except: pass
-    try:
-        el.dispatch_event("change")
+    try: el.dispatch_event("change")
     except: pass
     try:
         el.blur()
     except:
+        try: page.keyboard.press("Tab")
+        except: pass
+
+def _retype(page, el, value):
+    """Select-all and type; for widgets that ignore fill() without key events."""
+    try:
+        el.click()
+        try: page.keyboard.press("Control+A")
+        except:
+            try: page.keyboard.press("Meta+A")
+            except: pass
+    except:
+        pass
+    page.keyboard.type(value or "", delay=20)
+
+def _click_in_datepicker(page, hint):
+    """Calendar-aware shortcuts inside an open datepicker; returns True if the click was handled."""
+    cal = next((c for c in (page.locator(sel).first for sel in _DATEPICKERS) if _hit(c, True)), None)
+    if not cal:
+        return False
+    mh = hint.strip()
+    if _MONTH_RX.match(mh):
+        # step next/prev (up to 24 months) until the title shows the requested month
+        for _ in range(24):
+            title = None
+            try: title = (cal.locator(".ui-datepicker-title").first.text_content() or "").strip()
+            except: pass
+            if title and re.search(re.escape(mh), title, re.I):
+                break
+            btn = next((b for b in (cal.locator(sel).first for sel in _CAL_NEXT + _CAL_PREV)
+                        if _hit(b) and b.is_enabled()), None)
+            if btn is None:
+                break
+            btn.click()
+            # wait for the calendar to re-render rather than a fixed delay
+            if not (title and text_changed(cal.locator(".ui-datepicker-title").first, title)):
+                settle(page)
+        return True
+    m = _DAY_RX.match(mh)
+    if m:
+        day = m.group(1)
+        cell = cal.locator(f".ui-datepicker-calendar td a:has-text('{day}')").first
+        if _hit(cell, True):
+            cell.click()
+            return True
+        cell = cal.get_by_text(re.compile(rf"^\s*{day}\s*$", re.I)).first
+        if _hit(cell):
+            cell.click()
+            return True
+    return False
+
+def _toggle_choice(page, el, hint):
+    """Checkbox/radio/switch normalization; returns True if the click was handled."""
+    itype = (el.get_attribute("type") or "").lower()
+    role = (el.get_attribute("role") or "").lower()
+    has_aria_checked = el.get_attribute("aria-checked") is not None
+    # If we didn't land on the <input>, look for it in the surrounding label/container
+    for kind in ("checkbox", "radio"):
+        if itype != kind:
+            try:
+                container = el.locator(_CHOICE_CONTAINER).first
+                if _hit(container):
+                    inp = container.locator(f"input[type='{kind}']").first
+                    if _hit(inp):
+                        el, itype = inp, kind
+            except:
+                pass
+    if itype == "checkbox":
         try:
-            page.keyboard.press("Tab")
+            el.check()
+            try:
+                if not el.is_checked():
+                    el.check(force=True)
+            except: pass
+            return True
         except:
-            pass
-
-def _run_action(page, atype, target, value):
-    if atype == "navigate":
-        dest = (value or target or "").strip()
-        # Skip non-URL frame hints like "iframe" / "top-level document" or any non-URL human hint
+            # Fallback to clicking the associated label
+            try:
+                lbl = el.locator("xpath=ancestor::label[1]").first
+                if _hit(lbl):
+                    lbl.click()
+                    return True
+            except: pass
+    if itype == "radio" or role == "radio":
         try:
-            import re as _re
-            is_url = bool(_re.match(r"^(https?://|file://|about:|data:|/|[a-z0-9.-]+\.[a-z]{2,})", dest, _re.I))
-            if not is_url:
-                return None
+            el.check()
+            try:
+                if not el.is_checked():
+                    lbl = el.locator("xpath=ancestor::label[1]").first
+                    if _hit(lbl):
+                        lbl.click()
+            except: pass
+            return True
+        except:
+            try:
+                lbl = el.locator("xpath=ancestor::label[1]").first
+                if _hit(lbl):
+                    lbl.click()
+                    return True
+            except: pass
+        # Final fallback: select by value token (male/female)
+        try:
+            token = radio_token(hint)
+            if token:
+                alt = page.locator(f"input[type='radio'][value*='{token}' i]").first
+                if _hit(alt):
+                    alt.check()
+                    return True
         except: pass
+    elif role in ("checkbox", "switch") or has_aria_checked:
+        # ARIA widgets that toggle via click
+        el.click()
+        return True
+    return False
+
+def _wait_for_hint(page, hint):
+    """wait_for_selector on a human hint: robust finders first, then CSS or text."""
+    el = None
+    for finder in (find_input, _find_checkbox, find_in_frames):
+        try:
+            el = finder(page, hint)
+        except:
+            el = None
+        if el:
+            break
+    if el is not None:
+        try:
+            el = el.first
+            try: el.scroll_into_view_if_needed()
+            except: pass
+            el.wait_for(state="visible")
+        except:
+            page.wait_for_selector(hint, state="visible")
+        return
+    if _CSS_RX.match(hint):
+        # top-level first, then frames
+        for scope in [page] + list(page.frames):
+            try:
+                loc = scope.locator(hint).first
+                if loc.count() > 0:
+                    loc.wait_for(state="visible")
+                    return
+            except:
+                pass
+        return
+    try:
+        page.get_by_text(re.compile(hint, re.I)).first.wait_for(state="visible")
+    except:
+        page.wait_for_selector(hint, state="visible")
+
+def _remember(page, resolved, el, prefix=""):
+    """Record the selector of the element an action used (for the replay script).
+    Locators from the resolver or a replay pin already carry it; only the rest cost
+    an extra evaluate."""
+    if resolved is None or el is None:
+        return
+    d = snapshot_for(page).pin_of(el) or describe(el)
+    if d:
+        resolved[prefix + "selector"] = d["selector"]
+        if d["frame"]:
+            resolved[prefix + "frame"] = d["frame"]
+
+@timed("act")
+def _run_action(page, atype, target, value, pin=None, resolved=None):
+    """Execute one planned action. `pin` is a replayed action whose recorded selectors
+    are tried before the healer; selectors of the elements used go into `resolved`.
+    """
+    if atype == "navigate":
+        dest = (value or target or "").strip()
+        if not is_url(dest):
+            return None
         page.goto(dest, wait_until="networkidle")
 
     elif atype == "click":
         hint = (target or value or "")
-        # Calendar-aware shortcuts: operate inside an open datepicker if present
         try:
-            import re as _re
-            containers = [
-                page.locator(".ui-datepicker:visible").first,
-                page.locator(".ui-datepicker-div").first,
-                page.locator(".datepick").first,
-            ]
-            cal = None
-            for c in containers:
-                try:
-                    if c and c.count() > 0 and c.first.is_visible():
-                        cal = c
-                        break
-                except:
-                    pass
-            if cal:
-                mh = hint.strip()
-                # Match Month YYYY
-                if _re.match(r"^(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{4}$", mh, _re.I):
-                    # Try up to 24 next/prev steps to reach requested month/year
-                    for _ in range(24):
-                        title = None
-                        try:
-                            title = (cal.locator(".ui-datepicker-title").first.text_content() or "").strip()
-                        except:
-                            pass
-                        if title and _re.search(_re.escape(mh), title, _re.I):
-                            break
-                        # Prefer Next button
-                        clicked = False
-                        for sel in [".ui-datepicker-next", "button[aria-label*='Next' i]", "button:has-text('›')"]:
-                            btn = cal.locator(sel).first
-                            if btn and btn.count() > 0 and btn.is_enabled():
-                                btn.click()
-                                clicked = True
-                                break
-                        if not clicked:
-                            for sel in [".ui-datepicker-prev", "button[aria-label*='Prev' i]", "button:has-text('‹')"]:
-                                btn = cal.locator(sel).first
-                                if btn and btn.count() > 0 and btn.is_enabled():
-                                    btn.click()
-                                    clicked = True
-                                    break
-                        page.wait_for_timeout(120)
-                    return None
-                # Match day like "15" or full date like "15 March 2026"
-                if _re.match(r"^\d{1,2}(\s+[A-Za-z]+\s+\d{4})?$", mh):
-                    day = _re.match(r"^(\d{1,2})", mh).group(1)
-                    # Prefer anchor cells
-                    cell = cal.locator(f".ui-datepicker-calendar td a:has-text('{day}')").first
-                    if cell and cell.count() > 0 and cell.is_visible():
-                        cell.click()
-                        return None
-                    cell = cal.get_by_text(_re.compile(f"^\s*{day}\s*$", _re.I)).first
-                    if cell and cell.count() > 0:
-                        cell.click()
-                        return None
+            if _click_in_datepicker(page, hint):
+                return None
         except:
             pass
-
-        try:
-            el = _find_checkbox(page, hint)
-        except:
-            el = None
-        if not el:
-            try:
-                from .healer import _find_radio as _find_radio_local
-                el = _find_radio_local(page, hint)
-            except:
-                el = None
-        if not el:
-            el = find_clickable(page, hint)
-        if not el or (hasattr(el, "count") and el.count() == 0):
-            el = find_in_frames(page, hint)
+        el = pinned(page, pin)
+        if el is None:
+            for finder in (_find_checkbox, _find_radio, find_clickable, find_in_frames):
+                try:
+                    el = finder(page, hint)
+                except:
+                    el = None
+                if el:
+                    break
         if not el:
             raise RuntimeError(f"Target not found for click: {target}")
-
+        _remember(page, resolved, el)
         try: el.scroll_into_view_if_needed()
         except: pass
         _highlight(el)
         try: el.wait_for(state="visible", timeout=5000)
         except: pass
-
-        # Normalize and harden checkbox/switch interactions
         try:
-            itype = (el.get_attribute("type") or "").lower()
-            role = (el.get_attribute("role") or "").lower()
-            has_aria_checked = (el.get_attribute("aria-checked") is not None)
-
-            # If we didn't land on the <input type=checkbox>, try to find it near the element
-            if itype != "checkbox":
-                try:
-                    container = el.locator("xpath=ancestor-or-self::*[self::label or self::div or self::section][1]").first
-                    if container and container.count() > 0:
-                        cb = container.locator("input[type='checkbox']").first
-                        if cb and cb.count() > 0:
-                            el = cb
-                            itype = "checkbox"
-                except:
-                    pass
-            # If we didn't land on the <input type=radio>, try to find it near the element
-            if itype != "radio":
-                try:
-                    container = el.locator("xpath=ancestor-or-self::*[self::label or self::div or self::section][1]").first
-                    if container and container.count() > 0:
-                        rd = container.locator("input[type='radio']").first
-                        if rd and rd.count() > 0:
-                            el = rd
-                            itype = "radio"
-                except:
-                    pass
-
-            if itype == "checkbox":
-                try:
-                    el.check()
-                    try:
-                        # Verify state stuck
-                        if hasattr(el, "is_checked") and not el.is_checked():
-                            el.check(force=True)
-                    except:
-                        pass
-                    return None
-                except:
-                    # Fallback to clicking the associated label/container
-                    try:
-                        anc_label = el.locator("xpath=ancestor::label[1]").first
-                        if anc_label and anc_label.count() > 0:
-                            anc_label.click()
-                            return None
-                    except:
-                        pass
-            # Radios: click and verify checked; fallback to label
-            if itype == "radio" or role == "radio":
-                try:
-                    el.check()
-                    try:
-                        if hasattr(el, "is_checked") and not el.is_checked():
-                            lbl = el.locator("xpath=ancestor::label[1]").first
-                            if lbl and lbl.count() > 0:
-                                lbl.click()
-                                # re-verify
-                                try:
-                                    if hasattr(el, "is_checked") and not el.is_checked():
-                                        raise Exception("radio not checked after label click")
-                                except:
-                                    pass
-                    except:
-                        pass
-                    return None
-                except:
-                    try:
-                        lbl = el.locator("xpath=ancestor::label[1]").first
-                        if lbl and lbl.count() > 0:
-                            lbl.click()
-                            return None
-                    except:
-                        pass
-                # Final fallback: select by value token (male/female)
-                try:
-                    token = None
-                    hl = (hint or "").lower()
-                    if "male" in hl:
-                        token = "male"
-                    elif "female" in hl or "fe male" in hl or "feMale" in (hint or ""):
-                        token = "female"
-                    if token:
-                        alt = page.locator(f"input[type='radio'][value*='{token}' i]").first
-                        if alt and alt.count() > 0:
-                            alt.check()
-                            return None
-                except:
-                    pass
-            elif role in ("checkbox", "switch") or has_aria_checked:
-                # ARIA widgets that toggle via click
-                el.click()
+            if _toggle_choice(page, el, hint):
                 return None
         except:
             pass
-
         try:
             el.click(timeout=8000)
         except Exception as e:
             try:
                 el.click(timeout=8000, force=True)
             except:
-                try:
-                    el.evaluate("e => e.click()")
-                except:
-                    raise e
+                try: el.evaluate("e => e.click()")
+                except: raise e
 
     elif atype == "fill":
-        el = find_input(page, target or "")
-        if not el:
-            el = find_in_frames(page, target or "")
+        el = pinned(page, pin) or find_input(page, target or "") or find_in_frames(page, target or "")
         if not el:
             raise RuntimeError(f"Target not found for fill: {target}")
-
+        _remember(page, resolved, el)
         # Ensure the element is in view before interacting (stabilizes floating-label inputs)
         try: el.scroll_into_view_if_needed()
         except: pass
-
         _highlight(el)
         try: el.wait_for(state="visible", timeout=5000)
         except: pass
         try: el.click(timeout=2000)
         except: pass
-        time.sleep(0.25)
+        stable(el)  # floating labels / focus animations
         try:
             el.fill(value or "")
         except Exception:
-            try:
-                el.click()
-                try: page.keyboard.press("Control+A")
-                except:
-                    try: page.keyboard.press("Meta+A")
-                    except: pass
-            except:
-                pass
-            page.keyboard.type(value or "", delay=20)
-
+            _retype(page, el, value)
         # Verify the value actually stuck; some widgets ignore fill() without key events
         try:
-            current_val = el.evaluate("e => e.value")
-            if (value or "") != (current_val or ""):
-                try:
-                    el.click()
-                    try: page.keyboard.press("Control+A")
-                    except:
-                        try: page.keyboard.press("Meta+A")
-                        except: pass
-                except:
-                    pass
-                page.keyboard.type(value or "", delay=20)
+            if (value or "") != (el.evaluate("e => e.value") or ""):
+                _retype(page, el, value)
         except:
-            # Ignore evaluation issues and proceed
             pass
-
         _after_fill_settle(page, el)  # ← ensure validation sees the value
 
     elif atype == "press":
         page.keyboard.press(value or "Enter")
 
     elif atype == "select":
-        el = find_in_frames(page, target or "")
+        el = pinned(page, pin) or find_in_frames(page, target or "")
         if not el: raise RuntimeError(f"Target not found for select: {target}")
+        _remember(page, resolved, el)
         el.select_option(value)
 
     elif atype == "wait_for":
-        page.wait_for_timeout(int(value) if str(value).isdigit() else 300)
+        if str(value).isdigit():
+            page.wait_for_timeout(int(value))
+        else:
+            settle(page)
 
     elif atype == "wait_for_selector":
         hint = (value or target or "").strip()
         if not hint:
-            page.wait_for_timeout(300)
+            settle(page)
         else:
-            # Interpret human hint using robust resolvers first
-            el = None
-            try:
-                el = find_input(page, hint)
-            except:
-                pass
-            if not el:
-                try:
-                    el = _find_checkbox(page, hint)
-                except:
-                    pass
-            if not el:
-                try:
-                    el = find_in_frames(page, hint)
-                except:
-                    pass
-            if el is not None:
-                try:
-                    # Normalize to a single locator and wait for visibility
-                    try:
-                        if hasattr(el, "count") and el.count() > 0:
-                            el = el.first
-                    except:
-                        pass
-                    try: el.scroll_into_view_if_needed()
-                    except: pass
-                    el.wait_for(state="visible")
-                except:
-                    # As a last resort, fall back to raw selector-based wait
-                    page.wait_for_selector(hint, state="visible")
-            else:
-                # No element resolved via heuristics; fall back to raw selector/text
-                tried = False
-                # If hint looks like a CSS selector, search across frames
-                try:
-                    import re as _re
-                    if _re.match(r"^[a-z0-9_\-\.#\[\]=:>'\"\s]+$", hint, _re.I):
-                        # top-level first
-                        loc = page.locator(hint).first
-                        if loc.count() > 0:
-                            loc.wait_for(state="visible")
-                            return None
-                        # then frames
-                        for fr in page.frames:
-                            try:
-                                loc = fr.locator(hint).first
-                                if loc.count() > 0:
-                                    loc.wait_for(state="visible")
-                                    return None
-                            except:
-                                pass
-                        tried = True
-                except:
-                    pass
-                if not tried:
-                    try:
-                        import re as _re
-                        node = page.get_by_text(_re.compile(hint, _re.I)).first
-                        node.wait_for(state="visible")
-                    except:
-                        page.wait_for_selector(hint, state="visible")
+            _wait_for_hint(page, hint)
 
     elif atype == "assert_url_contains":
         ok, _ = assert_url_contains(page, value or target)
         if not ok: raise AssertionError(f"URL does not contain {value or target}")
 
     elif atype == "assert_text":
-        el = find_in_frames(page, target or "")
+        el = pinned(page, pin) or find_in_frames(page, target or "")
         if not el: raise RuntimeError(f"Target not found for assert_text: {target}")
-        try: el = el.first
-        except: pass
-        expect(el).to_be_visible()
+        _remember(page, resolved, el)
+        expect(el.first).to_be_visible()
 
     elif atype == "combo_select":
         combo_select(page, target or "", value or "")
@@ -466,18 +317,22 @@ def _run_action(page, atype, target, value):
         file_upload(page, target or "upload", value)
 
     elif atype == "hover":
-        el = find_in_frames(page, target or "")
+        el = pinned(page, pin) or find_in_frames(page, target or "")
+        _remember(page, resolved, el)
         _highlight(el)
         el.hover()
 
     elif atype == "scroll_into_view":
-        el = find_in_frames(page, target or "")
+        el = pinned(page, pin) or find_in_frames(page, target or "")
+        _remember(page, resolved, el)
         _highlight(el)
         el.scroll_into_view_if_needed()
 
     elif atype == "drag_and_drop":
-        src = find_in_frames(page, target or "")
-        dst = find_in_frames(page, value or "")
+        src = pinned(page, pin) or find_in_frames(page, target or "")
+        dst = pinned(page, pin, "value_selector", "value_frame") or find_in_frames(page, value or "")
+        _remember(page, resolved, src)
+        _remember(page, resolved, dst, "value_")
         _highlight(src); _highlight(dst)
         src.drag_to(dst)
 
@@ -486,144 +341,216 @@ def _run_action(page, atype, target, value):
 
     return None
 
-def run_goal(name, url, steps, assertions, headless=True):
-    session_ts = int(time.time())
-    out_dir = os.path.join("runs", f"{name.replace(' ','_')}_{session_ts}")
-    os.makedirs(out_dir, exist_ok=True)
-
+def _target_resolves(page, atype, hint):
+    try:
+        if atype == "click":
+            el = _find_checkbox(page, hint) or find_clickable(page, hint) or find_in_frames(page, hint)
+        elif atype == "fill":
+            el = find_input(page, hint) or find_in_frames(page, hint)
+        else:
+            el = find_in_frames(page, hint)
+        return el is not None and el.count() > 0
+    except Exception:
+        return False
+
+def _plan(page, html, i, steps, base_url, pending, plan_ahead, log):
+    """Actions for step i: a still-valid look-ahead plan if we have one, else plan_step.
+    With plan_ahead > 0 a miss on `pending` fetches plans for the next `plan_ahead`
+    steps in one LLM call. A look-ahead plan is trusted when its first element-targeting
+    action resolves on the live page (core.steps.first_target).
+    """
+    desc = steps[i-1]["description"]
+    acts, ahead = pending.pop(i, None), True  # ahead: planned before this step's page existed
+    if plan_ahead and acts is None:
+        try:
+            acts, ahead = stash_plans(plan_goal(html, plan_window(steps, i, plan_ahead), base_url), i, pending, log), False
+        except Exception as e:
+            log(f"WARN {i}: plan-ahead failed: {_safe(e)}")
+    if acts:
+        first = first_target(acts)
+        if first is None or _target_resolves(page, *first):
+            if ahead:
+                remember_plan(html, desc, base_url, acts)
+            return acts
+        log(f"PLAN {i}: look-ahead plan does not resolve on the live page; re-planning")
+    return plan_step(html, desc, base_url)
+
+def _replay_still_valid(page, actions):
+    """A replayed step is trusted when its first recorded selector still matches."""
+    a = first_pin(actions)
+    return a is None or pinned(page, a) is not None
+
+@timed("launch")
+def _launch_browser(p, headless=True):
+    launch_args = {}
+    if not headless:
+        launch_args["args"] = ["--start-maximized", "--window-size=1920,1080"]
+    t0 = time.perf_counter()
+    browser = p.chromium.launch(headless=headless, **launch_args)
+    metrics.inc("browser_launches_total")
+    metrics.observe("browser_launch_seconds", time.perf_counter() - t0)
+    return browser
+
+def run_goal(name, url, steps, assertions, headless=True, browser=None, out_dir=None, plan_ahead=0, replay=False, fast=None,
+             capture=None, storage_state=None, save_state=None, network=None, har=None):
+    """Run one goal and return (out_dir, step_records, assertion_records).
+    When `browser` is given it is reused (suite mode) and left open; otherwise a
+    fresh Chromium is launched and closed for this goal.
+    `plan_ahead=N` plans N steps per LLM call and re-plans a step only when its
+    look-ahead actions no longer resolve on the live page.
+    `replay=True` executes the goal's replay script (core.replay) and only plans
+    steps whose recorded selectors no longer match. Every run writes the executed
+    actions to out_dir/replay.json; a green run also refreshes the goal's script.
+    `fast=True` skips cosmetic element highlighting (default: FAST_MODE env).
+    `capture` sets the trace/video/screenshot policies (core.capture spec).
+    `storage_state` starts the context from a saved state file (core.session);
+    `save_state` writes the context's state there when the run is green.
+    `network` is the goal's request policy (core.network: blocking, static cache).
+    `har="record"` saves the run's traffic as a HAR; `har="replay"` serves all traffic from
+    it and plans from the replay script and plan cache only (core.har).
+    """
+    out_dir = goal_dir(name, out_dir)
     log = _mklog(out_dir)
-    step_records = []
-    assertion_records = []
+    pol = cap.policy(capture)
+    har = hm.mode(har)
+    replay = replay or har == "replay"
+    with goal_scope(out_dir, log, fast, har) as goal:
+        if browser is not None:
+            step_records, assertion_records = _run_in_browser(browser, headless, out_dir, log, name, url, steps, assertions, plan_ahead, replay, pol,
+                                                              storage_state, save_state, network, har)
+        else:
+            with sync_playwright() as p:
+                browser = _launch_browser(p, headless)
+                try:
+                    step_records, assertion_records = _run_in_browser(browser, headless, out_dir, log, name, url, steps, assertions, plan_ahead, replay, pol,
+                                                                      storage_state, save_state, network, har)
+                finally:
+                    browser.close()
+        goal["outcome"] = _goal_outcome(step_records, assertion_records)
 
-    with sync_playwright() as p:
-        launch_args = {}
-        if not headless:
-            launch_args["args"] = ["--start-maximized", "--window-size=1920,1080"]
-        browser = p.chromium.launch(headless=headless, **launch_args)
+    return out_dir, step_records, assertion_records
 
-        # In headed mode, inherit the OS window size for maximum fidelity (viewport=None)
-        # In headless, keep a fixed viewport for deterministic layout
-        if not headless:
-            context = browser.new_context(record_video_dir=out_dir, viewport=None)
+def _run_in_browser(browser, headless, out_dir, log, name, url, steps, assertions, plan_ahead, replay, pol,
+                    storage_state=None, save_state=None, network=None, har=None):
+    step_records = []
+    assertion_records = []
+    pending = {}
+    script = replay_script(name, replay, log)
+    executed = []
+    failed = True
+    routing = None
+    misses = None  # HAR replay: requests the recording could not answer
+
+    with phase("launch"):
+        context = browser.new_context(**context_options(pol, out_dir, har, storage_state, headless, log))
+    try:
+        cap.start(context, pol)
+        install_noise(context)
+        install_snapshot(context)
+        if har == "replay":
+            misses = hm.replay(context, name, log)  # already offline; no blocking/caching on top
         else:
-            context = browser.new_context(record_video_dir=out_dir, viewport={"width":1280, "height":800})
-        context.tracing.start(screenshots=True, snapshots=True, sources=True)
-
-        page = context.new_page()
-        page.on("console", lambda m: log(f"CONSOLE[{m.type}] {m.text}"))
-        page.on("request", lambda r: log(f"REQ {r.method} {r.url}"))
-        page.on("response", lambda r: log(f"RES {r.status} {r.url}"))
+            routing = net.install(context, net.policy(url, network), url, log)
 
-        page.set_default_timeout(10_000)
-        page.set_default_navigation_timeout(20_000)
-        # Only enforce a viewport in headless; headed inherits maximized window size
-        if headless:
-            page.set_viewport_size({"width":1280,"height":800})
+        with phase("launch"):
+            page = context.new_page()
+        watch_page(page, log)
 
         if url:
             log(f"INIT navigate -> {url}")
-            page.goto(url, wait_until="domcontentloaded")
+            with phase("act"):
+                page.goto(url, wait_until="domcontentloaded")
 
         for i, s in enumerate(steps, start=1):
-            desc = s["description"]
-            started = time.time()
-            screenshot_path = None
-            status = "pass"
-            error = None
-            notes = None
+            mark_step(i)
+            step = Step(i, s["description"])
+            cap.chunk(context, pol)
 
             try:
-                _dismiss_noise(page)
-                log(f"STEP {i}: {desc}")
-
-                actions = plan_step(page.content(), desc, url or page.url)
-                plan_json = json.dumps(actions, ensure_ascii=False)
-                log(f"PLAN {i}: {plan_json}")
-                notes = f"AI plan: {plan_json}"
-
-                # Safeguard: if the step asks to "check" but no click is planned, inject a click
-                try:
-                    dl = (desc or "").lower()
-                    needs_check = ("check" in dl)
-                    has_click = any((a.get("type") or "").lower() == "click" for a in (actions or []))
-                    if needs_check and not has_click:
-                        import re as _re
-                        m = _re.search(r"'([^']+)'|\"([^\"]+)\"", desc or "")
-                        target_label = (m.group(1) or m.group(2)) if m else "privacy"
-                        actions = ([{"type":"click","target":target_label}] + (actions or []))[:10]
-                        log(f"PLAN {i} UPDATED: injected click for check -> {target_label}")
-                except:
-                    pass
+                snap = snapshot_for(page)
+                with phase("noise"):
+                    dismissed = dismiss_noise(page, log)
+                if dismissed:
+                    snap.invalidate()
+                log(f"STEP {i}: {step.desc}")
+
+                actions = scripted_actions(script, i, step.desc)
+                if actions and not _replay_still_valid(page, actions):
+                    log(f"REPLAY {i}: recorded selectors no longer match; re-planning")
+                    actions = None
+                if actions:
+                    step.planned(actions, True, log)
+                else:
+                    with phase("plan"):
+                        step.html = snap.digest()
+                        actions = _plan(page, step.html, i, steps, url or page.url, pending, plan_ahead, log)
+                    step.planned(actions, False, log)
+                actions = with_check_click(step.desc, actions, log, i)
 
                 for act in actions:
-                    atype = (act.get("type") or "").strip()
-                    target = (act.get("target") or "").strip()
-                    value = act.get("value")
-                    log(f"EXEC {i}: type={atype} target={target} value={value}")
-
-                    if not atype:
-                        log(f"SKIP {i}: missing action type"); continue
-                    if atype not in {
-                        "navigate","click","fill","press","wait_for","wait_for_selector",
-                        "assert_text","assert_url_contains","select","combo_select",
-                        "date_set","file_upload","hover","scroll_into_view","drag_and_drop"
-                    }:
-                        log(f"SKIP {i}: unknown action type: {atype}"); continue
-                    if atype not in {"press","wait_for"} and not target and not value:
-                        log(f"SKIP {i}: empty target/value"); continue
-
-                    err = _run_action(page, atype, target, value)
-                    if err:
-                        log(f"WARN {i}: {_safe(err)}")
-                        notes = (notes + "\n" + err) if notes else err
-
-                screenshot_path = os.path.join(out_dir, _safe_filename("step", i))
-                page.screenshot(path=screenshot_path, full_page=False)
+                    todo = step.begin(act, log)
+                    if todo is None:
+                        continue
+                    atype, target, value, resolved = todo
+                    err = _run_action(page, atype, target, value, pin=act, resolved=resolved)
+                    step.ran(atype, resolved, err, snap, log)
+
+                if cap.step_screenshot(pol):
+                    step.screenshot = os.path.join(out_dir, _safe_filename("step", i))
+                    with phase("screenshot"):
+                        page.screenshot(path=step.screenshot, full_page=False)
 
             except Exception as e:
-                status = "fail"
-                tb = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
-                log(f"FAIL {i}: {_safe(tb)}")
-                error = tb
-                screenshot_path = os.path.join(out_dir, _safe_filename("step_fail", i))
-                try: page.screenshot(path=screenshot_path, full_page=False)
-                except: pass
+                step.fail(e, url or page.url, log)
+                if pol["screenshots"] != "off":
+                    step.screenshot = os.path.join(out_dir, _safe_filename("step_fail", i))
+                    try:
+                        with phase("screenshot"):
+                            page.screenshot(path=step.screenshot, full_page=False)
+                    except: step.screenshot = None
             finally:
-                step_records.append({
-                    "index": i,
-                    "description": desc,
-                    "status": status,
-                    "error": error,
-                    "screenshot": os.path.relpath(screenshot_path, out_dir) if screenshot_path else None,
-                    "elapsed_ms": int((time.time()-started)*1000),
-                    "notes": notes
-                })
-
-        for j, a in enumerate(assertions, start=1):
-            started = time.time()
-            text = a
-            passed = True
-            explain = ""
+                cap.chunk_end(context, pol, out_dir, f"step_{i}", step.status == "fail")
+                record, entry = step.end(out_dir)
+                step_records.append(record)
+                executed.append(entry)
+
+        mark_step(None)
+        cap.chunk(context, pol)
+        # compiled claims are checked on the live page together; the rest share one
+        # digest and are judged by the LLM oracle in batched, parallel calls
+        verdicts = Verdicts(assertions)
+        try:
+            with phase("assert"):
+                compiled = check_claims(page, assertions)
+        except Exception as e:
+            log(f"WARN assertion checks failed: {_safe(e)}")
+            compiled = {}
+        fuzzy = verdicts.checked(compiled, log)
+        if fuzzy and har == "replay":
+            verdicts.offline(log)
+        elif fuzzy:
             try:
-                if text.lower().startswith("url contains"):
-                    frag = text.split("contains",1)[1].strip(" '\"")
-                    passed, explain = assert_url_contains(page, frag)
-                else:
-                    passed, explain = fuzzy_page_assertion(page, text)
+                with phase("assert"):
+                    verdicts.judged(judge_many(snapshot_for(page).digest(), fuzzy))
             except Exception as e:
-                passed = False
-                explain = f"{type(e).__name__}: {e}"
-            assertion_records.append({
-                "index": j,
-                "text": text,
-                "passed": bool(passed),
-                "explanation": explain,
-                "elapsed_ms": int((time.time()-started)*1000)
-            })
-
-        trace_zip = os.path.join(out_dir, "trace.zip")
-        context.tracing.stop(path=trace_zip)
-        context.close()
-        browser.close()
+                verdicts.judge_failed(e)
+        assertion_records = verdicts.records()
+        if misses:
+            assertion_records.append(hm.miss_record(misses, len(assertion_records) + 1))
+
+        failed = _goal_outcome(step_records, assertion_records) != "pass"
+        cap.chunk_end(context, pol, out_dir, "assertions", not all(r["passed"] for r in assertion_records))
+        cap.stop(context, pol, out_dir, failed)
+        if save_state and not failed:
+            _save_state(context.storage_state(), save_state)
+            log(f"STATE storage_state -> {save_state}")
+        write_scripts(out_dir, name, url, executed, not failed, log)
+    finally:
+        if routing:
+            log(f"NET {routing.summary()}")
+        try: context.close()
+        except: pass
+        cap.prune(out_dir, pol, failed, step_records)
+        hm.keep(har, out_dir, name, failed, log)
 
-    return out_dir, step_records, assertion_records
+    return step_records, assertion_records
@@ -0,0 +1,94 @@
+import os, re, shutil
+
+# ---- HAR record / replay ----
+# `har="record"` records the goal's traffic into out_dir/network.har.zip; a green run
+# copies it to runs/har/<goal>.har.zip next to the replay script and plan cache
+# entries the same run produced. `har="replay"` serves every request from that file
+# via route_from_har (unmatched requests fall back to a route that books and aborts
+# them: never sent to the network, and they fail the goal), executes the replay script and plans from the plan cache only
+# (core.planner.CACHE_ONLY). Assertions the engine cannot compile fail as well: the
+# oracle would need the LLM.
+HAR_DIR = os.getenv("HAR_DIR", os.path.join("runs", "har"))
+MODES = ("record", "replay")
+_RECORDED = "network.har.zip"
+
+def har_path(name: str):
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", (name or "goal").strip()).strip("_") or "goal"
+    return os.path.join(HAR_DIR, f"{slug}.har.zip")
+
+def mode(har):
+    if har in (None, "", "off"):
+        return None
+    if har not in MODES:
+        raise ValueError(f"har must be one of {MODES}, got {har!r}")
+    return har
+
+def context_options(har, out_dir):
+    """new_context() kwargs: record the HAR while recording."""
+    if har != "record":
+        return {}
+    return {"record_har_path": os.path.join(out_dir, _RECORDED), "record_har_mode": "full"}
+
+def _source(name):
+    path = har_path(name)
+    if not os.path.exists(path):
+        raise RuntimeError(f"no HAR for goal '{name}' at {path}; run it once with --har record")
+    return path
+
+def _miss(misses, log):
+    # Registered before route_from_har(not_found="fallback"): Playwright tries the
+    # newest route first, so only requests the HAR has no entry for get here. The run
+    # diverged from the recording, so the request is booked as a miss and aborted.
+    def on(route):
+        r = route.request
+        misses.append(f"{r.method} {r.url}")
+        log(f"HAR miss {r.method} {r.url}", url=r.url)
+        return route.abort()
+    return on
+
+def replay(context, name, log):
+    """Serve the context from the goal's HAR; returns the list HAR misses are added to."""
+    path = _source(name)
+    misses = []
+    context.route("**/*", _miss(misses, log))
+    context.route_from_har(path, not_found="fallback")
+    log(f"HAR replay <- {path}")
+    return misses
+
+async def replay_async(context, name, log):
+    path = _source(name)
+    misses = []
+    await context.route("**/*", _miss(misses, log))  # Playwright awaits the returned route.abort()
+    await context.route_from_har(path, not_found="fallback")
+    log(f"HAR replay <- {path}")
+    return misses
+
+def miss_record(misses, index):
+    """Failing assertion record for a replay that requested URLs missing from the HAR."""
+    shown = ", ".join(misses[:3]) + (f" (+{len(misses) - 3} more)" if len(misses) > 3 else "")
+    return {
+        "index": index,
+        "text": "HAR replay: every request is in the recording",
+        "passed": False,
+        "explanation": f"{len(misses)} request(s) not in the recording: {shown}. Re-record with --har record.",
+        "elapsed_ms": 0
+    }
+
+def keep(har, out_dir, name, failed, log):
+    """After context.close() (which writes the HAR): promote a green recording."""
+    if har != "record":
+        return None
+    src = os.path.join(out_dir, _RECORDED)
+    if failed or not os.path.exists(src):
+        return None
+    dst = har_path(name)
+    try:
+        os.makedirs(HAR_DIR, exist_ok=True)
+        tmp = dst + ".tmp"
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+        log(f"HAR saved: {dst}")
+        return dst
+    except Exception as e:
+        log(f"WARN HAR not saved: {e}")
+        return None
@@ -1,7 +1,11 @@
-import re
+import re, time
 from datetime import datetime
 from playwright.sync_api import Page
-from .util import load_aliases, update_aliases
+from .util import load_aliases, update_aliases, host_of
+from . import resolver, healstats
+from .waits import settle
+from .snapshot import snapshot_for
+from .phases import timed
 
 # -------- basic strategies --------
 def _by_accessibility(page: Page, hint: str):
@@ -48,86 +52,138 @@ def _fallback_xpath(page: Page, hint: str):
     except:
         return None
 
+def _hit(loc, visible=False):
+    """True if the locator matches (and, optionally, its first match is visible)."""
+    try:
+        if not loc or loc.count() == 0:
+            return False
+        return loc.first.is_visible() if visible else True
+    except:
+        return False
+
+def _first_match(cands):
+    """First candidate locator that matches (its .first), or None."""
+    try:
+        for loc in cands:
+            if _hit(loc):
+                return loc.first
+    except:
+        pass
+    return None
+
 # -------- high-level finders --------
+# structured signals first, generic text LAST
+_TARGET_STRATEGIES = (
+    _by_accessibility,
+    _by_label,
+    _by_placeholder,
+    _by_testid,
+    _by_text,
+    _fallback_xpath,
+)
+
 def find_target(page: Page, hint: str):
     """Prefer structured signals first, generic text LAST."""
-    strategies = (
-        _by_accessibility,
-        _by_label,
-        _by_placeholder,
-        _by_testid,
-        _by_text,
-        _fallback_xpath,
-    )
-    for strat in strategies:
+    for strat in _TARGET_STRATEGIES:
         el = strat(page, hint)
         if el and el.count() > 0:
             return el
     return None
 
+@timed("resolve")
 def find_in_frames(page: Page, hint: str):
+    if resolver.ENABLED:
+        try:
+            return _resolve_in_frames(page, hint)
+        except Exception:
+            pass  # fall back to per-strategy probing
     el = find_target(page, hint)
-    if el and el.count() > 0:
+    if el:
         return el
     for fr in page.frames:
         try:
-            el = (_by_accessibility(fr, hint) or _by_label(fr, hint) or _by_placeholder(fr, hint) or
-                  _by_testid(fr, hint) or _by_text(fr, hint) or _fallback_xpath(fr, hint))
-            if el and el.count() > 0:
+            el = find_target(fr, hint)
+            if el:
                 return el
         except:
             pass
     return None
 
+def _resolve_in_frames(page: Page, hint: str):
+    """One in-page resolution per frame (main document first)."""
+    scopes = [page] + [fr for fr in page.frames if fr != page.main_frame]
+    for scope in scopes:
+        try:
+            loc, _ = _resolve(page, scope, hint, "target")
+        except Exception:
+            if scope is page:
+                raise
+            continue  # detached/cross-process frame hiccup: skip it
+        if loc is not None:
+            return loc
+    return None
+
+def _alias_selectors(page: Page, hint: str):
+    try:
+        sel = load_aliases(page.url).get((hint or "").lower())
+    except Exception:
+        return []
+    if not sel:
+        return []
+    return sel if isinstance(sel, list) else [sel]
+
 # -------- input-specific resolution for fill() --------
-def _input_guessers(page: Page, hint: str):
-    h = hint.lower()
-    cands = []
+def _guess_selectors(hint: str):
+    h = (hint or "").lower()
+    sels = []
     if "username" in h or "user name" in h or "email" in h:
-        cands += [
-            page.locator("#user-name"),
-            page.locator("[data-test='username']"),
-            page.locator("input[name*='user'], input[name*='email']"),
-        ]
+        sels += ["#user-name", "[data-test='username']", "input[name*='user'], input[name*='email']"]
     if "password" in h:
-        cands += [
-            page.locator("#password"),
-            page.locator("[data-test='password']"),
-            page.locator("input[type='password']"),
-        ]
+        sels += ["#password", "[data-test='password']", "input[type='password']"]
     if "zip" in h or "postal" in h:
-        cands += [
-            page.locator("#postal-code"),
-            page.locator("[data-test='postalCode']"),
-            page.locator("input[name*='zip'], input[id*='zip']"),
-            page.locator("input[name*='postal'], input[id*='postal']"),
+        sels += [
+            "#postal-code",
+            "[data-test='postalCode']",
+            "input[name*='zip'], input[id*='zip']",
+            "input[name*='postal'], input[id*='postal']",
         ]
     if "address" in h:
-        cands += [
-            page.locator("textarea[ng-model*='Adress' i]"),
-            page.locator("#address, #Address"),
-            page.locator("textarea[name*='address' i], textarea[id*='address' i]"),
+        sels += [
+            "textarea[ng-model*='Adress' i]",
+            "#address, #Address",
+            "textarea[name*='address' i], textarea[id*='address' i]",
         ]
-    for loc in cands:
-        try:
-            if loc and loc.count() > 0:
-                return loc.first
-        except:
-            pass
-    return None
+    return sels
 
-def _by_aria_input(page: Page, hint: str):
-    """Direct match on aria-label / aria-placeholder for input/textarea."""
-    try:
-        loc = page.locator(
-            f"input[aria-label*='{hint}' i], textarea[aria-label*='{hint}' i], "
-            f"input[aria-placeholder*='{hint}' i], textarea[aria-placeholder*='{hint}' i]"
-        ).first
-        if loc and loc.count() > 0:
-            return loc
-    except:
-        pass
-    return None
+def _input_candidates(page: Page, hint: str):
+    """(locator, selector worth learning as an alias) for a fill() target, best first;
+    probed by the sync and async find_input alike."""
+    # -1) Aliases
+    for s in _alias_selectors(page, hint):
+        yield page.locator(s), None
+    # 0) ARIA label/placeholder (covers floating-label + placeholder=' ' cases)
+    yield page.locator(
+        f"input[aria-label*='{hint}' i], textarea[aria-label*='{hint}' i], "
+        f"input[aria-placeholder*='{hint}' i], textarea[aria-placeholder*='{hint}' i]"
+    ), None
+    # 1) Placeholder & Label first
+    for strat in (_by_placeholder, _by_label):
+        el = strat(page, hint)
+        if el is not None:
+            yield el, None
+    # 2) Common heuristics
+    for sel in _guess_selectors(hint):
+        yield page.locator(sel), None
+    # 3) ARIA textbox by name
+    yield page.get_by_role("textbox", name=re.compile(hint, re.I)), None
+    # 4) data-testid/test
+    sel = f"[data-testid*='{hint}'],[data-test*='{hint}']"
+    yield page.locator(sel), sel
+    # 5) Label -> following input / textarea
+    for tag in ("input", "textarea"):
+        yield page.locator(
+            f"xpath=(//label[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'), '{hint.lower()}')]/following::{tag})[1]"
+        ), None
 
 def _first_visible_textarea(page: Page):
     """Safe fallback: pick the first visible textarea if nothing else matched."""
@@ -145,73 +201,29 @@ def _first_visible_textarea(page: Page):
         pass
     return None
 
+@timed("resolve")
 def find_input(page: Page, hint: str):
     """Resolve an INPUT/TEXTAREA for fill() reliably."""
-    # -1) Aliases
-    try:
-        aliases = load_aliases(page.url)
-        key = (hint or "").lower()
-        if key in aliases:
-            sel = aliases[key]
-            sels = sel if isinstance(sel, list) else [sel]
-            for s in sels:
-                loc = page.locator(s).first
-                if loc and loc.count() > 0:
-                    return loc
-    except:
-        pass
-    # 0) ARIA label/placeholder (covers floating-label + placeholder=' ' cases)
-    el = _by_aria_input(page, hint)
-    if el:
-        return el
-
-    # 1) Placeholder & Label first
-    for strat in (_by_placeholder, _by_label):
-        el = strat(page, hint)
-        if el and el.count() > 0:
-            return el.first
-
-    # 2) Common heuristics
-    el = _input_guessers(page, hint)
-    if el:
-        return el
-
-    # 3) ARIA textbox by name
-    try:
-        el = page.get_by_role("textbox", name=re.compile(hint, re.I))
-        if el and el.count() > 0:
-            return el.first
-    except:
-        pass
-
-    # 4) data-testid/test
-    try:
-        sel = f"[data-testid*='{hint}'],[data-test*='{hint}']"
-        el = page.locator(sel).first
-        if el and el.count() > 0:
-            try: update_aliases(page.url, hint, sel)
-            except: pass
-            return el
-    except:
-        pass
-
-    # 5) Label → following input
-    try:
-        el = page.locator(
-            f"xpath=(//label[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'), '{hint.lower()}')]/following::input)[1]"
-        ).first
-        if el and el.count() > 0:
-            return el
-    except:
-        pass
-
-    # 5b) Label → following textarea
+    if resolver.ENABLED:
+        try:
+            loc, info = _resolve(page, page, hint, "input",
+                                 aliases=_alias_selectors(page, hint), guesses=_guess_selectors(hint))
+            if loc is not None and info["strategy"] == "testid" and info["stable"]:
+                try: update_aliases(page.url, hint, info["selector"])
+                except: pass
+            return loc
+        except Exception:
+            pass  # fall back to per-strategy probing
     try:
-        el = page.locator(
-            f"xpath=(//label[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'), '{hint.lower()}')]/following::textarea)[1]"
-        ).first
-        if el and el.count() > 0:
-            return el
+        for loc, sel in _input_candidates(page, hint):
+            try:
+                if loc.count() > 0:
+                    if sel:
+                        try: update_aliases(page.url, hint, sel)
+                        except: pass
+                    return loc.first
+            except:
+                pass
     except:
         pass
 
@@ -223,94 +235,86 @@ def find_input(page: Page, hint: str):
     return None
 
 # -------- adapters: combobox / date / file upload --------
+# Selector tables shared with core.async_healer; only the probing differs.
+def _select_css(hint: str):
+    """Native <select> by id/name, then by placeholder."""
+    return (f"select[id*='{hint}' i], select[name*='{hint}' i]", f"select[placeholder*='{hint}' i]")
+
+def _is_custom_combo(hint: str):
+    # select2/msdd widgets: click the trigger, type, choose the option
+    h = hint.lower()
+    return "language" in h or "select country" in h
+
+_COMBO_TRIGGER = "#msdd"
+_COMBO_SEARCH = ".select2-search__field, input[type='search']"
+
+def _option_candidates(page, value: str, select2=False):
+    """Option lists for a typed combobox value, best first."""
+    yield page.get_by_role("option", name=re.compile(value, re.I))
+    yield page.get_by_text(re.compile(f"^{re.escape(value)}$", re.I))
+    if select2:
+        yield page.locator(f".select2-results__option:has-text('{value}'), .select2-results li:has-text('{value}')")
+
+_DATE_NEXT = ("button[aria-label*='Next']", "button[title*='Next']", "button:has-text('›')")
+_DATE_PREV = ("button[aria-label*='Previous']", "button[title*='Prev']", "button:has-text('‹')")
+
 def combo_select(page: Page, hint: str, value: str):
     rx = re.compile(hint, re.I)
-    # 1) Native <select> by label/name/id
+    # 1) Native <select> by label, then id/name/placeholder
     sel = page.get_by_label(rx)
-    if sel and sel.count() > 0 and sel.first.evaluate("e => e.tagName.toLowerCase()") == "select":
-        try:
-            sel.first.select_option(label=value)
-            return
-        except:
-            pass
-    # 1.1) Fallback to locating select by id/name containing hint
     try:
-        sel2 = page.locator(f"select[id*='{hint}' i], select[name*='{hint}' i]").first
-        if sel2 and sel2.count() > 0:
-            sel2.select_option(label=value)
-            return
-    except:
-        pass
-    # 1.2) Fallback to locating select by placeholder
-    try:
-        sel3 = page.locator(f"select[placeholder*='{hint}' i]").first
-        if sel3 and sel3.count() > 0:
-            sel3.select_option(label=value)
+        if sel.count() > 0 and sel.first.evaluate("e => e.tagName.toLowerCase()") == "select":
+            sel.first.select_option(label=value)
             return
     except:
         pass
+    for css in _select_css(hint):
+        try:
+            s2 = page.locator(css).first
+            if s2.count() > 0:
+                s2.select_option(label=value)
+                return
+        except:
+            pass
 
     # 2) Custom widgets (select2/msdd): click trigger, type, choose option
-    use_custom = ("language" in hint.lower()) or ("select country" in hint.lower())
-    trigger = None
-    if use_custom:
-        trigger = (
-            page.locator("#msdd").first or
-            page.locator(".select2-selection").first or
-            page.get_by_role("combobox", name=rx).first
-        )
-    if trigger and trigger.count() > 0:
-        trigger.click()
-        try:
-            typebox = page.locator(".select2-search__field, input[type='search']").first
-            if typebox and typebox.count() > 0:
-                typebox.fill(value)
-            else:
+    if _is_custom_combo(hint):
+        trigger = page.locator(_COMBO_TRIGGER).first
+        if trigger.count() > 0:
+            trigger.click()
+            try:
+                typebox = page.locator(_COMBO_SEARCH).first
+                if typebox.count() > 0:
+                    typebox.fill(value)
+                else:
+                    page.keyboard.type(value)
+            except:
                 page.keyboard.type(value)
-        except:
-            page.keyboard.type(value)
-        opts = page.get_by_role("option", name=re.compile(value, re.I))
-        if opts.count() == 0:
-            opts = page.get_by_text(re.compile(f"^{re.escape(value)}$", re.I))
-        if opts.count() == 0:
-            # select2 results list
-            opts = page.locator(
-                f".select2-results__option:has-text('{value}'), .select2-results li:has-text('{value}')"
-            )
-        if opts.count() == 0:
-            # try open dropdown options container and search text nodes
-            opts = page.locator(f".ui-autocomplete li:has-text('{value}')").first
-            if opts and opts.count() > 0:
-                opts.click()
-                # Attempt to close dropdown after selection
+            opts = _first_match(_option_candidates(page, value, select2=True))
+            if opts is None:
+                # open autocomplete list, else confirm the first suggestion with Enter
+                auto = page.locator(f".ui-autocomplete li:has-text('{value}')").first
+                if auto.count() > 0:
+                    auto.click()
+                    try: page.keyboard.press("Escape")
+                    except: pass
+                    return
                 try:
+                    page.keyboard.press("Enter")
                     page.keyboard.press("Escape")
+                    return
                 except:
                     pass
-                return
-        if opts.count() == 0:
-            # Press Enter to confirm the first suggestion
-            try:
-                page.keyboard.press("Enter")
-                page.keyboard.press("Escape")
-                return
-            except:
-                pass
-            raise RuntimeError(f"Option not found in combobox: {value}")
-        opts.first.click()
-        # Attempt to close dropdown after selection
-        try:
-            page.keyboard.press("Escape")
-        except:
-            pass
-        # Fallback: click outside if still open
-        try:
-            page.mouse.click(5, 5)
-        except:
-            pass
-        return
+                raise RuntimeError(f"Option not found in combobox: {value}")
+            opts.click()
+            # close the dropdown; click outside if it is still open
+            try: page.keyboard.press("Escape")
+            except: pass
+            try: page.mouse.click(5, 5)
+            except: pass
+            return
 
-    # 3) Last resort: previous behavior on role option lists
+    # 3) Last resort: role option lists
     cb = page.get_by_role("combobox", name=rx)
     if cb.count() == 0:
         cb = find_in_frames(page, hint)
@@ -325,16 +329,14 @@ def combo_select(page: Page, hint: str, value: str):
             page.keyboard.type(value)
     except:
         page.keyboard.type(value)
-    options = page.get_by_role("option", name=re.compile(value, re.I))
-    if options.count() == 0:
-        options = page.get_by_text(re.compile(f"^{re.escape(value)}$", re.I))
-    if options.count() == 0:
-        page.keyboard.press("End"); page.wait_for_timeout(80)
-        page.keyboard.press("Home"); page.wait_for_timeout(80)
-        options = page.get_by_role("option", name=re.compile(value, re.I))
-    if options.count() == 0:
+    options = _first_match(_option_candidates(page, value))
+    if options is None:
+        page.keyboard.press("End"); settle(page)
+        page.keyboard.press("Home"); settle(page)
+        options = _first_match(_option_candidates(page, value))
+    if options is None:
         raise RuntimeError(f"Option not found in combobox: {value}")
-    options.first.click()
+    options.click()
 
 def date_set(page: Page, hint: str, iso_value: str):
     el = find_in_frames(page, hint) or page.locator("input[type='date']").first
@@ -367,9 +369,10 @@ def date_set(page: Page, hint: str, iso_value: str):
     for _ in range(24):
         if page.get_by_text(re.compile(f"^{re.escape(month_label)}$", re.I)).count() > 0:
             break
-        if not click_if_visible(["button[aria-label*='Next']", "button[title*='Next']", "button:has-text('›')"]):
-            click_if_visible(["button[aria-label*='Previous']", "button[title*='Prev']", "button:has-text('‹')"])
-        page.wait_for_timeout(80)
+        if not click_if_visible(_DATE_NEXT):
+            if not click_if_visible(_DATE_PREV):
+                break
+        settle(page)
 
     day = str(dt.day)
     cand = page.get_by_role("gridcell", name=re.compile(f"^{day}$")).first
@@ -385,253 +388,195 @@ def file_upload(page: Page, hint: str, file_path: str):
         btn = find_in_frames(page, hint) or page.get_by_role("button", name=re.compile(hint, re.I)).first
         if btn and btn.count() > 0:
             btn.click()
-            page.wait_for_timeout(150)
+            try: page.locator("input[type='file']").first.wait_for(state="attached", timeout=1000)
+            except: pass
         input_el = page.locator("input[type='file']").first
     if input_el.count() == 0:
         raise RuntimeError("File input not found after attempting to open chooser.")
     input_el.set_input_files(file_path)
 
 # -------- strong clickable resolver --------
+_INTENTS = (
+    (("cart", "basket"), "[data-test='shopping-cart-link'], .shopping_cart_link, #shopping_cart_container a, a[href*='cart' i], [aria-label*='cart' i]"),
+    (("checkout",), "[data-test='checkout'], #checkout, button:has-text('Checkout'), a:has-text('Checkout')"),
+    (("continue",), "[data-test='continue'], #continue, button:has-text('Continue'), a:has-text('Continue')"),
+    (("finish", "complete"), "[data-test='finish'], #finish, button:has-text('Finish'), a:has-text('Finish')"),
+)
+
+def _intent_selectors(hint: str):
+    h = (hint or "").lower()
+    return [sel for words, sel in _INTENTS if any(w in h for w in words)]
+
+# strategies whose winners are worth remembering as aliases
+_LEARNABLE = {"testid", "attr", "intent", "tokens"}
+
+def _visible_first(loc):
+    loc = loc.first
+    return loc if loc.count() > 0 and loc.is_visible() else None
+
+# Per-strategy candidates for find_clickable when the in-page resolver cannot run.
+# Each yields (locator, selector_to_learn); the first visible one wins. Names match
+# resolver.ORDER; the sync and async finders probe the same lists.
+def _click_alias(page: Page, hint: str, rx):
+    for s in _alias_selectors(page, hint):
+        yield page.locator(s), None
+
+def _click_role(page: Page, hint: str, rx):
+    for role in ("button", "link"):
+        yield page.get_by_role(role, name=rx), None
+
+def _click_has_text(page: Page, hint: str, rx):
+    for sel in (f"button:has-text('{hint}')", f"a:has-text('{hint}')", f"[role=button]:has-text('{hint}')"):
+        yield page.locator(sel), None
+
+def _click_testid(page: Page, hint: str, rx):
+    sel = f"[data-testid*='{hint}'],[data-test*='{hint}']"
+    yield page.locator(sel), sel
+
+def _click_input_attr(page: Page, hint: str, rx):
+    # inputs by id/name/placeholder/value (e.g., datepicker1/2)
+    yield page.locator(
+        f"input[id*='{hint}' i], input[name*='{hint}' i], input[placeholder*='{hint}' i], input[value*='{hint}' i]"
+    ), None
+
+def _attr_selector(t: str):
+    return (
+        f"a[id*='{t}' i], a[name*='{t}' i], a[title*='{t}' i], a[class*='{t}' i], "
+        f"button[id*='{t}' i], button[name*='{t}' i], button[title*='{t}' i], button[class*='{t}' i], "
+        f"[role=button][id*='{t}' i], [data-testid*='{t}'], [data-test*='{t}'], [role=link][id*='{t}' i]"
+    )
+
+def _click_attr(page: Page, hint: str, rx):
+    sel = _attr_selector(hint)
+    yield page.locator(sel), sel
+
+def _click_intent(page: Page, hint: str, rx):
+    # intent-based quick selectors for common e-commerce actions
+    for sel in _intent_selectors(hint):
+        yield page.locator(sel), sel
+
+def _click_text(page: Page, hint: str, rx):
+    # text -> nearest clickable ancestor, else the text node itself
+    node = page.get_by_text(rx, exact=False).first
+    yield node.locator("xpath=ancestor-or-self::*[self::button or self::a or @role='button'][1]"), None
+    yield node, None
+
+def _click_tokens(page: Page, hint: str, rx):
+    # tokenized attribute fallback (handles 'Cart icon' -> token 'cart')
+    for t in [t for t in re.findall(r"[a-z0-9]+", (hint or "").lower()) if len(t) >= 3]:
+        sel = _attr_selector(t) + f", a[href*='{t}' i]"
+        yield page.locator(sel), sel
+
+_CLICK_STRATEGIES = {
+    "alias": _click_alias, "role": _click_role, "has_text": _click_has_text, "testid": _click_testid,
+    "input_attr": _click_input_attr, "attr": _click_attr, "intent": _click_intent,
+    "text": _click_text, "tokens": _click_tokens,
+}
+
+def _resolve(page: Page, scope, hint: str, kind: str, **kw):
+    """resolver.resolve with the host's adaptive strategy order; books hit/miss stats.
+    Hits are reused from the page snapshot while the scope's DOM version is unchanged;
+    the version is checked inside the resolve call, so a reuse costs no extra evaluate.
+    """
+    snap = snapshot_for(page)
+    key = (id(scope), hint, kind, repr(sorted(kw.items())))
+    known = snap.recall(key)
+    host = host_of(page.url)
+    order = healstats.order_for(host, kind, resolver.ORDER[kind])
+    loc, info = resolver.resolve(scope, hint, kind, order=order, known=known, **kw)
+    if not (info or {}).get("memo"):
+        healstats.record_resolution(host, kind, info, order)
+        if loc is not None:
+            snap.remember(key, info, info.get("version"))
+    if loc is not None:
+        snap.pin(loc, info["selector"], None if scope is page else scope.url)
+    return loc, info
+
+@timed("resolve")
 def find_clickable(page: Page, hint: str):
     """
     Strong resolver for click targets by visible label.
-    Priority:
+    Default priority:
+      0) aliases (always first)
       1) role=button/link with accessible name
       2) CSS :has-text(...) for <button>, <a>, [role=button]
-      3) data-testid / data-test match
+      3) data-testid / data-test match, then input/attribute matches
       3.6) intent-based selectors for common actions (cart/checkout/continue/finish)
       4) generic text node fallback, then nearest clickable ancestor
+      5) tokenized attribute fallback
+    Strategies that keep winning on a host are tried earlier (core.healstats).
+    All strategies run in-page in a single call (core.resolver); the per-strategy
+    probes in _CLICK_STRATEGIES are the fallback when the script cannot run.
     """
-    # -1) Aliases
-    try:
-        aliases = load_aliases(page.url)
-        key = (hint or "").lower()
-        if key in aliases:
-            sel = aliases[key]
-            sels = sel if isinstance(sel, list) else [sel]
-            for s in sels:
-                loc = page.locator(s).first
-                if loc.count() > 0 and loc.is_visible():
-                    return loc
-    except:
-        pass
+    if resolver.ENABLED:
+        try:
+            loc, info = _resolve(page, page, hint, "clickable",
+                                 aliases=_alias_selectors(page, hint), intents=_intent_selectors(hint))
+            if loc is not None and info["strategy"] in _LEARNABLE and info["stable"]:
+                try: update_aliases(page.url, hint, info["selector"])
+                except: pass
+            return loc
+        except Exception:
+            pass
     rx = re.compile(hint, re.I)
-
-    # 1) ARIA roles by accessible name
-    for role in ("button", "link"):
+    host = host_of(page.url)
+    for name in healstats.order_for(host, "clickable", resolver.ORDER["clickable"]):
+        t0 = time.perf_counter()
+        found = None
         try:
-            loc = page.get_by_role(role, name=rx)
-            if loc.count() > 0 and loc.first.is_visible():
-                return loc.first
-        except:
+            for loc, sel in _CLICK_STRATEGIES[name](page, hint, rx):
+                loc = _visible_first(loc)
+                if loc:
+                    found = loc, sel
+                    break
+        except Exception:
             pass
-
-    # 2) :has-text selectors
-    try:
-        loc = page.locator(f"button:has-text('{hint}')").first
-        if loc.count() > 0 and loc.is_visible():
-            return loc
-    except: pass
-    try:
-        loc = page.locator(f"a:has-text('{hint}')").first
-        if loc.count() > 0 and loc.is_visible():
-            return loc
-    except: pass
-    try:
-        loc = page.locator(f"[role=button]:has-text('{hint}')").first
-        if loc.count() > 0 and loc.is_visible():
-            return loc
-    except: pass
-
-    # 3) data-test(id)
-    try:
-        loc = page.locator(f"[data-testid*='{hint}'],[data-test*='{hint}']").first
-        if loc.count() > 0 and loc.is_visible():
-            try: update_aliases(page.url, hint, sel)
-            except: pass
-            return loc
-    except: pass
-
-    # 3.25) Inputs by id/name/placeholder/value (e.g., datepicker1/2)
-    try:
-        loc = page.locator(
-            f"input[id*='{hint}' i], input[name*='{hint}' i], input[placeholder*='{hint}' i], input[value*='{hint}' i]"
-        ).first
-        if loc.count() > 0 and loc.is_visible():
-            return loc
-    except: pass
-
-    # 3.5) Attributes: id/name/title/class on common clickable elements
-    try:
-        loc = page.locator(
-            f"a[id*='{hint}' i], a[name*='{hint}' i], a[title*='{hint}' i], a[class*='{hint}' i], "
-            f"button[id*='{hint}' i], button[name*='{hint}' i], button[title*='{hint}' i], button[class*='{hint}' i], "
-            f"[role=button][id*='{hint}' i], [data-testid*='{hint}'], [data-test*='{hint}'], [role=link][id*='{hint}' i]"
-        ).first
-        if loc.count() > 0 and loc.is_visible():
-            try: update_aliases(page.url, hint, sel)
-            except: pass
-            return loc
-    except: pass
-
-    # 3.6) Intent-based quick selectors for common e-commerce actions
-    try:
-        h = (hint or "").lower()
-        if any(t in h for t in ["cart", "basket"]):
-            sel = "[data-test='shopping-cart-link'], .shopping_cart_link, #shopping_cart_container a, a[href*='cart' i], [aria-label*='cart' i]"
-            loc = page.locator(sel).first
-            if loc.count() > 0 and loc.is_visible():
-                try: update_aliases(page.url, hint, sel)
-                except: pass
-                return loc
-        if "checkout" in h:
-            sel = "[data-test='checkout'], #checkout, button:has-text('Checkout'), a:has-text('Checkout')"
-            loc = page.locator(sel).first
-            if loc.count() > 0 and loc.is_visible():
-                try: update_aliases(page.url, hint, sel)
-                except: pass
-                return loc
-        if "continue" in h:
-            sel = "[data-test='continue'], #continue, button:has-text('Continue'), a:has-text('Continue')"
-            loc = page.locator(sel).first
-            if loc.count() > 0 and loc.is_visible():
-                try: update_aliases(page.url, hint, sel)
-                except: pass
-                return loc
-        if "finish" in h or "complete" in h:
-            sel = "[data-test='finish'], #finish, button:has-text('Finish'), a:has-text('Finish')"
-            loc = page.locator(sel).first
-            if loc.count() > 0 and loc.is_visible():
-                try: update_aliases(page.url, hint, sel)
-                except: pass
-                return loc
-    except:
-        pass
-
-    # 4) Text -> clickable ancestor
-    try:
-        node = page.get_by_text(rx, exact=False).first
-        if node and node.count() > 0 and node.is_visible():
-            anc = node.locator("xpath=ancestor-or-self::*[self::button or self::a or @role='button'][1]").first
-            if anc and anc.count() > 0 and anc.is_visible():
-                return anc
-            return node
-    except:
-        pass
-
-    # 5) Tokenized attribute fallback (handles 'Cart icon' → token 'cart')
-    try:
-        import re as _re
-        tokens = [t for t in _re.findall(r"[a-z0-9]+", (hint or "").lower()) if len(t) >= 3]
-        for t in tokens:
-            sel = (
-                f"a[id*='{t}' i], a[name*='{t}' i], a[title*='{t}' i], a[class*='{t}' i], "
-                f"button[id*='{t}' i], button[name*='{t}' i], button[title*='{t}' i], button[class*='{t}' i], "
-                f"[role=button][id*='{t}' i], [data-testid*='{t}'], [data-test*='{t}'], [role=link][id*='{t}' i], "
-                f"a[href*='{t}' i]"
-            )
-            loc = page.locator(sel).first
-            if loc.count() > 0 and loc.is_visible():
+        healstats.record(host, "clickable", name, bool(found), (time.perf_counter() - t0) * 1000)
+        if found:
+            loc, sel = found
+            if sel:
                 try: update_aliases(page.url, hint, sel)
                 except: pass
-                return loc
-    except:
-        pass
-
+            return loc
     return None
 
-def _find_checkbox(page, hint: str):
+# -------- checkbox / radio --------
+def _norm_choice(hint: str):
     raw = (hint or "").strip()
     # Normalize common suffix words that are not part of the accessible name
     norm = re.sub(r"\b(checkbox|radio|button|option|select|multiselect)\b", "", raw, flags=re.I).strip()
-    rx = re.compile(norm or raw or "", re.I)
-    try:
-        loc = page.get_by_role("checkbox", name=rx)
-        if loc.count() > 0:
-            return loc.first
-    except:
-        pass
+    return raw, norm, re.compile(norm or raw or "", re.I)
+
+def _choice_candidates(page, kind: str, hint: str):
+    """Locators for a checkbox/radio (`kind`) by hint, best first; probed by the sync
+    and async finders alike."""
+    raw, norm, rx = _norm_choice(hint)
+    label = ("//label[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'), "
+             + f"'{(norm or '').lower()}')]")
+    yield page.get_by_role(kind, name=rx)
     # Prefer direct input matches by name/aria-label first
-    try:
-        loc = page.locator(
-            f"input[type='checkbox'][name*='{norm}' i], input[type='checkbox'][aria-label*='{norm}' i], input[type='checkbox'][value*='{norm}' i], input[type='checkbox'][title*='{norm}' i]"
-        ).first
-        if loc and loc.count() > 0:
-            return loc
-    except:
-        pass
-    # Handle label-wrapped checkbox: select descendant input within label containing the hint
-    try:
-        loc = page.locator(
-            "xpath=(//label[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'), "
-            + f"'{(norm or '').lower()}')]//input[@type='checkbox'])[1]"
-        ).first
-        if loc and loc.count() > 0:
-            return loc
-    except:
-        pass
-    try:
-        loc = page.locator(
-            "xpath=(//label[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'), "
-            + f"'{(norm or '').lower()}')]/following::input[@type='checkbox'] | "
-            "//label[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'), "
-            + f"'{(norm or '').lower()}')]/preceding::input[@type='checkbox'])[1]"
-        ).first
-        if loc and loc.count() > 0:
-            return loc
-    except:
-        pass
-    try:
-        node = page.get_by_text(rx, exact=False).first
-        if node and node.count() > 0:
-            container = node.locator("xpath=ancestor-or-self::*[self::label or self::div or self::section or self::form][1]").first
-            if container and container.count() > 0:
-                cb = container.locator("input[type='checkbox']").first
-                if cb and cb.count() > 0:
-                    return cb
-    except:
-        pass
-    return None
+    yield page.locator(
+        f"input[type='{kind}'][name*='{norm}' i], input[type='{kind}'][aria-label*='{norm}' i], "
+        f"input[type='{kind}'][value*='{norm}' i], input[type='{kind}'][title*='{norm}' i]"
+    )
+    # Label-wrapped input
+    yield page.locator(f"xpath=({label}//input[@type='{kind}'])[1]")
+    if kind == "checkbox":
+        # Nearby input before/after a matching label, then the input inside the text's container
+        yield page.locator(f"xpath=({label}/following::input[@type='checkbox'] | {label}/preceding::input[@type='checkbox'])[1]")
+        yield (page.get_by_text(rx, exact=False).first
+               .locator("xpath=ancestor-or-self::*[self::label or self::div or self::section or self::form][1]").first
+               .locator("input[type='checkbox']"))
+    else:
+        # Token fallback: try individual words like 'male'/'female'
+        for t in [t for t in re.findall(r"[a-zA-Z]+", norm or raw) if len(t) >= 3]:
+            yield page.get_by_role("radio", name=re.compile(t, re.I))
+            yield page.locator(f"input[type='radio'][value*='{t}' i], input[type='radio'][aria-label*='{t}' i]")
+
+@timed("resolve")
+def _find_checkbox(page, hint: str):
+    return _first_match(_choice_candidates(page, "checkbox", hint))
 
+@timed("resolve")
 def _find_radio(page, hint: str):
-    raw = (hint or "").strip()
-    norm = re.sub(r"\b(checkbox|radio|button|option|select|multiselect)\b", "", raw, flags=re.I).strip()
-    rx = re.compile(norm or raw or "", re.I)
-    try:
-        loc = page.get_by_role("radio", name=rx)
-        if loc.count() > 0:
-            return loc.first
-    except:
-        pass
-    try:
-        loc = page.locator(
-            f"input[type='radio'][name*='{norm}' i], input[type='radio'][aria-label*='{norm}' i], input[type='radio'][value*='{norm}' i], input[type='radio'][title*='{norm}' i]"
-        ).first
-        if loc and loc.count() > 0:
-            return loc
-    except:
-        pass
-    try:
-        loc = page.locator(
-            "xpath=(//label[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'), "
-            + f"'{(norm or '').lower()}')]//input[@type='radio'])[1]"
-        ).first
-        if loc and loc.count() > 0:
-            return loc
-    except:
-        pass
-    # Token fallback: try individual words like 'male'/'female'
-    try:
-        tokens = [t for t in re.findall(r"[a-zA-Z]+", norm or raw) if len(t) >= 3]
-        for t in tokens:
-            loc = page.get_by_role("radio", name=re.compile(t, re.I))
-            if loc.count() > 0:
-                return loc.first
-            loc = page.locator(
-                f"input[type='radio'][value*='{t}' i], input[type='radio'][aria-label*='{t}' i]"
-            ).first
-            if loc and loc.count() > 0:
-                return loc
-    except:
-        pass
-    return None
+    return _first_match(_choice_candidates(page, "radio", hint))
@@ -0,0 +1,145 @@
+import os, time, atexit, threading
+from .util import connect_db
+from .phases import event
+from . import metrics
+
+# ---- healer strategy statistics ----
+# Per (host, kind, strategy): hits, misses and total latency. Counters accumulate in
+# memory and are added to runs/healer_stats.sqlite by flush_stats() at end of run.
+# order_for() puts historically winning strategies first once a host has enough data,
+# but only within a precision tier: a catch-all text match is only reached after the
+# structured strategies missed, so its hit rate says nothing about how it compares.
+_PATH = os.getenv("HEALER_STATS_PATH", os.path.join("runs", "healer_stats.sqlite"))
+_ADAPTIVE = os.getenv("HEALER_ADAPTIVE", "1").strip().lower() not in ("0", "false", "no", "off")
+_MIN_ATTEMPTS = int(os.getenv("HEALER_ADAPTIVE_MIN", "5"))
+
+_LOCK = threading.RLock()
+_TOTALS = {}   # (host, kind) -> {strategy: [hits, misses, total_ms]} persisted + this run
+_DELTAS = {}   # (host, kind, strategy) -> [hits, misses, total_ms] not yet flushed
+_PINNED = ("alias",)  # explicit/learned aliases always go first
+# broad fallbacks (free text, first textarea, field after a label) stay behind the rest
+_FALLBACK = ("intent", "text", "tokens", "contains", "label_input", "label_textarea", "textarea")
+
+def _conn():
+    conn = connect_db(_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS strategy_stats ("
+        " host TEXT NOT NULL, kind TEXT NOT NULL, strategy TEXT NOT NULL,"
+        " hits INTEGER DEFAULT 0, misses INTEGER DEFAULT 0, total_ms REAL DEFAULT 0, updated REAL,"
+        " PRIMARY KEY (host, kind, strategy))"
+    )
+    return conn
+
+def _totals(host, kind):
+    key = (host, kind)
+    t = _TOTALS.get(key)
+    if t is None:
+        t = {}
+        if os.path.exists(_PATH):
+            try:
+                conn = _conn()
+                try:
+                    for strat, hits, misses, ms in conn.execute(
+                        "SELECT strategy, hits, misses, total_ms FROM strategy_stats WHERE host=? AND kind=?", (host, kind)
+                    ):
+                        t[strat] = [hits, misses, ms]
+                finally:
+                    conn.close()
+            except Exception:
+                pass
+        _TOTALS[key] = t
+    return t
+
+def record(host, kind, strategy, hit, ms=0.0, ago=0.0):
+    """Book one strategy attempt (and a heal.<strategy> span that ended `ago` ms ago)."""
+    with _LOCK:
+        for bucket in (_totals(host, kind).setdefault(strategy, [0, 0, 0.0]),
+                       _DELTAS.setdefault((host, kind, strategy), [0, 0, 0.0])):
+            bucket[0 if hit else 1] += 1
+            bucket[2] += ms or 0.0
+    event(f"heal.{strategy}", ms or 0.0, ago, kind=kind, hit=bool(hit))
+    metrics.inc("healer_attempts_total", kind=kind, strategy=strategy, outcome="hit" if hit else "miss")
+
+def record_resolution(host, kind, info, order):
+    """Book one resolver call: strategies tried before the winner missed.
+    `info` is the resolver result ({strategy, timings}); strategy is None on a miss.
+    """
+    if not info:
+        return
+    timings = info.get("timings") or {}
+    winner = info.get("strategy")
+    tried = []
+    for name in order:
+        if name not in timings:
+            if name == winner:
+                tried.append((name, 0.0))
+            continue
+        tried.append((name, timings.get(name, 0.0)))
+        if name == winner:
+            break
+    # the strategies ran back to back in the page, ending about now
+    ago = sum(ms for _, ms in tried)
+    for name, ms in tried:
+        ago -= ms
+        record(host, kind, name, name == winner, ms, ago)
+
+def order_for(host, kind, default_order):
+    """Default order until the host has data; then pinned strategies, the structured
+    strategies and the fallbacks, each tier sorted by smoothed hit rate (ties keep
+    default priority). Strategies never move across tiers."""
+    if not _ADAPTIVE:
+        return list(default_order)
+    with _LOCK:
+        t = _totals(host, kind)
+        if sum(h + m for h, m, _ in t.values()) < _MIN_ATTEMPTS:
+            return list(default_order)
+        pinned = [s for s in default_order if s in _PINNED]
+        fallback = [s for s in default_order if s in _FALLBACK]
+        rest = [s for s in default_order if s not in _PINNED and s not in _FALLBACK]
+
+        def score(item):
+            pos, name = item
+            h, m, ms = t.get(name, [0, 0, 0.0])
+            rate = (h + 1) / (h + m + 2)  # Laplace prior: unseen strategies sit at 0.5
+            avg_ms = ms / (h + m) if (h + m) else 0.0
+            return (-rate, avg_ms, pos)
+        return pinned + [name for tier in (rest, fallback) for _, name in sorted(enumerate(tier), key=score)]
+
+def snapshot(host=None):
+    """{(host, kind): {strategy: {hits, misses, avg_ms}}} for reporting."""
+    with _LOCK:
+        out = {}
+        for (h, kind), t in _TOTALS.items():
+            if host is not None and h != host:
+                continue
+            out[(h, kind)] = {
+                s: {"hits": v[0], "misses": v[1], "avg_ms": round(v[2] / max(1, v[0] + v[1]), 2)}
+                for s, v in t.items()
+            }
+        return out
+
+def flush_stats():
+    """Add this run's counters to the on-disk totals in one transaction."""
+    with _LOCK:
+        batch = list(_DELTAS.items())
+        if not batch:
+            return 0
+        try:
+            conn = _conn()
+            try:
+                now = time.time()
+                conn.executemany(
+                    "INSERT INTO strategy_stats(host, kind, strategy, hits, misses, total_ms, updated) VALUES (?,?,?,?,?,?,?) "
+                    "ON CONFLICT(host, kind, strategy) DO UPDATE SET hits=hits+excluded.hits, misses=misses+excluded.misses, "
+                    "total_ms=total_ms+excluded.total_ms, updated=excluded.updated",
+                    [(h, k, s, v[0], v[1], v[2], now) for (h, k, s), v in batch],
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception:
+            return 0
+        _DELTAS.clear()
+        return len(batch)
+
+atexit.register(flush_stats)
@@ -1,5 +1,7 @@
-import os
+import os, time, random, threading
 from dotenv import load_dotenv
+from .phases import phase
+from . import metrics
 
 load_dotenv()
 
@@ -10,112 +12,353 @@ _DEFAULT_TEMP = float(os.getenv("LLM_TEMPERATURE", "0.2"))
 
 def chat(messages, temperature: float = None) -> str:
     temp = _DEFAULT_TEMP if temperature is None else temperature
-    provider = _PROVIDER
-
-    if provider in ("azure-openai", "azure"):
-        return _chat_azure_openai(messages, temp)
-    if provider in ("openai",):
-        return _chat_openai(messages, temp)
-    if provider in ("anthropic", "claude"):
-        return _chat_anthropic(messages, temp)
-    if provider in ("groq",):
-        return _chat_groq(messages, temp)
-    raise RuntimeError(f"Unsupported LLM_PROVIDER: {provider}")
+    with phase("llm", provider=_PROVIDER):
+        return get_provider(_PROVIDER).chat(messages, temp)
+
+# ---- concurrency / rate limiting / retries ----
+
+def _env_num(prefix, name, default, cast=float):
+    """Provider-specific `<PREFIX>_<NAME>` wins over global `LLM_<NAME>`."""
+    for key in (f"{prefix}_{name}", f"LLM_{name}"):
+        v = os.getenv(key)
+        if v not in (None, ""):
+            try:
+                return cast(v)
+            except ValueError:
+                pass
+    return default
+
+class _TokenBucket:
+    """Requests-per-minute limiter; rpm <= 0 disables it."""
+
+    def __init__(self, rpm: float, burst: float = None):
+        self.rate = rpm / 60.0 if rpm and rpm > 0 else 0.0
+        self.capacity = burst or max(1.0, self.rate * 5)
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def _status_of(e):
+    for attr in ("status_code", "http_status", "status"):
+        v = getattr(e, attr, None)
+        if isinstance(v, int):
+            return v
+    resp = getattr(e, "response", None)
+    v = getattr(resp, "status_code", None)
+    return v if isinstance(v, int) else None
+
+def _retry_after(e):
+    headers = getattr(e, "headers", None) or getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        v = headers.get("retry-after") or headers.get("Retry-After")
+        return float(v) if v else None
+    except Exception:
+        return None
+
+def _retryable(e):
+    status = _status_of(e)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    name = type(e).__name__
+    return any(t in name for t in ("Timeout", "Connection", "RateLimit", "ServiceUnavailable", "Overloaded", "TryAgain"))
+
+class _Provider:
+    """One per provider per process: a lazily built, reused API client plus its
+    concurrency cap (LLM_MAX_CONCURRENCY), token bucket (LLM_RPM), request timeout
+    (LLM_TIMEOUT) and jittered exponential retries on 429/5xx (LLM_MAX_RETRIES).
+    Each knob can be overridden per provider, e.g. ANTHROPIC_RPM.
+    """
+    env_prefix = "LLM"
+    label = "llm"  # provider label on metrics
+
+    def __init__(self):
+        p = self.env_prefix
+        self.timeout = _env_num(p, "TIMEOUT", 60.0)
+        self.max_retries = _env_num(p, "MAX_RETRIES", 4, int)
+        self.retry_base = _env_num(p, "RETRY_BASE", 0.5)
+        self.retry_cap = _env_num(p, "RETRY_MAX_WAIT", 20.0)
+        self.slots = threading.BoundedSemaphore(max(1, _env_num(p, "MAX_CONCURRENCY", 4, int)))
+        self.bucket = _TokenBucket(_env_num(p, "RPM", 0.0))
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._make_client()
+        return self._client
+
+    def _make_client(self):
+        raise NotImplementedError
+
+    def _complete(self, messages, temperature) -> str:
+        raise NotImplementedError
+
+    def _usage(self, prompt, completion):
+        """Book the token counts a response reported (None: not reported)."""
+        if prompt:
+            metrics.inc("llm_tokens_total", prompt, provider=self.label, type="prompt")
+        if completion:
+            metrics.inc("llm_tokens_total", completion, provider=self.label, type="completion")
+
+    def _attempt(self, outcome, t0):
+        metrics.inc("llm_requests_total", provider=self.label, outcome=outcome)
+        metrics.observe("llm_request_seconds", time.perf_counter() - t0, provider=self.label, outcome=outcome)
+
+    def chat(self, messages, temperature) -> str:
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            with self.slots:
+                t0 = time.perf_counter()
+                try:
+                    out = self._complete(messages, temperature)
+                    self._attempt("ok", t0)
+                    return out
+                except RuntimeError:
+                    raise  # configuration errors (missing keys/packages)
+                except Exception as e:
+                    if attempt >= self.max_retries or not _retryable(e):
+                        self._attempt("error", t0)
+                        raise
+                    self._attempt("retry", t0)
+                    wait = _retry_after(e)
+            if wait is None:
+                wait = random.uniform(0, min(self.retry_cap, self.retry_base * (2 ** attempt)))
+            attempt += 1
+            time.sleep(wait)
 
 # ---- Azure OpenAI ----
 
-def _chat_azure_openai(messages, temperature: float) -> str:
+def _openai_v1():
     import openai
-    openai.api_type = "azure"
-    openai.api_key = os.getenv("AZURE_OPENAI_API_KEY")
-    openai.api_base = os.getenv("AZURE_OPENAI_ENDPOINT")
-    openai.api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-08-01-preview")
-    deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT")
-    if not (openai.api_key and openai.api_base and deployment):
-        raise RuntimeError("Missing Azure OpenAI env: AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_DEPLOYMENT")
-    resp = openai.ChatCompletion.create(
-        engine=deployment,
-        messages=messages,
-        temperature=temperature,
-    )
-    return resp["choices"][0]["message"]["content"].strip()
+    return openai if hasattr(openai, "OpenAI") else None
+
+def _openai_usage(resp):
+    """(prompt, completion) tokens from an openai>=1 object or an openai<1 dict."""
+    u = resp.get("usage") if isinstance(resp, dict) else getattr(resp, "usage", None)
+    if u is None:
+        return None, None
+    if isinstance(u, dict):
+        return u.get("prompt_tokens"), u.get("completion_tokens")
+    return getattr(u, "prompt_tokens", None), getattr(u, "completion_tokens", None)
+
+class _AzureOpenAI(_Provider):
+    env_prefix = "AZURE_OPENAI"
+    label = "azure-openai"
+
+    def _make_client(self):
+        import openai
+        key = os.getenv("AZURE_OPENAI_API_KEY")
+        base = os.getenv("AZURE_OPENAI_ENDPOINT")
+        self.deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+        self.api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-08-01-preview")
+        if not (key and base and self.deployment):
+            raise RuntimeError("Missing Azure OpenAI env: AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_DEPLOYMENT")
+        if _openai_v1():
+            return openai.AzureOpenAI(api_key=key, azure_endpoint=base, api_version=self.api_version,
+                                      timeout=self.timeout, max_retries=0)
+        # openai<1: per-call credentials instead of mutating module globals
+        return {"api_type": "azure", "api_key": key, "api_base": base, "api_version": self.api_version}
+
+    def _complete(self, messages, temperature):
+        client = self.client()
+        if isinstance(client, dict):
+            import openai
+            resp = openai.ChatCompletion.create(engine=self.deployment, messages=messages, temperature=temperature,
+                                                request_timeout=self.timeout, **client)
+            self._usage(*_openai_usage(resp))
+            return resp["choices"][0]["message"]["content"].strip()
+        resp = client.chat.completions.create(model=self.deployment, messages=messages, temperature=temperature)
+        self._usage(*_openai_usage(resp))
+        return resp.choices[0].message.content.strip()
 
 # ---- OpenAI (api.openai.com) ----
 
-def _chat_openai(messages, temperature: float) -> str:
-    import openai
-    openai.api_type = "open_ai"
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-    # Optional self-hosted proxy/base
-    base = os.getenv("OPENAI_BASE")
-    if base:
-        openai.api_base = base
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    if not openai.api_key:
-        raise RuntimeError("Missing OPENAI_API_KEY")
-    resp = openai.ChatCompletion.create(
-        model=model,
-        messages=messages,
-        temperature=temperature,
-    )
-    return resp["choices"][0]["message"]["content"].strip()
+class _OpenAI(_Provider):
+    env_prefix = "OPENAI"
+    label = "openai"
+
+    def _make_client(self):
+        import openai
+        key = os.getenv("OPENAI_API_KEY")
+        # Optional self-hosted proxy/base
+        base = os.getenv("OPENAI_BASE")
+        self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        if not key:
+            raise RuntimeError("Missing OPENAI_API_KEY")
+        if _openai_v1():
+            return openai.OpenAI(api_key=key, base_url=base or None, timeout=self.timeout, max_retries=0)
+        creds = {"api_type": "open_ai", "api_key": key}
+        if base:
+            creds["api_base"] = base
+        return creds
+
+    def _complete(self, messages, temperature):
+        client = self.client()
+        if isinstance(client, dict):
+            import openai
+            resp = openai.ChatCompletion.create(model=self.model, messages=messages, temperature=temperature,
+                                                request_timeout=self.timeout, **client)
+            self._usage(*_openai_usage(resp))
+            return resp["choices"][0]["message"]["content"].strip()
+        resp = client.chat.completions.create(model=self.model, messages=messages, temperature=temperature)
+        self._usage(*_openai_usage(resp))
+        return resp.choices[0].message.content.strip()
 
 # ---- Anthropic (Claude) ----
 
-def _chat_anthropic(messages, temperature: float) -> str:
-    try:
-        import anthropic
-    except Exception:
-        raise RuntimeError("anthropic package not installed. Install with: pip install 'anthropic>=0.34' or `pip install .[anthropic]`")
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    model = os.getenv("ANTHROPIC_MODEL", "claude-3-haiku-20240307")
-    if not api_key:
-        raise RuntimeError("Missing ANTHROPIC_API_KEY")
-
-    client = anthropic.Anthropic(api_key=api_key)
-    sys_msg = ""
-    conv = []
-    for m in messages:
-        role = (m.get("role") or "").lower()
-        content = str(m.get("content") or "")
-        if role == "system":
-            sys_msg = content if not sys_msg else (sys_msg + "\n" + content)
-        elif role in ("user", "assistant"):
-            conv.append({"role": role, "content": [{"type": "text", "text": content}]})
-    if not conv or conv[-1]["role"] != "user":
-        # Ensure last is user per Claude API expectations
-        conv.append({"role": "user", "content": [{"type": "text", "text": "Continue."}]})
-    resp = client.messages.create(
-        model=model,
-        system=sys_msg or None,
-        messages=conv,
-        temperature=temperature,
-        max_tokens=int(os.getenv("ANTHROPIC_MAX_TOKENS", "1024")),
-    )
-    # Concatenate text parts
-    parts = []
-    for b in resp.content:
-        if getattr(b, "type", "") == "text":
-            parts.append(getattr(b, "text", ""))
-        elif isinstance(b, dict) and b.get("type") == "text":
-            parts.append(b.get("text", ""))
-    return "".join(parts).strip()
+class _Anthropic(_Provider):
+    env_prefix = "ANTHROPIC"
+    label = "anthropic"
+
+    def _make_client(self):
+        try:
+            import anthropic
+        except Exception:
+            raise RuntimeError("anthropic package not installed. Install with: pip install 'anthropic>=0.34' or `pip install .[anthropic]`")
+        api_key = os.getenv("ANTHROPIC_API_KEY")
+        self.model = os.getenv("ANTHROPIC_MODEL", "claude-3-haiku-20240307")
+        self.max_tokens = int(os.getenv("ANTHROPIC_MAX_TOKENS", "1024"))
+        if not api_key:
+            raise RuntimeError("Missing ANTHROPIC_API_KEY")
+        return anthropic.Anthropic(api_key=api_key, timeout=self.timeout, max_retries=0)
+
+    def _complete(self, messages, temperature):
+        client = self.client()
+        sys_msg = ""
+        conv = []
+        for m in messages:
+            role = (m.get("role") or "").lower()
+            content = str(m.get("content") or "")
+            if role == "system":
+                sys_msg = content if not sys_msg else (sys_msg + "\n" + content)
+            elif role in ("user", "assistant"):
+                conv.append({"role": role, "content": [{"type": "text", "text": content}]})
+        if not conv or conv[-1]["role"] != "user":
+            # Ensure last is user per Claude API expectations
+            conv.append({"role": "user", "content": [{"type": "text", "text": "Continue."}]})
+        kwargs = {"system": sys_msg} if sys_msg else {}
+        resp = client.messages.create(
+            model=self.model,
+            messages=conv,
+            temperature=temperature,
+            max_tokens=self.max_tokens,
+            **kwargs,
+        )
+        u = getattr(resp, "usage", None)
+        self._usage(getattr(u, "input_tokens", None), getattr(u, "output_tokens", None))
+        # Concatenate text parts
+        parts = []
+        for b in resp.content:
+            if getattr(b, "type", "") == "text":
+                parts.append(getattr(b, "text", ""))
+            elif isinstance(b, dict) and b.get("type") == "text":
+                parts.append(b.get("text", ""))
+        return "".join(parts).strip()
 
 # ---- Groq (OpenAI-compatible) ----
 
-def _chat_groq(messages, temperature: float) -> str:
-    try:
-        from groq import Groq
-    except Exception:
-        raise RuntimeError("groq package not installed. Install with: pip install 'groq>=0.8' or `pip install .[groq]`")
-    api_key = os.getenv("GROQ_API_KEY")
-    model = os.getenv("GROQ_MODEL", "llama3-8b-8192")
-    if not api_key:
-        raise RuntimeError("Missing GROQ_API_KEY")
-    client = Groq(api_key=api_key)
-    resp = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=temperature,
-    )
-    return resp.choices[0].message.content.strip()
+class _Groq(_Provider):
+    env_prefix = "GROQ"
+    label = "groq"
+
+    def _make_client(self):
+        try:
+            from groq import Groq
+        except Exception:
+            raise RuntimeError("groq package not installed. Install with: pip install 'groq>=0.8' or `pip install .[groq]`")
+        api_key = os.getenv("GROQ_API_KEY")
+        self.model = os.getenv("GROQ_MODEL", "llama3-8b-8192")
+        if not api_key:
+            raise RuntimeError("Missing GROQ_API_KEY")
+        return Groq(api_key=api_key, timeout=self.timeout, max_retries=0)
+
+    def _complete(self, messages, temperature):
+        resp = self.client().chat.completions.create(model=self.model, messages=messages, temperature=temperature)
+        self._usage(*_openai_usage(resp))
+        return resp.choices[0].message.content.strip()
+
+# ---- mock (benchmarks) ----
+
+class _Mock(_Provider):
+    """Deterministic offline provider for benchmarks: canned plans from MOCK_LLM_PLANS
+    (JSON {step description: [actions]}), else one click on the step text; the oracle
+    always answers PASS. MOCK_LLM_LATENCY_MS (+ MOCK_LLM_JITTER_MS, seeded) simulates
+    model latency; the usual concurrency/RPM limits still apply.
+    """
+    env_prefix = "MOCK_LLM"
+    label = "mock"
+    calls = 0
+
+    def _make_client(self):
+        import json
+        path = os.getenv("MOCK_LLM_PLANS")
+        self.plans = {}
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                self.plans = {" ".join(k.lower().split()): v for k, v in json.load(f).items()}
+        self.latency = _env_num("MOCK_LLM", "LATENCY_MS", 0.0) / 1000.0
+        self.jitter = _env_num("MOCK_LLM", "JITTER_MS", 0.0) / 1000.0
+        self.rng = random.Random(int(_env_num("MOCK_LLM", "SEED", 0, int)))
+        return self
+
+    def _plan(self, step):
+        return self.plans.get(" ".join(step.lower().split())) or [{"type": "click", "target": step}]
+
+    def _complete(self, messages, temperature):
+        import re, json
+        self.client()  # loads the canned plans once
+        with self._client_lock:
+            self.calls += 1
+            delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        system, user = messages[0]["content"], messages[-1]["content"]
+        if "QA oracle" in system:
+            if "numbered assertion" in system:
+                n = len(re.findall(r"^\d+\. ", user.split("\n\nPage:")[0], re.M))
+                return json.dumps({"verdicts": [{"index": k, "verdict": "PASS", "reason": "mock"} for k in range(1, n + 1)]})
+            return "PASS (mock oracle)"
+        m = re.search(r'Make a JSON action plan for: "(.*)"\s*$', user, re.S)
+        if m:
+            return json.dumps({"actions": self._plan(m.group(1))})
+        steps = re.findall(r"^\d+\. (.*)$", user.split("these steps:\n", 1)[-1], re.M)
+        return json.dumps({"steps": [{"actions": self._plan(d)} for d in steps]})
+
+# ---- registry ----
+
+_PROVIDERS = {
+    "azure-openai": _AzureOpenAI, "azure": _AzureOpenAI,
+    "openai": _OpenAI,
+    "anthropic": _Anthropic, "claude": _Anthropic,
+    "groq": _Groq,
+    "mock": _Mock,
+}
+_INSTANCES = {}
+_INSTANCES_LOCK = threading.Lock()
+
+def get_provider(name: str):
+    cls = _PROVIDERS.get(name)
+    if cls is None:
+        raise RuntimeError(f"Unsupported LLM_PROVIDER: {name}")
+    with _INSTANCES_LOCK:
+        inst = _INSTANCES.get(cls)
+        if inst is None:
+            inst = _INSTANCES[cls] = cls()
+        return inst
@@ -0,0 +1,219 @@
+import os, json, time, atexit, threading
+from .util import connect_db
+
+# ---- run metrics (counters + histograms) ----
+# Off unless METRICS names one or more exporters (comma-separated):
+#   prom  Prometheus text file (METRICS_PROM_PATH), rewritten atomically after every
+#         goal; point node_exporter's textfile collector at its directory
+#   json  the same totals as JSON (METRICS_JSON_PATH) for offline use
+#   otlp  push to an OpenTelemetry collector (standard OTEL_EXPORTER_OTLP_* env vars;
+#         needs `pip install .[otlp]`)
+# Samples accumulate in memory and flush_metrics() (end of every run_goal) adds them
+# to runs/metrics.sqlite in one transaction, so prom/json show totals across processes
+# and runs; OTLP gets the samples directly and aggregates on the collector side.
+_EXPORTERS = {x.strip().lower() for x in os.getenv("METRICS", "").split(",") if x.strip()}
+ENABLED = bool(_EXPORTERS)
+_PATH = os.getenv("METRICS_PATH", os.path.join("runs", "metrics.sqlite"))
+_PROM_PATH = os.getenv("METRICS_PROM_PATH", os.path.join("runs", "metrics", "playwright_use.prom"))
+_JSON_PATH = os.getenv("METRICS_JSON_PATH", os.path.join("runs", "metrics", "metrics.json"))
+_PREFIX = "pwu_"
+_SECONDS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# name -> (type, help, buckets)
+SPECS = {
+    "llm_requests_total": ("counter", "LLM requests by provider and outcome (ok, retry, error).", None),
+    "llm_request_seconds": ("histogram", "LLM request latency per attempt.", _SECONDS),
+    "llm_tokens_total": ("counter", "LLM tokens by provider and type (prompt, completion).", None),
+    "healer_attempts_total": ("counter", "Healer strategy attempts by kind, strategy and outcome (hit, miss).", None),
+    "actions_total": ("counter", "Executed actions by action type.", None),
+    "action_failures_total": ("counter", "Failed steps by the action type that was running (plan: before any action).", None),
+    "step_seconds": ("histogram", "Step duration by status.", _SECONDS),
+    "goals_total": ("counter", "Finished goals by status (pass, fail, error: the run raised).", None),
+    "goal_seconds": ("histogram", "Goal duration by status.", _SECONDS),
+    "browser_launches_total": ("counter", "Browser processes launched.", None),
+    "browser_launch_seconds": ("histogram", "Browser launch time.", _SECONDS),
+}
+
+_LOCK = threading.Lock()
+_EXPORT_LOCK = threading.Lock()  # one flush at a time: DB upsert + file rewrite
+_DELTAS = {}   # (name, labels json, field) -> value not yet flushed
+_OTEL = {}     # name -> OpenTelemetry instrument (lazily built)
+_otel_provider = None
+_otel_failed = False
+
+def _key(labels):
+    return json.dumps(labels, sort_keys=True, separators=(",", ":"))
+
+def _otel_instrument(name):
+    global _otel_provider, _otel_failed
+    if _otel_failed:
+        return None
+    inst = _OTEL.get(name)
+    if inst is not None:
+        return inst
+    try:
+        if _otel_provider is None:
+            from opentelemetry.sdk.metrics import MeterProvider
+            from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+            from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+            _otel_provider = MeterProvider(metric_readers=[PeriodicExportingMetricReader(OTLPMetricExporter())])
+        meter = _otel_provider.get_meter("playwright_use")
+        kind, help_, _ = SPECS[name]
+        make = meter.create_counter if kind == "counter" else meter.create_histogram
+        inst = _OTEL[name] = make(_PREFIX + name, description=help_, unit="s" if name.endswith("_seconds") else "1")
+        return inst
+    except Exception as e:
+        _otel_failed = True  # package missing or exporter misconfigured: keep the file exporters
+        print(f"[WARN] METRICS=otlp disabled ({type(e).__name__}: {e}); install with `pip install .[otlp]`")
+        return None
+
+def inc(name, value=1, **labels):
+    if not ENABLED:
+        return
+    k = (name, _key(labels), "value")
+    with _LOCK:
+        _DELTAS[k] = _DELTAS.get(k, 0) + value
+        if "otlp" in _EXPORTERS:
+            inst = _otel_instrument(name)
+            if inst is not None:
+                inst.add(value, labels)
+
+def observe(name, value, **labels):
+    """One histogram sample (seconds for *_seconds metrics)."""
+    if not ENABLED:
+        return
+    lk = _key(labels)
+    le = next((b for b in SPECS[name][2] if value <= b), "+Inf")
+    with _LOCK:
+        for field, v in (("sum", value), ("count", 1), (f"le={le}", 1)):
+            k = (name, lk, field)
+            _DELTAS[k] = _DELTAS.get(k, 0) + v
+        if "otlp" in _EXPORTERS:
+            inst = _otel_instrument(name)
+            if inst is not None:
+                inst.record(value, labels)
+
+def _conn():
+    conn = connect_db(_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS metrics ("
+        " name TEXT NOT NULL, labels TEXT NOT NULL, field TEXT NOT NULL, value REAL DEFAULT 0, updated REAL,"
+        " PRIMARY KEY (name, labels, field))"
+    )
+    return conn
+
+def _series(rows):
+    """{name: {labels json: {field: value}}} from (name, labels, field, value) rows."""
+    out = {}
+    for name, labels, field, value in rows:
+        if name in SPECS:
+            out.setdefault(name, {}).setdefault(labels, {})[field] = value
+    return out
+
+def _num(v):
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+def _label_str(labels, extra=None):
+    d = dict(json.loads(labels), **(extra or {}))
+    if not d:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in d.items()) + "}"
+
+def _cumulative(name, fields):
+    """[(le, cumulative count)] including +Inf."""
+    out, acc = [], 0
+    for b in SPECS[name][2]:
+        acc += fields.get(f"le={b}", 0)
+        out.append((b, acc))
+    out.append(("+Inf", acc + fields.get("le=+Inf", 0)))
+    return out
+
+def prometheus_text(series):
+    lines = []
+    for name, by_labels in sorted(series.items()):
+        kind, help_, _ = SPECS[name]
+        full = _PREFIX + name
+        lines += [f"# HELP {full} {help_}", f"# TYPE {full} {kind}"]
+        for labels, fields in sorted(by_labels.items()):
+            if kind == "counter":
+                lines.append(f"{full}{_label_str(labels)} {_num(fields.get('value', 0))}")
+                continue
+            for le, n in _cumulative(name, fields):
+                lines.append(f"{full}_bucket{_label_str(labels, {'le': le})} {_num(n)}")
+            lines.append(f"{full}_sum{_label_str(labels)} {_num(fields.get('sum', 0))}")
+            lines.append(f"{full}_count{_label_str(labels)} {_num(fields.get('count', 0))}")
+    return "\n".join(lines) + "\n"
+
+def json_doc(series):
+    doc = {}
+    for name, by_labels in sorted(series.items()):
+        kind, help_, _ = SPECS[name]
+        rows = []
+        for labels, fields in sorted(by_labels.items()):
+            if kind == "counter":
+                rows.append({"labels": json.loads(labels), "value": fields.get("value", 0)})
+            else:
+                rows.append({"labels": json.loads(labels), "count": fields.get("count", 0), "sum": fields.get("sum", 0),
+                             "buckets": {str(le): n for le, n in _cumulative(name, fields)}})
+        doc[_PREFIX + name] = {"type": kind, "help": help_, "series": rows}
+    return {"updated": time.time(), "metrics": doc}
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def flush_metrics():
+    """Add this process's samples to the on-disk totals and rewrite the exports."""
+    if not ENABLED:
+        return 0
+    with _LOCK:
+        batch = list(_DELTAS.items())
+        _DELTAS.clear()
+    if "otlp" in _EXPORTERS and _otel_provider is not None:
+        try: _otel_provider.force_flush()
+        except Exception: pass
+    if not (_EXPORTERS & {"prom", "json"}):
+        return len(batch)
+    with _EXPORT_LOCK:
+        try:
+            conn = _conn()
+        except Exception:
+            conn = None
+        if conn is None:
+            _requeue(batch)
+            return 0
+        try:
+            try:
+                now = time.time()
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO metrics(name, labels, field, value, updated) VALUES (?,?,?,?,?) "
+                        "ON CONFLICT(name, labels, field) DO UPDATE SET value=value+excluded.value, updated=excluded.updated",
+                        [(n, l, f, v, now) for (n, l, f), v in batch],
+                    )
+            except Exception:
+                _requeue(batch)  # not committed: keep the samples for the next flush
+                return 0
+            # committed from here on: an export failure must not re-queue (double counting)
+            try:
+                series = _series(conn.execute("SELECT name, labels, field, value FROM metrics").fetchall())
+                if "prom" in _EXPORTERS:
+                    _write(_PROM_PATH, prometheus_text(series))
+                if "json" in _EXPORTERS:
+                    _write(_JSON_PATH, json.dumps(json_doc(series), indent=2))
+            except Exception:
+                pass  # the next flush rewrites the files from the same totals
+        finally:
+            conn.close()
+    return len(batch)
+
+def _requeue(batch):
+    with _LOCK:
+        for k, v in batch:
+            _DELTAS[k] = _DELTAS.get(k, 0) + v
+
+atexit.register(flush_metrics)
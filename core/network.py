@@ -0,0 +1,274 @@
+import os, json, time, hashlib, threading
+from .util import host_of, _read_yaml
+
+# ---- network policy: blocking + on-disk static cache ----
+# Installed with context.route only when a policy is active (routing sends every
+# request through Python). A policy comes from, in increasing precedence:
+# NET_* env vars, fixtures/network.yaml (`global:` then the goal host's section) and
+# the goal YAML `network:` key. Keys:
+#   block_types:       resource types to abort (image, font, media, stylesheet, ...)
+#   block_third_party: abort subresources from other sites than the page's (navigations
+#                      are never blocked)
+#   block_hosts:       host suffixes to abort always (trackers, ads)
+#   allow_hosts:       host suffixes exempt from third-party blocking (CDNs, auth)
+#   cache:             serve static GETs from runs/http_cache across runs; fresh entries
+#                      (Cache-Control max-age, else NET_CACHE_TTL) without a request,
+#                      stale ones revalidated with If-None-Match / If-Modified-Since
+CACHE_DIR = os.getenv("NET_CACHE_DIR", os.path.join("runs", "http_cache"))
+_CACHE_TTL = float(os.getenv("NET_CACHE_TTL", "86400"))
+_CACHE_TYPES = {"stylesheet", "script", "font", "image", "media"}
+_CACHE_MAX_BYTES = 20 * 1024 * 1024
+_CACHE_VERSION = 2  # bump when the stored meta changes; older entries are refetched
+# replayed on cache hits: CORS/timing headers matter for crossorigin fonts and scripts
+_KEEP_HEADERS = {"content-type", "etag", "last-modified", "cache-control", "vary",
+                 "access-control-allow-origin", "access-control-allow-credentials",
+                 "access-control-expose-headers", "timing-allow-origin", "cross-origin-resource-policy"}
+# Multi-label public suffixes _site knows about (NET_PUBLIC_SUFFIXES adds more). Not the
+# full Public Suffix List: an unlisted one (e.g. `gv.at`) makes all its sites one site.
+_SUFFIXES = {
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "ltd.uk", "plc.uk", "me.uk",
+    "com.au", "net.au", "org.au", "edu.au", "gov.au", "co.nz", "org.nz",
+    "co.jp", "ne.jp", "or.jp", "ac.jp", "co.kr", "or.kr", "co.in", "net.in", "org.in",
+    "com.br", "net.br", "org.br", "com.mx", "com.ar", "com.co", "com.tr", "com.cn", "net.cn",
+    "com.hk", "com.tw", "com.sg", "com.my", "co.id", "co.th", "co.za", "co.il", "com.ua",
+    "github.io", "gitlab.io", "herokuapp.com", "netlify.app", "vercel.app", "pages.dev",
+    "azurewebsites.net", "cloudfront.net", "appspot.com", "web.app", "firebaseapp.com",
+}
+
+def _csv(name):
+    return [x.strip().lower() for x in os.getenv(name, "").split(",") if x.strip()]
+
+def _flag(name):
+    return os.getenv(name, "0").strip().lower() in ("1", "true", "yes", "on")
+
+def _env_policy():
+    return {
+        "block_types": _csv("NET_BLOCK_TYPES"),
+        "block_third_party": _flag("NET_BLOCK_THIRD_PARTY"),
+        "block_hosts": _csv("NET_BLOCK_HOSTS"),
+        "allow_hosts": _csv("NET_ALLOW_HOSTS"),
+        "cache": _flag("NET_CACHE"),
+    }
+
+def _merge(pol, spec):
+    if not isinstance(spec, dict):
+        return pol
+    for k in ("block_types", "block_hosts", "allow_hosts"):
+        if spec.get(k) is not None:
+            v = spec[k]
+            pol[k] = [str(x).strip().lower() for x in (v if isinstance(v, list) else str(v).split(","))]
+    for k in ("block_third_party", "cache"):
+        if spec.get(k) is not None:
+            pol[k] = bool(spec[k])
+    return pol
+
+def policy(url, goal_spec=None):
+    """Effective policy for a goal starting at `url`."""
+    pol = _env_policy()
+    data = _read_yaml(os.path.join("fixtures", "network.yaml"))
+    if isinstance(data, dict):
+        _merge(pol, data.get("global"))
+        _merge(pol, data.get(host_of(url)))
+    return _merge(pol, goal_spec)
+
+def active(pol):
+    return bool(pol and (pol["block_types"] or pol["block_third_party"] or pol["block_hosts"] or pol["cache"]))
+
+def _site(host):
+    """Registrable-domain approximation: last two labels, three under a known
+    multi-label suffix (_SUFFIXES)."""
+    if not host or ":" in host or host.replace(".", "").isdigit():
+        return host or ""  # IP literals are their own site
+    parts = host.split(".")
+    n = 3 if len(parts) > 2 and ".".join(parts[-2:]) in _SUFFIXES else 2
+    return ".".join(parts[-n:])
+
+_SUFFIXES.update(_csv("NET_PUBLIC_SUFFIXES"))
+
+def _suffix(host, suffixes):
+    return any(host == s or host.endswith("." + s) for s in suffixes)
+
+class _State:
+    def __init__(self, pol, url, log):
+        self.pol = pol
+        self.log = log
+        self.sites = {_site(host_of(url))} if url else set()
+        self.stats = {"blocked": 0, "cache_hits": 0, "revalidated": 0, "stored": 0}
+        self.lock = threading.Lock()
+
+    def decide(self, request):
+        """'pass' | 'block' | 'cache' for one request."""
+        host = host_of(request.url)
+        try:
+            nav = request.is_navigation_request()
+        except Exception:
+            nav = False
+        if nav:
+            if request.frame.parent_frame is None:
+                self.sites.add(_site(host))  # wherever the page goes is first-party
+            return "pass"
+        pol = self.pol
+        if _suffix(host, pol["block_hosts"]) or request.resource_type in pol["block_types"]:
+            return "block"
+        if (pol["block_third_party"] and self.sites and _site(host) not in self.sites
+                and not _suffix(host, pol["allow_hosts"])):
+            return "block"
+        if pol["cache"] and request.method == "GET" and request.resource_type in _CACHE_TYPES:
+            return "cache"
+        return "pass"
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def summary(self):
+        return ", ".join(f"{k}={v}" for k, v in self.stats.items())
+
+# ---- on-disk cache: <sha1(url)>.json (meta incl. ETag) + <sha1(url+etag)>.body ----
+def _paths(url, etag=""):
+    k = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    b = hashlib.sha1((url + "\n" + (etag or "")).encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, k + ".json"), os.path.join(CACHE_DIR, b + ".body")
+
+def _load(url):
+    meta_path, _ = _paths(url)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("v") != _CACHE_VERSION:
+            return None, None
+        with open(_paths(url, meta.get("etag"))[1], "rb") as f:
+            return meta, f.read()
+    except Exception:
+        return None, None
+
+def _max_age(headers):
+    cc = (headers.get("cache-control") or "").lower()
+    if "no-store" in cc or "private" in cc:
+        return None
+    if "no-cache" in cc:
+        return 0
+    for part in cc.split(","):
+        k, _, v = part.strip().partition("=")
+        if k == "max-age" and v.isdigit():
+            return int(v)
+    return _CACHE_TTL
+
+def _write(path, data, mode="wb"):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, mode) as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _store(url, status, headers, body):
+    if status != 200 or not body or len(body) > _CACHE_MAX_BYTES:
+        return False
+    age = _max_age(headers)
+    if age is None:
+        return False
+    etag = headers.get("etag") or ""
+    meta_path, body_path = _paths(url, etag)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        _write(body_path, body)
+        keep = {k: v for k, v in headers.items() if k.lower() in _KEEP_HEADERS}
+        _write(meta_path, json.dumps({"v": _CACHE_VERSION, "url": url, "etag": etag, "headers": keep,
+                                      "stored": time.time(), "max_age": age}), "w")
+        return True
+    except Exception:
+        return False
+
+def _touch(url, meta, headers=None):
+    """Restart an entry's freshness after a 304, taking the kept headers it sent."""
+    meta["stored"] = time.time()
+    meta["headers"].update({k: v for k, v in (headers or {}).items() if k.lower() in _KEEP_HEADERS - {"etag"}})
+    age = _max_age({k.lower(): v for k, v in meta["headers"].items()})
+    if age is not None:
+        meta["max_age"] = age
+    try: _write(_paths(url)[0], json.dumps(meta), "w")
+    except Exception: pass
+
+def _fresh(meta):
+    return time.time() - meta.get("stored", 0) < meta.get("max_age", 0)
+
+def _conditional(meta):
+    h = {}
+    if meta.get("etag"):
+        h["if-none-match"] = meta["etag"]
+    if meta["headers"].get("last-modified"):
+        h["if-modified-since"] = meta["headers"]["last-modified"]
+    return h
+
+def _handler(st):
+    def handle(route, request):
+        try:
+            action = st.decide(request)
+            if action == "block":
+                st.count("blocked")
+                return route.abort("blockedbyclient")
+            if action == "cache":
+                meta, body = _load(request.url)
+                if meta and _fresh(meta):
+                    st.count("cache_hits")
+                    return route.fulfill(status=200, headers=meta["headers"], body=body)
+                resp = route.fetch(headers={**request.headers, **(_conditional(meta) if meta else {})})
+                if meta and resp.status == 304:
+                    st.count("revalidated")
+                    _touch(request.url, meta, resp.headers)
+                    return route.fulfill(status=200, headers=meta["headers"], body=body)
+                data = resp.body()
+                if _store(request.url, resp.status, resp.headers, data):
+                    st.count("stored")
+                return route.fulfill(response=resp, body=data)
+            return route.continue_()
+        except Exception:
+            try: route.continue_()
+            except Exception: pass
+    return handle
+
+def _handler_async(st):
+    async def handle(route, request):
+        try:
+            action = st.decide(request)
+            if action == "block":
+                st.count("blocked")
+                return await route.abort("blockedbyclient")
+            if action == "cache":
+                meta, body = _load(request.url)
+                if meta and _fresh(meta):
+                    st.count("cache_hits")
+                    return await route.fulfill(status=200, headers=meta["headers"], body=body)
+                resp = await route.fetch(headers={**request.headers, **(_conditional(meta) if meta else {})})
+                if meta and resp.status == 304:
+                    st.count("revalidated")
+                    _touch(request.url, meta, resp.headers)
+                    return await route.fulfill(status=200, headers=meta["headers"], body=body)
+                data = await resp.body()
+                if _store(request.url, resp.status, resp.headers, data):
+                    st.count("stored")
+                return await route.fulfill(response=resp, body=data)
+            return await route.continue_()
+        except Exception:
+            try: await route.continue_()
+            except Exception: pass
+    return handle
+
+def install(context, pol, url, log=None):
+    """Route the context's requests through the policy; returns a state with .summary()
+    or None when the policy does nothing."""
+    if not active(pol):
+        return None
+    st = _State(pol, url, log)
+    context.route("**/*", _handler(st))
+    if log:
+        log(f"NET policy {json.dumps(pol)}")
+    return st
+
+async def install_async(context, pol, url, log=None):
+    if not active(pol):
+        return None
+    st = _State(pol, url, log)
+    await context.route("**/*", _handler_async(st))
+    if log:
+        log(f"NET policy {json.dumps(pol)}")
+    return st
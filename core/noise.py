@@ -0,0 +1,250 @@
+import os, json, time, atexit, weakref, threading
+from .util import connect_db, host_of
+
+# ---- cookie banner / toast dismissal ----
+# An init script watches each top-level document with a MutationObserver and calls
+# back into Python only when one of the candidates becomes visible; dismiss() is a
+# no-op for pages that have not reported anything. When it does run, all candidates
+# are checked in one evaluate call. Per host we remember which banners were seen
+# (runs/noise_rules.sqlite): learned selectors are probed first, and hosts that never
+# showed a banner are not probed at all when the observer is unavailable.
+NOISE_SELECTORS = [
+    "#onetrust-accept-btn-handler",
+    "button#onetrust-accept-btn-handler",
+    "button:has-text('Accept All')",
+    "button:has-text('I Accept')",
+    "text=/Accept All/i",
+    "[data-testid=close-toast]",
+    "button:has-text('Got it')",
+]
+_PATH = os.getenv("NOISE_RULES_PATH", os.path.join("runs", "noise_rules.sqlite"))
+# visits without any banner after which a host counts as quiet
+_QUIET_AFTER = int(os.getenv("NOISE_QUIET_AFTER", "3"))
+
+# visible-candidate matcher shared by the observer and the probe; understands CSS,
+# Playwright's `sel:has-text('x')` and `text=/re/flags`
+_MATCH_JS = r"""
+const __pwuNoiseMatch = (cands) => {
+  const visible = (el) => {
+    const r = el.getBoundingClientRect();
+    if (!r.width || !r.height) return false;
+    const cs = getComputedStyle(el);
+    return cs.visibility !== 'hidden' && cs.display !== 'none';
+  };
+  const text = (el) => String(el.textContent || '').replace(/\s+/g, ' ').trim();
+  const find = (sel) => {
+    let m = sel.match(/^text=\/(.*)\/([a-z]*)$/);
+    if (m) {
+      const rx = new RegExp(m[1], m[2]);
+      for (const el of document.querySelectorAll('button, a, [role=button], input[type=button], input[type=submit]'))
+        if (rx.test(text(el) || el.value || '') && visible(el)) return el;
+      return null;
+    }
+    m = sel.match(/^(.*):has-text\((['"])(.*)\2\)$/);
+    const css = m ? (m[1] || '*') : sel;
+    const needle = m ? m[3].toLowerCase() : null;
+    for (const el of document.querySelectorAll(css))
+      if ((!needle || text(el).toLowerCase().includes(needle)) && visible(el)) return el;
+    return null;
+  };
+  const hits = [];
+  cands.forEach((sel, k) => { try { if (find(sel)) hits.push(k); } catch (e) { /* bad selector */ } });
+  return hits;
+};
+"""
+
+_OBSERVER_JS = r"""
+(() => {
+  if (window !== window.top) return;
+  const CANDS = %s;
+""" + _MATCH_JS + r"""
+  let queued = false, reported = false;
+  const check = () => {
+    queued = false;
+    if (reported || !__pwuNoiseMatch(CANDS).length) return;
+    reported = true;
+    try { window.__pwuNoiseSeen(); } catch (e) { /* binding missing */ }
+  };
+  const schedule = () => { if (!queued) { queued = true; setTimeout(check, 50); } };
+  window.__pwuNoiseRearm = () => { reported = false; schedule(); };
+  new MutationObserver(schedule).observe(document, {subtree: true, childList: true, attributes: true});
+})();
+"""
+
+_PROBE_JS = r"""
+(cands) => {
+""" + _MATCH_JS + r"""
+  const hits = __pwuNoiseMatch(cands);
+  if (window.__pwuNoiseRearm) window.__pwuNoiseRearm();
+  return hits;
+}
+"""
+
+_LOCK = threading.RLock()
+_WATCHED = weakref.WeakSet()   # contexts with the observer installed
+_FLAGGED = weakref.WeakSet()   # pages whose observer reported a visible candidate
+_RULES = {}                    # host -> {"visits": n, "hits": {selector: n}}
+_DELTAS = {}                   # host -> {"visits": n, "hits": {selector: n}} not yet flushed
+
+def _conn():
+    conn = connect_db(_PATH)
+    conn.execute("CREATE TABLE IF NOT EXISTS noise_hosts (host TEXT PRIMARY KEY, visits INTEGER DEFAULT 0, updated REAL)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS noise_rules ("
+        " host TEXT NOT NULL, selector TEXT NOT NULL, hits INTEGER DEFAULT 0, updated REAL,"
+        " PRIMARY KEY (host, selector))"
+    )
+    return conn
+
+def _rules(host):
+    r = _RULES.get(host)
+    if r is None:
+        r = {"visits": 0, "hits": {}}
+        if os.path.exists(_PATH):
+            try:
+                conn = _conn()
+                try:
+                    row = conn.execute("SELECT visits FROM noise_hosts WHERE host=?", (host,)).fetchone()
+                    r["visits"] = row[0] if row else 0
+                    r["hits"] = dict(conn.execute("SELECT selector, hits FROM noise_rules WHERE host=?", (host,)).fetchall())
+                except Exception:
+                    pass
+                finally:
+                    conn.close()
+            except Exception:
+                pass
+        _RULES[host] = r
+    return r
+
+def _book(host, hits):
+    with _LOCK:
+        for r in (_rules(host), _DELTAS.setdefault(host, {"visits": 0, "hits": {}})):
+            r["visits"] += 1
+            for sel in hits:
+                r["hits"][sel] = r["hits"].get(sel, 0) + 1
+
+def _candidates(host):
+    """Selectors this host has shown before come first."""
+    seen = _rules(host)["hits"]
+    return sorted(NOISE_SELECTORS, key=lambda s: -seen.get(s, 0))
+
+def _quiet(host):
+    r = _rules(host)
+    return r["visits"] >= _QUIET_AFTER and not any(r["hits"].values())
+
+def _on_seen(source):
+    page = source.get("page") if isinstance(source, dict) else getattr(source, "page", None)
+    if page is not None:
+        _FLAGGED.add(page)
+
+def install(context):
+    """Install the overlay observer on a BrowserContext (before pages are opened)."""
+    try:
+        context.expose_binding("__pwuNoiseSeen", _on_seen)
+        context.add_init_script(_OBSERVER_JS % json.dumps(NOISE_SELECTORS))
+        _WATCHED.add(context)
+        return True
+    except Exception:
+        return False
+
+async def install_async(context):
+    try:
+        await context.expose_binding("__pwuNoiseSeen", _on_seen)
+        await context.add_init_script(_OBSERVER_JS % json.dumps(NOISE_SELECTORS))
+        _WATCHED.add(context)
+        return True
+    except Exception:
+        return False
+
+def _should_probe(page, host):
+    if page in _FLAGGED:
+        _FLAGGED.discard(page)
+        return True
+    if page.context in _WATCHED:
+        return False  # the observer would have told us
+    return not _quiet(host)
+
+def dismiss(page, log=None):
+    """Click away visible banners/toasts; returns the selectors dismissed."""
+    host = host_of(page.url)
+    if not _should_probe(page, host):
+        return []
+    cands = _candidates(host)
+    try:
+        idx = page.evaluate(_PROBE_JS, cands)
+    except Exception:
+        return []
+    done = []
+    for k in idx or []:
+        sel = cands[k]
+        try:
+            loc = page.locator(sel).first
+            if done and not loc.is_visible():
+                continue  # already gone with an earlier candidate (same banner)
+            loc.click(timeout=2000)
+            try: loc.wait_for(state="hidden", timeout=1000)
+            except: pass
+            done.append(sel)
+        except Exception:
+            pass
+    _book(host, done)
+    if done and log:
+        log(f"NOISE dismissed {done}")
+    return done
+
+async def dismiss_async(page, log=None):
+    host = host_of(page.url)
+    if not _should_probe(page, host):
+        return []
+    cands = _candidates(host)
+    try:
+        idx = await page.evaluate(_PROBE_JS, cands)
+    except Exception:
+        return []
+    done = []
+    for k in idx or []:
+        sel = cands[k]
+        try:
+            loc = page.locator(sel).first
+            if done and not await loc.is_visible():
+                continue
+            await loc.click(timeout=2000)
+            try: await loc.wait_for(state="hidden", timeout=1000)
+            except: pass
+            done.append(sel)
+        except Exception:
+            pass
+    _book(host, done)
+    if done and log:
+        log(f"NOISE dismissed {done}")
+    return done
+
+def flush_rules():
+    """Persist this run's per-host banner observations in one transaction."""
+    with _LOCK:
+        batch = list(_DELTAS.items())
+        if not batch:
+            return 0
+        try:
+            conn = _conn()
+            try:
+                now = time.time()
+                conn.executemany(
+                    "INSERT INTO noise_hosts(host, visits, updated) VALUES (?,?,?) "
+                    "ON CONFLICT(host) DO UPDATE SET visits=visits+excluded.visits, updated=excluded.updated",
+                    [(h, d["visits"], now) for h, d in batch],
+                )
+                conn.executemany(
+                    "INSERT INTO noise_rules(host, selector, hits, updated) VALUES (?,?,?,?) "
+                    "ON CONFLICT(host, selector) DO UPDATE SET hits=hits+excluded.hits, updated=excluded.updated",
+                    [(h, sel, n, now) for h, d in batch for sel, n in d["hits"].items()],
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception:
+            return 0
+        _DELTAS.clear()
+        return len(batch)
+
+atexit.register(flush_rules)
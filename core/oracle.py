@@ -1,20 +1,76 @@
+import os, re, json
+from concurrent.futures import ThreadPoolExecutor
 from .llm import chat
+from .snapshot import snapshot_for
+
+# claims judged per LLM call; several calls for one page run in parallel (1 = one call per claim)
+ORACLE_BATCH = max(1, int(os.getenv("ORACLE_BATCH", "8")))
+
+ORACLE_SYS = "You are a strict QA oracle. Answer STRICTLY: PASS or FAIL, then <=2 sentence reason."
+
+ORACLE_BATCH_SYS = """You are a strict QA oracle. Judge each numbered assertion against the page independently.
+Output ONLY JSON: {"verdicts": [{"index": <n>, "verdict": "PASS" or "FAIL", "reason": "<=2 sentences"}]}
+with exactly one entry per assertion. When the page does not clearly support an assertion, it FAILS.
+"""
 
 def assert_url_contains(page, fragment: str):
     return fragment.lower() in page.url.lower(), f"URL was {page.url}"
 
 def fuzzy_page_assertion(page, claim: str):
-    html = page.content()
-    needles = ["thank you","completed","order","success","confirmation"]
-    if any(tok in html.lower() for tok in needles):
-        return True, "Heuristic DOM check suggests confirmation present."
+    return judge_html(snapshot_for(page).digest(), claim)
 
+def judge_html(html: str, claim: str):
     snippet = html[:5000]
     msg = [
-        {"role":"system","content":"You are a strict QA oracle. Answer STRICTLY: PASS or FAIL, then <=2 sentence reason."},
-        {"role":"user","content":f"Assertion: {claim}\nPage DOM (truncated):\n{snippet}"}
+        {"role":"system","content":ORACLE_SYS},
+        {"role":"user","content":f"Assertion: {claim}\nPage:\n{snippet}"}
     ]
     out = chat(msg, temperature=0.0)
     norm = out.strip().lower()
     passed = norm.startswith("pass")
     return passed, out
+
+def _judge_batch(snippet, claims):
+    """One LLM call for several claims; entries are None where no verdict came back."""
+    numbered = "\n".join(f"{k}. {c}" for k, c in enumerate(claims, start=1))
+    msg = [
+        {"role":"system","content":ORACLE_BATCH_SYS},
+        {"role":"user","content":f"Assertions:\n{numbered}\n\nPage:\n{snippet}"}
+    ]
+    out = chat(msg, temperature=0.0)
+    try:
+        m = re.search(r"\{.*\}", out, re.S)
+        entries = json.loads(m.group(0) if m else out).get("verdicts", [])
+    except Exception:
+        return [None] * len(claims)
+    got = [None] * len(claims)
+    for e in entries:
+        try:
+            k = int(e.get("index")) - 1
+            verdict = str(e.get("verdict") or "").strip().upper()
+        except Exception:
+            continue
+        if 0 <= k < len(claims) and verdict in ("PASS", "FAIL") and got[k] is None:
+            got[k] = (verdict == "PASS", f"{verdict}: {e.get('reason') or ''}".strip())
+    return got
+
+def judge_many(html: str, claims):
+    """[(passed, explanation)] aligned with `claims`, all judged against one page digest.
+    Claims go out ORACLE_BATCH per call with the calls in parallel; a claim the batch
+    answer misses is re-asked on its own.
+    """
+    claims = list(claims)
+    if not claims:
+        return []
+    if len(claims) == 1 or ORACLE_BATCH == 1:
+        batches = [[c] for c in claims]
+    else:
+        batches = [claims[k:k + ORACLE_BATCH] for k in range(0, len(claims), ORACLE_BATCH)]
+    snippet = html[:5000]
+    with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+        parts = list(pool.map(lambda b: [judge_html(html, b[0])] if len(b) == 1 else _judge_batch(snippet, b), batches))
+        verdicts = [v for part in parts for v in part]
+        missing = [k for k, v in enumerate(verdicts) if v is None]
+        for k, v in zip(missing, pool.map(lambda k: judge_html(html, claims[k]), missing)):
+            verdicts[k] = v
+    return verdicts
@@ -0,0 +1,162 @@
+import os, time, functools, contextvars, threading
+from contextlib import contextmanager
+
+# ---- per-goal phase timings and spans ----
+# run_goal opens a collector; code inside it wraps work in `with phase("plan"):` (or the
+# @timed decorators). Phases record self time: a nested phase pauses its parent, so
+# resolve time spent inside an action counts as "resolve", not "act". Every phase also
+# leaves a span (start, duration, nesting depth, step) for the report timeline, and
+# event() adds spans measured elsewhere (e.g. in-page healer strategy timings).
+# Worker threads started with asyncio.to_thread inherit the collector; plain threads
+# (the oracle's pool) do not, their time shows up in the enclosing "assert" phase.
+PHASES = ("launch", "noise", "plan", "llm", "resolve", "act", "wait", "screenshot", "assert", "report")
+_MAX_SPANS = int(os.getenv("SPANS_MAX", "5000"))
+
+_CURRENT = contextvars.ContextVar("phase_timings", default=None)
+
+class Collector:
+    def __init__(self):
+        self.ms = {}
+        self.by_step = {}   # step index -> {phase: self ms}
+        self.spans = []
+        self.step = None    # set by the executor; None outside steps
+        self._stack = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    def _span(self, name, start, ms, attrs):
+        if len(self.spans) >= _MAX_SPANS:
+            return
+        span = {"name": name, "step": self.step, "start_ms": round((start - self._t0) * 1000.0, 1),
+                "ms": round(ms, 1), "depth": len(self._stack)}
+        if attrs:
+            span["attrs"] = attrs
+        self.spans.append(span)
+
+    def _add(self, name, ms):
+        self.ms[name] = self.ms.get(name, 0.0) + ms
+        if self.step is not None:
+            per = self.by_step.setdefault(self.step, {})
+            per[name] = per.get(name, 0.0) + ms
+
+    def enter(self, name, attrs=None):
+        with self._lock:
+            self._stack.append((name, time.perf_counter(), attrs))
+
+    def exit(self):
+        with self._lock:
+            name, t0, attrs = self._stack.pop()
+            dt = (time.perf_counter() - t0) * 1000.0
+            self._add(name, dt)
+            if self._stack:
+                self._add(self._stack[-1][0], -dt)
+            self._span(name, t0, dt, attrs)
+
+    def event(self, name, ms, ago=0.0, **attrs):
+        """A span of known duration that ended `ago` ms before now; does not change
+        phase totals."""
+        with self._lock:
+            self._span(name, time.perf_counter() - (ms + ago) / 1000.0, ms, attrs)
+
+    def totals(self):
+        return {k: round(v, 1) for k, v in sorted(self.ms.items(), key=lambda kv: -kv[1])}
+
+    def for_step(self, i):
+        per = self.by_step.get(i) or {}
+        return {k: round(v, 1) for k, v in sorted(per.items(), key=lambda kv: -kv[1])}
+
+def start():
+    """Open a collector for the current context; returns (collector, token for finish)."""
+    c = Collector()
+    return c, _CURRENT.set(c)
+
+def finish(token):
+    _CURRENT.reset(token)
+
+def current():
+    return _CURRENT.get()
+
+@contextmanager
+def phase(name, **attrs):
+    c = _CURRENT.get()
+    if c is None:
+        yield
+        return
+    c.enter(name, attrs or None)
+    try:
+        yield
+    finally:
+        c.exit()
+
+def event(name, ms, ago=0.0, **attrs):
+    c = _CURRENT.get()
+    if c is not None:
+        c.event(name, ms, ago, **attrs)
+
+def mark_step(i):
+    """Attribute the following phases and spans to step i (None: goal level)."""
+    c = _CURRENT.get()
+    if c is not None:
+        c.step = i
+
+def step_totals(i):
+    c = _CURRENT.get()
+    return c.for_step(i) if c is not None else {}
+
+def timed(name):
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*a, **kw):
+            with phase(name):
+                return fn(*a, **kw)
+        return inner
+    return wrap
+
+def timed_async(name):
+    def wrap(fn):
+        @functools.wraps(fn)
+        async def inner(*a, **kw):
+            with phase(name):
+                return await fn(*a, **kw)
+        return inner
+    return wrap
+
+# ---- aggregation ----
+def _pct(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, int(round(p / 100.0 * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+def stats(spans):
+    """{span name: {count, total_ms, mean_ms, p50_ms, p95_ms, max_ms}}, slowest total first."""
+    by = {}
+    for s in spans:
+        by.setdefault(s["name"], []).append(s["ms"])
+    out = {}
+    for name, vals in by.items():
+        vals.sort()
+        total = sum(vals)
+        out[name] = {"count": len(vals), "total_ms": round(total, 1), "mean_ms": round(total / len(vals), 1),
+                     "p50_ms": _pct(vals, 50), "p95_ms": _pct(vals, 95), "max_ms": vals[-1]}
+    return dict(sorted(out.items(), key=lambda kv: -kv[1]["total_ms"]))
+
+def timeline(spans, step):
+    """Flame-style bars for one step: [{name, kind, ms, left, width, depth, note}] with
+    left/width in percent of the step's span window, plus the window length and depth."""
+    own = [s for s in spans if s.get("step") == step]
+    if not own:
+        return None
+    t0 = min(s["start_ms"] for s in own)
+    t1 = max(s["start_ms"] + s["ms"] for s in own)
+    window = max(t1 - t0, 0.1)
+    bars = []
+    for s in own:
+        attrs = s.get("attrs") or {}
+        bars.append({
+            "name": s["name"], "kind": s["name"].split(".")[0], "ms": s["ms"], "depth": s["depth"],
+            "left": round((s["start_ms"] - t0) * 100.0 / window, 2),
+            "width": max(round(s["ms"] * 100.0 / window, 2), 0.3),
+            "note": "".join(f" {k}={v}" for k, v in attrs.items()),
+        })
+    return {"ms": round(window, 1), "depth": max(b["depth"] for b in bars), "bars": bars}
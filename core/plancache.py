@@ -0,0 +1,125 @@
+import os, re, json, time, hashlib, threading
+from .util import connect_db, host_of
+
+# ---- persistent plan cache ----
+# Keyed by (normalized step text, host, structural DOM fingerprint). Entries expire
+# after PLAN_CACHE_TTL seconds and the store is trimmed LRU to PLAN_CACHE_MAX rows.
+_ENABLED = os.getenv("PLAN_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+_PATH = os.getenv("PLAN_CACHE_PATH", os.path.join("runs", "plan_cache.sqlite"))
+_TTL = float(os.getenv("PLAN_CACHE_TTL", str(7 * 24 * 3600)))
+_MAX = int(os.getenv("PLAN_CACHE_MAX", "5000"))
+
+_INIT_LOCK = threading.Lock()
+_READY = {"path": None}
+
+_TAG_RX = re.compile(r"<([a-zA-Z][a-zA-Z0-9-]*)([^>]*)>")
+_HEADING_RX = re.compile(r"^(h[1-6]):.*$")
+_VALUE_RX = re.compile(r" value=.*?(?=(?: checked)?(?: disabled)?$)")
+_ATTR_RX = re.compile(r"\b(id|name|type|role|data-test|data-testid|aria-label|placeholder)\s*=\s*[\"']([^\"']*)[\"']", re.I)
+
+def normalize_step(step_desc: str):
+    return re.sub(r"\s+", " ", (step_desc or "").strip().lower())
+
+def dom_fingerprint(snippet: str):
+    """Structural fingerprint: element tags plus identifying attributes, digits stripped.
+    Free text, inline styles and volatile counters do not affect it: for digests that
+    means the Title/URL header, heading and text lines, element names and typed values.
+    """
+    parts = []
+    for tag, attrs in _TAG_RX.findall(snippet or ""):
+        if tag.lower() in ("script", "style", "meta", "link"):
+            continue
+        keyattrs = ",".join(f"{k.lower()}={re.sub(r'[0-9]+', '', v)}" for k, v in _ATTR_RX.findall(attrs))
+        parts.append(f"{tag.lower()}[{keyattrs}]" if keyattrs else tag.lower())
+    if not parts:
+        # A core.digest digest: keep element roles/attributes, drop free text and names
+        for l in (snippet or "").splitlines():
+            l = l.strip()
+            if not l or l.startswith(("text:", "…", "Title:", "URL:")):
+                continue
+            l = _VALUE_RX.sub("", _HEADING_RX.sub(r"\1:", l))
+            parts.append(re.sub(r"[0-9]+", "", re.sub(r'"[^"]*"', '""', l)))
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+def cache_key(snippet: str, step_desc: str, base_url: str):
+    raw = "\x1f".join([normalize_step(step_desc), host_of(base_url), dom_fingerprint(snippet)])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def _conn():
+    conn = connect_db(_PATH)
+    if _READY["path"] != _PATH:
+        with _INIT_LOCK:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                " key TEXT PRIMARY KEY, step TEXT, host TEXT, actions TEXT,"
+                " created REAL, last_used REAL, hits INTEGER DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS plans_last_used ON plans(last_used)")
+            conn.commit()
+            _READY["path"] = _PATH
+    return conn
+
+def get_plan(snippet: str, step_desc: str, base_url: str):
+    """Return cached actions or None. Expired rows are treated as misses."""
+    if not _ENABLED:
+        return None
+    key = cache_key(snippet, step_desc, base_url)
+    try:
+        conn = _conn()
+        try:
+            row = conn.execute("SELECT actions, created FROM plans WHERE key=?", (key,)).fetchone()
+            if not row:
+                return None
+            now = time.time()
+            if _TTL > 0 and now - row[1] > _TTL:
+                conn.execute("DELETE FROM plans WHERE key=?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE plans SET last_used=?, hits=hits+1 WHERE key=?", (now, key))
+            conn.commit()
+            return json.loads(row[0])
+        finally:
+            conn.close()
+    except Exception:
+        return None
+
+def put_plan(snippet: str, step_desc: str, base_url: str, actions):
+    if not _ENABLED or not actions:
+        return False
+    key = cache_key(snippet, step_desc, base_url)
+    now = time.time()
+    try:
+        conn = _conn()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO plans(key, step, host, actions, created, last_used, hits) VALUES (?,?,?,?,?,?,0)",
+                (key, normalize_step(step_desc), host_of(base_url), json.dumps(actions, ensure_ascii=False), now, now),
+            )
+            if _TTL > 0:
+                conn.execute("DELETE FROM plans WHERE created < ?", (now - _TTL,))
+            if _MAX > 0:
+                conn.execute(
+                    "DELETE FROM plans WHERE key IN (SELECT key FROM plans ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (_MAX,),
+                )
+            conn.commit()
+            return True
+        finally:
+            conn.close()
+    except Exception:
+        return False
+
+def invalidate_plan(snippet: str, step_desc: str, base_url: str):
+    """Drop the entry for a plan that failed during execution."""
+    if not _ENABLED:
+        return False
+    try:
+        conn = _conn()
+        try:
+            cur = conn.execute("DELETE FROM plans WHERE key=?", (cache_key(snippet, step_desc, base_url),))
+            conn.commit()
+            return cur.rowcount > 0
+        finally:
+            conn.close()
+    except Exception:
+        return False
@@ -1,5 +1,6 @@
-import json
+import json, contextvars
 from .llm import chat
+from .plancache import get_plan, put_plan, invalidate_plan
 
 PLAN_SYS = """You convert a single natural-language UI test step into a small JSON action plan.
 Output ONLY JSON. Keys:
@@ -17,9 +18,15 @@ Guidelines:
 - For date pickers use ISO date: {"type":"date_set","target":"Start Date","value":"2025-08-07"}.
 - For upload use path: {"type":"file_upload","target":"Profile picture","value":"fixtures/sample.txt"}.
 - Prefer "wait_for_selector" over generic waits when possible.
+- The page is given as a digest: one line per visible interactive element ("[e3] button "Login" #login-button"),
+  plus headings and visible text. Use the element's name/label/placeholder as "target", never the [eN] id.
 - Do NOT return code. JSON only.
 """
 
+# Hermetic runs (HAR replay, core.har) plan from the replay script and the plan cache
+# only; a step with no cached plan fails instead of calling the model.
+CACHE_ONLY = contextvars.ContextVar("plan_cache_only", default=False)
+
 _ALLOWED = {
     "navigate","click","fill","press","wait_for","wait_for_selector",
     "assert_text","assert_url_contains","select","combo_select",
@@ -41,17 +48,82 @@ def _sanitize(actions):
         })
     return safe
 
+PLAN_AHEAD_SYS = PLAN_SYS.replace(
+    "You convert a single natural-language UI test step into a small JSON action plan.",
+    "You convert a numbered list of natural-language UI test steps into JSON action plans, one per step.\n"
+    "The page snapshot is the state BEFORE the first listed step; later steps run on whatever pages the earlier ones lead to.",
+).replace(
+    "Output ONLY JSON. Keys:\n- \"actions\"",
+    "Output ONLY JSON: {\"steps\": [{\"actions\": [...]}, ...]} with exactly one entry per step, in order. Each entry's\n- \"actions\"",
+)
+
+def _snippet(page_html):
+    """Digests (core.digest) are already token-bounded; raw HTML is truncated."""
+    if not page_html:
+        return ""
+    return page_html[:3500] if page_html.lstrip().startswith("<") else page_html
+
 def plan_step(page_html, step_desc, base_url):
-    snippet = page_html[:3500] if page_html else ""
+    snippet = _snippet(page_html)
+    cached = get_plan(snippet, step_desc, base_url)
+    if cached:
+        return cached
+    if CACHE_ONLY.get():
+        raise RuntimeError(f"no cached plan for step '{step_desc}' (cache-only planning)")
     messages = [
         {"role":"system","content":PLAN_SYS},
-        {"role":"user","content":f"Base URL: {base_url}\nPage (truncated): {snippet}\n\nMake a JSON action plan for: \"{step_desc}\""}
+        {"role":"user","content":f"Base URL: {base_url}\nPage: {snippet}\n\nMake a JSON action plan for: \"{step_desc}\""}
     ]
     out = chat(messages, temperature=0.0)  # clamp creativity
     try:
         data = json.loads(out)
         actions = _sanitize(data.get("actions", []))
+        if actions:
+            put_plan(snippet, step_desc, base_url, actions)
         return actions or [{"type":"click","target":step_desc}]
     except Exception:
         # Fallback to something deterministic so we can still log/observe
         return [{"type":"click","target":step_desc}]
+
+def forget_plan(page_html, step_desc, base_url):
+    """Invalidate the cached plan for this step/page after it failed to execute."""
+    return invalidate_plan(_snippet(page_html), step_desc, base_url)
+
+def remember_plan(page_html, step_desc, base_url, actions):
+    """Cache a look-ahead plan under the page its step actually ran on."""
+    return put_plan(_snippet(page_html), step_desc, base_url, actions)
+
+def plan_goal(page_html, step_descs, base_url):
+    """Plan several consecutive steps in one LLM call (plan-ahead mode).
+    Returns a list aligned with `step_descs`; entries are None where the model gave
+    nothing usable, so the caller can fall back to plan_step for them.
+    Only the first step's page is known now, so only its plan is read from and written
+    to the plan cache here; a cached first step skips the LLM call entirely. The
+    executor caches later steps' plans with remember_plan once they run.
+    """
+    if not step_descs:
+        return []
+    snippet = _snippet(page_html)
+    cached = get_plan(snippet, step_descs[0], base_url)
+    if cached:
+        return [cached] + [None] * (len(step_descs) - 1)
+    if CACHE_ONLY.get():
+        return [None] * len(step_descs)  # plan_step serves them from the cache
+    numbered = "\n".join(f"{k}. {d}" for k, d in enumerate(step_descs, start=1))
+    messages = [
+        {"role":"system","content":PLAN_AHEAD_SYS},
+        {"role":"user","content":f"Base URL: {base_url}\nPage: {snippet}\n\nMake JSON action plans for these steps:\n{numbered}"}
+    ]
+    out = chat(messages, temperature=0.0)
+    try:
+        entries = json.loads(out).get("steps", [])
+    except Exception:
+        return [None] * len(step_descs)
+    plans = []
+    for k in range(len(step_descs)):
+        e = entries[k] if k < len(entries) else None
+        acts = _sanitize(e.get("actions", [])) if isinstance(e, dict) else []
+        plans.append(acts or None)
+    if plans[0]:
+        put_plan(snippet, step_descs[0], base_url, plans[0])
+    return plans
@@ -0,0 +1,121 @@
+import os, re, json, time
+from .resolver import SELECTOR_JS
+from .phases import timed, timed_async
+from .snapshot import snapshot_for
+
+# ---- replay scripts ----
+# A green run compiles the actions it actually executed, together with the selector
+# of every element it acted on, into runs/replay/<goal>.json. `--replay` executes
+# that script without the planner; a step whose recorded selectors no longer match
+# falls back to the digest + plan_step path, and individual actions whose selector
+# vanished are healed from their `target` hint.
+REPLAY_DIR = os.getenv("REPLAY_DIR", os.path.join("runs", "replay"))
+VERSION = 1
+
+def script_path(name: str):
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", (name or "goal").strip()).strip("_") or "goal"
+    return os.path.join(REPLAY_DIR, f"{slug}.json")
+
+def _norm(desc: str):
+    return re.sub(r"\s+", " ", (desc or "").strip().lower())
+
+def load_script(name: str):
+    """{step index: actions} for a goal's replay script, or {} if there is none."""
+    try:
+        with open(script_path(name), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return {}
+    if data.get("version") != VERSION:
+        return {}
+    return {s["index"]: s for s in data.get("steps") or []}
+
+def scripted_actions(script, i: int, desc: str):
+    """Recorded actions for step i, only if the goal's step text is unchanged."""
+    s = script.get(i)
+    if not s or _norm(s.get("description")) != _norm(desc):
+        return None
+    return s.get("actions") or None
+
+def save_script(path: str, name: str, url: str, steps):
+    """steps: [{index, description, actions}] as executed."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": VERSION, "name": name, "url": url, "created": int(time.time()), "steps": steps},
+                  f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return path
+
+def describe(el):
+    """{selector, frame} for a resolved locator, or None if it cannot be pinned.
+    The executors only call this when the locator did not come from the healer's
+    resolver or a replay pin, which already know their selector (PageSnapshot.pin_of)."""
+    try:
+        info = el.first.evaluate(SELECTOR_JS)
+    except Exception:
+        return None
+    if not info or not info.get("selector"):
+        return None
+    return {"selector": info["selector"], "frame": info.get("frame")}
+
+async def describe_async(el):
+    try:
+        info = await el.first.evaluate(SELECTOR_JS)
+    except Exception:
+        return None
+    if not info or not info.get("selector"):
+        return None
+    return {"selector": info["selector"], "frame": info.get("frame")}
+
+def _scope(page, frame_url):
+    if not frame_url:
+        return page
+    for fr in page.frames:
+        if fr.url == frame_url:
+            return fr
+    return None
+
+@timed("resolve")
+def pinned(page, act, key="selector", frame_key="frame"):
+    """Locator for a recorded selector if it still matches exactly one element."""
+    sel = (act or {}).get(key)
+    if not sel:
+        return None
+    try:
+        scope = _scope(page, act.get(frame_key))
+        if scope is None:
+            return None
+        loc = scope.locator(sel)
+        if loc.count() != 1:
+            return None
+        loc = loc.first
+        snapshot_for(page).pin(loc, sel, act.get(frame_key))
+        return loc
+    except Exception:
+        return None
+
+@timed_async("resolve")
+async def pinned_async(page, act, key="selector", frame_key="frame"):
+    sel = (act or {}).get(key)
+    if not sel:
+        return None
+    try:
+        scope = _scope(page, act.get(frame_key))
+        if scope is None:
+            return None
+        loc = scope.locator(sel)
+        if await loc.count() != 1:
+            return None
+        loc = loc.first
+        snapshot_for(page).pin(loc, sel, act.get(frame_key))
+        return loc
+    except Exception:
+        return None
+
+def first_pin(actions):
+    """The first action carrying a recorded selector (checked before replaying a step)."""
+    for a in actions or []:
+        if a.get("selector"):
+            return a
+    return None
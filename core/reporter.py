@@ -1,5 +1,6 @@
 import os, time, json
 from jinja2 import Template
+from .phases import stats as span_stats, timeline
 
 TEMPLATE = """<!doctype html>
 <html>
@@ -45,6 +46,10 @@ pre{white-space:pre-wrap;background:#0b1220;color:#e5e7eb;padding:12px;border-ra
 .toolbar a{color:white;text-decoration:none;border:1px solid rgba(255,255,255,.35);padding:6px 10px;border-radius:8px}
 .small{color:var(--muted);font-size:13px}
 .a-muted{color:#374151}
+.flame{position:relative;background:#f9fafb;border:1px solid var(--border);border-radius:8px;margin:6px 0}
+.bar{position:absolute;height:16px;overflow:hidden;white-space:nowrap;font-size:11px;line-height:16px;padding:0 3px;color:#fff;border-radius:3px;background:#9ca3af}
+.bar-plan{background:#6366f1}.bar-llm{background:#a855f7}.bar-resolve{background:#f59e0b}.bar-heal{background:#fbbf24;color:#111}
+.bar-act{background:#10b981}.bar-wait{background:#60a5fa}.bar-screenshot{background:#ec4899}.bar-noise{background:#78716c}
 </style>
 <script>
 function toggleAll(open){
@@ -68,8 +73,8 @@ function toggleAll(open){
         <div class="chip pass">Pass: {{pass_count}}</div>
         <div class="chip fail">Fail: {{fail_count}}</div>
         <div class="toolbar">
-          <a href="trace.zip">Download trace.zip</a>
-          <a href="#" onclick="toggleAll(true);return false;">Expand all</a>
+          {% for t in traces %}<a href="{{t}}">Download {{t}}</a>
+          {% endfor %}          <a href="#" onclick="toggleAll(true);return false;">Expand all</a>
           <a href="#" onclick="toggleAll(false);return false;">Collapse all</a>
         </div>
       </div>
@@ -98,6 +103,15 @@ function toggleAll(open){
               <pre>{{s.notes}}</pre>
             </details>
             {% endif %}
+            {% set tl = timelines.get(s.index) %}
+            {% if tl %}
+            <details class="details">
+              <summary>Timeline · {{tl.ms}} ms{% if s.phases %} · {% for k, v in s.phases.items() %}{{k}} {{v}}{% if not loop.last %}, {% endif %}{% endfor %}{% endif %}</summary>
+              <div class="flame" style="height:{{(tl.depth+1)*18+2}}px">
+                {% for b in tl.bars %}<div class="bar bar-{{b.kind}}" style="left:{{b.left}}%;width:{{b.width}}%;top:{{b.depth*18+1}}px" title="{{b.name}} {{b.ms}} ms{{b.note}}">{{b.name}}</div>{% endfor %}
+              </div>
+            </details>
+            {% endif %}
             {% if s.screenshot %}
             <div>
               <a href="{{s.screenshot}}" target="_blank"><img class="sshot" src="{{s.screenshot}}" alt="Step {{loop.index}} screenshot"/></a>
@@ -128,23 +142,135 @@ function toggleAll(open){
       </div>
     </div>
 
-    <div class="section small">Tip: Open <code>trace.zip</code> in Playwright Trace Viewer for a deep dive.</div>
+    {% if phases %}
+    <div class="section">
+      <h2>Where the time went</h2>
+      <div class="card"><div class="card-body small">
+        {% for k, v in phases.items() %}<span class="badge">{{k}} {{v}} ms</span> {% endfor %}
+      </div></div>
+    </div>
+    {% endif %}
+
+    {% if traces %}<div class="section small">Tip: Open <code>{{traces[0]}}</code> in Playwright Trace Viewer for a deep dive.</div>{% endif %}
   </div>
 </body>
 </html>"""
 
+def _timings(out_dir):
+    """(phase totals, spans) written by the executor (core.phases), if any."""
+    try:
+        with open(os.path.join(out_dir, "phases.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data.get("phases") or {}, data.get("spans") or []
+    except Exception:
+        return {}, []
+
 def write_report(out_dir, name, url, start_ts, steps, assertions):
+    t0 = time.perf_counter()
+    phases, spans = _timings(out_dir)
     html = Template(TEMPLATE).render(
         name=name,
         url=url,
         start_ts=time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start_ts)),
         duration_sec=round(time.time()-start_ts,2),
         steps=steps,
-        assertions=assertions
+        assertions=assertions,
+        traces=sorted(f for f in os.listdir(out_dir) if f.startswith("trace") and f.endswith(".zip")),
+        phases=phases,
+        timelines={s["index"]: timeline(spans, s["index"]) for s in steps},
     )
     path = os.path.join(out_dir, "report.html")
     with open(path, "w", encoding="utf-8") as f:
         f.write(html)
+    phases = dict(phases, report=round((time.perf_counter()-t0)*1000, 1))
     with open(os.path.join(out_dir, "report.json"), "w", encoding="utf-8") as f:
-        json.dump({"name":name,"url":url,"steps":steps,"assertions":assertions}, f, ensure_ascii=False, indent=2)
+        json.dump({"name":name,"url":url,"steps":steps,"assertions":assertions,"phases":phases,
+                   "span_stats":span_stats(spans),"spans":spans}, f, ensure_ascii=False, indent=2)
+    return path
+
+SUITE_TEMPLATE = """<!doctype html>
+<html>
+<head>
+<meta charset="utf-8"/>
+<title>Suite – SmartUI-AI Report</title>
+<style>
+:root{--bg:#f6f7fb; --card:#ffffff; --text:#0f1222; --muted:#6b7280; --border:#e5e7eb; --pass:#10b981; --fail:#ef4444}
+*{box-sizing:border-box}
+body{margin:0;font-family:ui-sans-serif,system-ui,-apple-system,Segoe UI,Roboto,Arial;background:var(--bg);color:var(--text)}
+.container{max-width:1080px;margin:0 auto;padding:24px}
+.header{background:linear-gradient(135deg, #6366f1 0%, #22c55e 100%);color:white;border-radius:16px;padding:20px 24px}
+.header h1{margin:0 0 6px 0;font-size:28px}
+.summary{display:flex;gap:10px;margin-top:12px;flex-wrap:wrap}
+.chip{padding:6px 10px;background:rgba(255,255,255,.15);border-radius:999px;font-weight:600}
+table{width:100%;margin-top:22px;border-collapse:collapse;background:var(--card);border:1px solid var(--border);border-radius:14px;overflow:hidden}
+th,td{text-align:left;padding:10px 12px;border-bottom:1px solid var(--border);vertical-align:top}
+th{color:var(--muted);font-size:13px}
+.status-pass{color:var(--pass);font-weight:700}
+.status-fail,.status-error{color:var(--fail);font-weight:700}
+pre{white-space:pre-wrap;margin:6px 0 0 0;font-size:12px;color:var(--muted)}
+</style>
+</head>
+<body>
+  <div class="container">
+    <div class="header">
+      <h1>Suite</h1>
+      <div>Started: {{start_ts}} · Duration: {{duration_sec}}s</div>
+      <div class="summary">
+        <div class="chip">Goals: {{goals|length}}</div>
+        <div class="chip">Pass: {{goals|selectattr('status','equalto','pass')|list|length}}</div>
+        <div class="chip">Fail: {{goals|rejectattr('status','equalto','pass')|list|length}}</div>
+      </div>
+    </div>
+    <table>
+      <tr><th>#</th><th>Goal</th><th>Status</th><th>Steps</th><th>Assertions</th><th>Time</th></tr>
+      {% for g in goals %}
+      <tr>
+        <td>{{g.index}}</td>
+        <td>{% if g.report %}<a href="{{g.report}}">{{g.name}}</a>{% else %}{{g.name}}{% endif %}<div class="small">{{g.goal}}</div>
+          {% if g.error %}<pre>{{g.error}}</pre>{% endif %}</td>
+        <td class="status-{{g.status}}">{{g.status|upper}}</td>
+        <td>{{g.steps - g.failed_steps}}/{{g.steps}}</td>
+        <td>{{g.assertions - g.failed_assertions}}/{{g.assertions}}</td>
+        <td>{{g.elapsed_ms}} ms</td>
+      </tr>
+      {% endfor %}
+    </table>
+  </div>
+</body>
+</html>"""
+
+def _suite_timings(suite_dir, goals):
+    """Phase totals and span stats over all goals of a suite -> suite_dir/timings.json."""
+    phases, spans = {}, []
+    for g in goals:
+        if not g.get("report"):
+            continue
+        try:
+            with open(os.path.join(suite_dir, os.path.dirname(g["report"]), "report.json"), "r", encoding="utf-8") as f:
+                rep = json.load(f)
+        except Exception:
+            continue
+        for k, v in (rep.get("phases") or {}).items():
+            phases[k] = round(phases.get(k, 0.0) + v, 1)
+        spans.extend(rep.get("spans") or [])
+    out = {"goals": len(goals), "phases": dict(sorted(phases.items(), key=lambda kv: -kv[1])), "spans": span_stats(spans)}
+    with open(os.path.join(suite_dir, "timings.json"), "w", encoding="utf-8") as f:
+        json.dump(out, f, indent=2)
+    return out
+
+def write_suite_report(suite_dir, start_ts, goals):
+    html = Template(SUITE_TEMPLATE).render(
+        start_ts=time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start_ts)),
+        duration_sec=round(time.time()-start_ts,2),
+        goals=goals
+    )
+    path = os.path.join(suite_dir, "suite.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html)
+    with open(os.path.join(suite_dir, "suite.json"), "w", encoding="utf-8") as f:
+        json.dump({"start_ts":start_ts,"duration_sec":round(time.time()-start_ts,2),"goals":goals}, f, ensure_ascii=False, indent=2)
+    try:
+        _suite_timings(suite_dir, goals)
+    except Exception:
+        pass
     return path
@@ -0,0 +1,246 @@
+import os
+
+# ---- single-round-trip element resolver ----
+# All healer strategies are evaluated inside the page in one `evaluate` call. The
+# first strategy in `order` with a match wins (core.healstats reorders per host);
+# the element comes back as a selector that is unique in its document (id /
+# data-test / name when possible, otherwise an nth-of-type path). Open shadow roots
+# are searched too. Per-strategy timings are returned for the hit-rate statistics.
+ENABLED = os.getenv("HEALER_JS_RESOLVER", "1").strip().lower() not in ("0", "false", "no", "off")
+
+ORDER = {
+    "clickable": ["alias", "role", "has_text", "testid", "input_attr", "attr", "intent", "text", "tokens"],
+    "input": ["alias", "aria", "placeholder", "label", "guess", "textbox", "testid", "label_input", "label_textarea", "textarea"],
+    "target": ["role", "label", "placeholder", "testid", "text", "contains"],
+}
+
+# unique-selector builder shared by RESOLVE_JS and SELECTOR_JS
+_SELECTOR_FOR = r"""
+  const uniq = (root, sel) => { try { return root.querySelectorAll(sel).length === 1; } catch (e) { return false; } };
+  const q = (v) => '"' + String(v).replace(/\\/g, '\\\\').replace(/"/g, '\\"') + '"';
+  const selectorFor = (el) => {
+    const root = el.getRootNode();
+    const prefix = (root instanceof ShadowRoot) ? selectorFor(root.host).selector + ' ' : '';
+    const tag = el.tagName.toLowerCase();
+    const tries = [];
+    if (el.id) tries.push('#' + CSS.escape(el.id));
+    for (const a of ['data-testid', 'data-test', 'name', 'aria-label', 'placeholder']) {
+      const v = el.getAttribute(a);
+      if (v) tries.push(`${tag}[${a}=${q(v)}]`);
+    }
+    for (const s of tries) if (uniq(root, s)) return {selector: prefix + s, stable: true};
+    const parts = [];
+    for (let n = el; n && n.nodeType === 1; n = n.parentElement) {
+      if (n !== el && n.id && uniq(root, '#' + CSS.escape(n.id))) { parts.unshift('#' + CSS.escape(n.id)); break; }
+      let k = 1;
+      for (let s = n.previousElementSibling; s; s = s.previousElementSibling) if (s.tagName === n.tagName) k++;
+      parts.unshift(`${n.tagName.toLowerCase()}:nth-of-type(${k})`);
+    }
+    return {selector: prefix + parts.join(' > '), stable: false};
+  };
+"""
+
+RESOLVE_JS = r"""
+({hint, kind, order, aliases, guesses, intents, known}) => {
+  // DOM version kept by core/snapshot.py's init script; a remembered hit is reused
+  // (nothing resolved again) while the version it was resolved at is unchanged
+  const version = window.__pwuDom ? [window.__pwuDom.doc, window.__pwuDom.gen, location.href] : null;
+  if (known && version && JSON.stringify(known) === JSON.stringify(version)) return {memo: true, version};
+  const H = String(hint || '').trim();
+  const hl = H.toLowerCase();
+  let rx;
+  try { rx = new RegExp(H, 'i'); } catch (e) { rx = new RegExp(H.replace(/[.*+?^${}()|[\]\\]/g, '\\$&'), 'i'); }
+  const needVisible = kind === 'clickable';
+
+  const all = [];
+  const walk = (root) => {
+    for (const el of root.querySelectorAll('*')) {
+      all.push(el);
+      if (el.shadowRoot) walk(el.shadowRoot);
+    }
+  };
+  walk(document);
+
+  const norm = (s) => String(s || '').replace(/\s+/g, ' ').trim();
+  const text = (el) => norm(el.textContent);
+  const attr = (el, a) => el.getAttribute(a) || '';
+  const attrHas = (el, a, needle) => attr(el, a).toLowerCase().includes(needle);
+  const visible = (el) => {
+    const r = el.getBoundingClientRect();
+    if (!r.width || !r.height) return false;
+    const cs = getComputedStyle(el);
+    return cs.visibility !== 'hidden' && cs.display !== 'none';
+  };
+  const ok = (el) => !!el && (!needVisible || visible(el));
+  const first = (els) => { for (const el of els) if (ok(el)) return el; return null; };
+
+  const role = (el) => {
+    const r = attr(el, 'role');
+    if (r) return r.split(/\s+/)[0].toLowerCase();
+    const t = el.tagName;
+    if (t === 'BUTTON') return 'button';
+    if (t === 'A' && el.hasAttribute('href')) return 'link';
+    if (t === 'TEXTAREA') return 'textbox';
+    if (t === 'INPUT') {
+      const ty = (el.type || 'text').toLowerCase();
+      if (['button', 'submit', 'reset', 'image'].includes(ty)) return 'button';
+      if (['text', 'email', 'tel', 'url', 'search', 'password', 'number'].includes(ty)) return 'textbox';
+      if (ty === 'checkbox') return 'checkbox';
+      if (ty === 'radio') return 'radio';
+    }
+    if (t === 'SELECT') return 'combobox';
+    return '';
+  };
+  const byIdText = (el, ids) => ids.split(/\s+/).map(i => {
+    const n = el.getRootNode().getElementById ? el.getRootNode().getElementById(i) : document.getElementById(i);
+    return n ? n.textContent : '';
+  }).join(' ');
+  const labelsOf = (el) => el.labels ? Array.from(el.labels).map(l => l.textContent).join(' ') : '';
+  const accName = (el) => {
+    const al = attr(el, 'aria-label'); if (al) return norm(al);
+    const lb = attr(el, 'aria-labelledby'); if (lb) { const t = norm(byIdText(el, lb)); if (t) return t; }
+    const ls = norm(labelsOf(el)); if (ls) return ls;
+    if (el.tagName === 'INPUT') {
+      if (['button', 'submit', 'reset'].includes((el.type || '').toLowerCase())) return norm(el.value);
+      return norm(attr(el, 'placeholder') || attr(el, 'title'));
+    }
+    if (el.tagName === 'TEXTAREA') return norm(attr(el, 'placeholder') || attr(el, 'title'));
+    const t = text(el); if (t) return t;
+    const img = el.querySelector('img[alt]'); if (img) return norm(img.alt);
+    return norm(attr(el, 'title'));
+  };
+  const labelled = (el) => rx.test(norm(labelsOf(el))) || rx.test(attr(el, 'aria-label'))
+    || (attr(el, 'aria-labelledby') && rx.test(byIdText(el, attr(el, 'aria-labelledby'))));
+
+  // CSS lists that may contain Playwright's :has-text('...') pseudo (as used in aliases)
+  const query = (list) => {
+    const out = [];
+    for (const part of String(list).split(/,(?![^\[]*\])/)) {
+      const p = part.trim(); if (!p || p.startsWith('text=') || p.startsWith('xpath=')) continue;
+      const m = p.match(/^(.*):has-text\((['"])(.*)\2\)$/);
+      try {
+        if (m) {
+          const needle = m[3].toLowerCase();
+          for (const el of document.querySelectorAll(m[1] || '*')) if (text(el).toLowerCase().includes(needle)) out.push(el);
+        } else {
+          for (const el of document.querySelectorAll(p)) out.push(el);
+        }
+      } catch (e) { /* not CSS */ }
+    }
+    return out;
+  };
+  const fromLists = (lists) => { for (const l of lists || []) { const el = first(query(l)); if (el) return el; } return null; };
+  // deepest elements whose text matches (what getByText would land on)
+  const deepest = (pred) => all.filter(el => pred(el) && !Array.from(el.children).some(c => pred(c)))
+    .filter(el => !['SCRIPT', 'STYLE', 'HEAD', 'TITLE', 'NOSCRIPT'].includes(el.tagName));
+  const isClickable = (el) => ['A', 'BUTTON'].includes(el.tagName) || ['button', 'link'].includes(attr(el, 'role'));
+  const attrMatch = (el, needle) => (
+    (['A', 'BUTTON'].includes(el.tagName) && ['id', 'name', 'title', 'class'].some(a => attrHas(el, a, needle)))
+    || (['button', 'link'].includes(attr(el, 'role')) && attrHas(el, 'id', needle))
+    || attr(el, 'data-testid').includes(needle) || attr(el, 'data-test').includes(needle)
+  );
+  const followingOf = (tag) => {
+    const lbl = all.find(el => el.tagName === 'LABEL' && text(el).toLowerCase().includes(hl));
+    if (!lbl) return null;
+    return all.find(el => el.tagName === tag && (lbl.compareDocumentPosition(el) & Node.DOCUMENT_POSITION_FOLLOWING)
+      && !lbl.contains(el)) || null;
+  };
+
+  const S = {
+    alias: () => fromLists(aliases),
+    role: () => first(all.filter(el => (kind === 'target' ? role(el) === 'button' : ['button', 'link'].includes(role(el)))
+      && rx.test(accName(el)))),
+    has_text: () => first(all.filter(el => (el.tagName === 'BUTTON' || el.tagName === 'A' || attr(el, 'role') === 'button')
+      && text(el).toLowerCase().includes(hl))),
+    testid: () => first(all.filter(el => attr(el, 'data-testid').includes(H) || attr(el, 'data-test').includes(H))),
+    input_attr: () => first(all.filter(el => el.tagName === 'INPUT'
+      && ['id', 'name', 'placeholder', 'value'].some(a => attrHas(el, a, hl)))),
+    attr: () => first(all.filter(el => attrMatch(el, hl))),
+    intent: () => fromLists(intents),
+    text: () => {
+      const node = first(deepest(el => rx.test(text(el))));
+      if (!node || kind !== 'clickable') return node;
+      const anc = node.closest('button, a, [role=button]');
+      return anc && visible(anc) ? anc : node;
+    },
+    tokens: () => {
+      for (const t of (hl.match(/[a-z0-9]+/g) || []).filter(t => t.length >= 3)) {
+        const el = first(all.filter(el => attrMatch(el, t) || (el.tagName === 'A' && attrHas(el, 'href', t))));
+        if (el) return el;
+      }
+      return null;
+    },
+    aria: () => first(all.filter(el => ['INPUT', 'TEXTAREA'].includes(el.tagName)
+      && (attrHas(el, 'aria-label', hl) || attrHas(el, 'aria-placeholder', hl)))),
+    placeholder: () => first(all.filter(el => el.hasAttribute('placeholder') && rx.test(attr(el, 'placeholder')))),
+    label: () => first(all.filter(el => ['INPUT', 'TEXTAREA', 'SELECT', 'BUTTON'].includes(el.tagName) || attr(el, 'role'))
+      .filter(labelled)),
+    guess: () => fromLists(guesses),
+    textbox: () => first(all.filter(el => role(el) === 'textbox' && rx.test(accName(el)))),
+    label_input: () => followingOf('INPUT'),
+    label_textarea: () => followingOf('TEXTAREA'),
+    textarea: () => first(all.filter(el => el.tagName === 'TEXTAREA').slice(0, 6).filter(visible)),
+    contains: () => first(deepest(el => text(el).toLowerCase().includes(hl))),
+  };
+
+  /*SELECTOR_FOR*/
+  const timings = {};
+  for (const name of order) {
+    const fn = S[name];
+    if (!fn) continue;
+    let el = null;
+    const t0 = performance.now();
+    try { el = fn(); } catch (e) { el = null; }
+    timings[name] = Math.round((performance.now() - t0) * 100) / 100;
+    if (el) {
+      const out = selectorFor(el);
+      out.strategy = name;
+      out.tag = el.tagName.toLowerCase();
+      out.timings = timings;
+      out.version = version;
+      return out;
+    }
+  }
+  return {selector: null, strategy: null, timings, version};
+}
+""".replace("  /*SELECTOR_FOR*/\n", _SELECTOR_FOR.lstrip("\n"))
+
+# selector for an already-resolved element (replay scripts); `frame` is set when the
+# element lives in a child frame so replay can pick the same frame again
+SELECTOR_JS = r"""
+(el) => {""" + _SELECTOR_FOR + r"""  const out = selectorFor(el);
+  out.frame = window === window.top ? null : location.href;
+  return out;
+}
+"""
+
+def _args(hint, kind, aliases=None, guesses=None, intents=None, order=None, known=None):
+    return {
+        "known": known[0] if known else None,
+        "hint": hint or "",
+        "kind": kind,
+        "order": list(order or ORDER[kind]),
+        "aliases": list(aliases or []),
+        "guesses": list(guesses or []),
+        "intents": list(intents or []),
+    }
+
+def _result(scope, info, known):
+    if info and info.get("memo"):
+        info = dict(known[1], memo=True)
+    if not info or not info.get("selector"):
+        return None, info
+    return scope.locator(info["selector"]).first, info
+
+def resolve(scope, hint, kind="clickable", known=None, **kw):
+    """Resolve `hint` in a Page or Frame with one evaluate call.
+    Returns (locator, info) where info = {selector, stable, strategy, tag, timings, version};
+    on a miss the locator is None and info only carries the timings and DOM version.
+    `known` = (version, info) of an earlier hit: while the scope's DOM version still
+    equals it, that info comes back with memo=True and no strategy runs.
+    Raises if the script could not run (caller falls back to per-strategy probing).
+    """
+    return _result(scope, scope.evaluate(RESOLVE_JS, _args(hint, kind, known=known, **kw)), known)
+
+async def resolve_async(scope, hint, kind="clickable", known=None, **kw):
+    return _result(scope, await scope.evaluate(RESOLVE_JS, _args(hint, kind, known=known, **kw)), known)
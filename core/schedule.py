@@ -0,0 +1,163 @@
+import os, json, time, threading
+from .util import connect_db
+
+# ---- duration-aware goal scheduling ----
+# runs/timings.sqlite keeps one row per finished goal run (name, status, duration),
+# fed by suite runs and by importing report.json files found under runs/. Suites
+# start goals that failed last time first (fail fast), then longest first (LPT), which
+# keeps the slowest goal from starting last on an otherwise idle worker pool.
+_PATH = os.getenv("TIMINGS_PATH", os.path.join("runs", "timings.sqlite"))
+_ENABLED = os.getenv("SCHEDULE", "1").strip().lower() not in ("0", "false", "no", "off")
+_WINDOW = int(os.getenv("SCHEDULE_WINDOW", "5"))   # recent runs per goal used for estimates
+_DEFAULT_MS = 60_000
+
+_LOCK = threading.Lock()
+_INGESTED = {"root": None}
+
+def _conn():
+    conn = connect_db(_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS goal_runs ("
+        " source TEXT PRIMARY KEY, name TEXT NOT NULL, status TEXT, elapsed_ms INTEGER,"
+        " steps INTEGER, finished REAL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS goal_runs_name ON goal_runs(name, finished)")
+    return conn
+
+def _report_row(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    steps = data.get("steps") or []
+    asserts = data.get("assertions") or []
+    failed = any(s.get("status") != "pass" for s in steps) or any(not a.get("passed") for a in asserts)
+    ms = sum(r.get("elapsed_ms") or 0 for r in steps + asserts)
+    return data.get("name"), "fail" if failed else "pass", ms, len(steps)
+
+def record_report(report_json):
+    """Add one goal run from its report.json (idempotent per file)."""
+    try:
+        name, status, ms, n = _report_row(report_json)
+        if not name:
+            return False
+        conn = _conn()
+        try:
+            conn.execute("INSERT OR IGNORE INTO goal_runs VALUES (?,?,?,?,?,?)",
+                         (os.path.abspath(report_json), name, status, ms, n, os.path.getmtime(report_json)))
+            conn.commit()
+        finally:
+            conn.close()
+        return True
+    except Exception:
+        return False
+
+def record(source, name, status, elapsed_ms, steps=None):
+    """Add a goal outcome that has no report.json (e.g. a goal that errored)."""
+    try:
+        conn = _conn()
+        try:
+            conn.execute("INSERT OR IGNORE INTO goal_runs VALUES (?,?,?,?,?,?)",
+                         (source, name, status, int(elapsed_ms or 0), steps, time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception:
+        pass
+
+def record_goal(rec, out_dir, suite_dir):
+    """Feed a suite goal record (core.suite) into the history."""
+    report_json = os.path.join(out_dir, "report.json") if out_dir else None
+    if not (report_json and os.path.exists(report_json) and record_report(report_json)):
+        record(f"{os.path.abspath(suite_dir)}#{rec['index']}", rec.get("name"), rec.get("status"),
+               rec.get("elapsed_ms"), rec.get("steps"))
+
+def ingest_reports(root="runs"):
+    """Import report.json files under `root` not seen before; once per process."""
+    with _LOCK:
+        if _INGESTED["root"] == root:
+            return 0
+        _INGESTED["root"] = root
+    try:
+        conn = _conn()
+    except Exception:
+        return 0
+    added = 0
+    try:
+        known = {r[0] for r in conn.execute("SELECT source FROM goal_runs")}
+        rows = []
+        for dirpath, _, files in os.walk(root):
+            if "report.json" not in files:
+                continue
+            path = os.path.abspath(os.path.join(dirpath, "report.json"))
+            if path in known:
+                continue
+            try:
+                name, status, ms, n = _report_row(path)
+            except Exception:
+                continue
+            if name:
+                rows.append((path, name, status, ms, n, os.path.getmtime(path)))
+        conn.executemany("INSERT OR IGNORE INTO goal_runs VALUES (?,?,?,?,?,?)", rows)
+        conn.commit()
+        added = len(rows)
+    except Exception:
+        pass
+    finally:
+        conn.close()
+    return added
+
+def history(names):
+    """{name: {"estimate_ms", "last_status", "runs"}} for goals with recorded runs."""
+    out = {}
+    try:
+        conn = _conn()
+    except Exception:
+        return out
+    try:
+        for name in set(names):
+            rows = conn.execute(
+                "SELECT status, elapsed_ms FROM goal_runs WHERE name=? ORDER BY finished DESC LIMIT ?", (name, _WINDOW)
+            ).fetchall()
+            if not rows:
+                continue
+            ms = sorted(r[1] or 0 for r in rows)
+            out[name] = {"estimate_ms": ms[len(ms) // 2], "last_status": rows[0][0], "runs": len(rows)}
+    except Exception:
+        pass
+    finally:
+        conn.close()
+    return out
+
+def estimates(names, known=None):
+    """{name: expected ms}; goals without history get the median of the known ones."""
+    known = {n: h["estimate_ms"] for n, h in history(names).items()} if known is None else known
+    vals = sorted(known[n] for n in names if n in known)
+    fallback = vals[len(vals) // 2] if vals else _DEFAULT_MS
+    return {n: known.get(n, fallback) for n in names}
+
+def order(items, name_of=lambda x: x):
+    """Recently failed goals first, then longest expected duration first.
+    Returns (ordered items, {name: estimate_ms}). Stable for ties.
+    """
+    names = [name_of(x) for x in items]
+    if not _ENABLED:
+        return list(items), estimates(names, known={})
+    ingest_reports()
+    hist = history(names)
+    est = estimates(names, {n: h["estimate_ms"] for n, h in hist.items()})
+    failed = {n for n, h in hist.items() if h["last_status"] != "pass"}
+    ranked = sorted(enumerate(items), key=lambda kx: (name_of(kx[1]) not in failed, -est[name_of(kx[1])], kx[0]))
+    return [x for _, x in ranked], est
+
+def lpt_bins(durations, n):
+    """Longest-processing-time-first packing of {key: ms} into n bins.
+    Returns (bins as lists of keys, predicted makespan in ms). Suites only use the
+    makespan: their workers pull from one queue in order(), which fills the same way
+    when the estimates hold and adapts when they don't.
+    """
+    bins = [[] for _ in range(max(1, n))]
+    load = [0] * len(bins)
+    for key, ms in sorted(durations.items(), key=lambda kv: -kv[1]):
+        k = load.index(min(load))
+        bins[k].append(key)
+        load[k] += ms
+    return bins, max(load) if load else 0
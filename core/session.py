@@ -0,0 +1,112 @@
+import os, re, json, time, hashlib, asyncio, threading
+from .util import load_goal_spec
+from .reporter import write_report
+from .executor import run_goal
+
+# ---- setup goals + cached storage state ----
+# A goal can name a setup goal (`setup: login.goal.yaml`, relative to the goal file).
+# The setup goal runs once; on a green run its context's storage_state (cookies +
+# localStorage) is written to runs/state/<setup>_<hash>.json and every dependent goal
+# starts its context from that file instead of repeating the login flow. The file is
+# reused until it is older than the TTL (setup `state_ttl:`, else STATE_TTL seconds)
+# or one of its cookies has expired; editing the setup goal changes the hash.
+STATE_DIR = os.getenv("STATE_DIR", os.path.join("runs", "state"))
+_TTL = float(os.getenv("STATE_TTL", "3600"))
+
+_LOCK = threading.Lock()
+_KEY_LOCKS = {}     # key -> threading.Lock (suite worker threads)
+_ASYNC_LOCKS = {}   # (loop, key) -> asyncio.Lock (async suites)
+_FAILED = {}        # key -> error of a setup run that failed in this process
+
+def resolve(setup, base_dir):
+    """(setup goal path, ttl override or None) from a goal's `setup:` value."""
+    if not setup:
+        return None, None
+    ttl = None
+    if isinstance(setup, dict):
+        ttl = setup.get("ttl")
+        setup = setup.get("goal")
+    path = setup if os.path.isabs(setup) else os.path.join(base_dir or ".", setup)
+    return path, (float(ttl) if ttl is not None else None)
+
+def _key(spec, text):
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", spec["name"]).strip("_") or "setup"
+    return f"{slug}_{hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]}"
+
+def state_path(key):
+    return os.path.join(STATE_DIR, f"{key}.json")
+
+def fresh(path, ttl):
+    """True if a state file exists, is younger than `ttl` and has no expired cookie."""
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            return False
+        with open(path, "r", encoding="utf-8") as f:
+            cookies = json.load(f).get("cookies") or []
+    except Exception:
+        return False
+    now = time.time()
+    return all(not c.get("expires") or c["expires"] < 0 or c["expires"] > now for c in cookies)
+
+def invalidate(path):
+    try: os.remove(path)
+    except OSError: pass
+
+def _prepare(setup_path, ttl):
+    with open(setup_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    spec = load_goal_spec(setup_path)
+    key = _key(spec, text)
+    ttl = ttl if ttl is not None else float(spec.get("state_ttl") or _TTL)
+    return spec, key, state_path(key), ttl
+
+def _out_dir(out_root, spec):
+    return os.path.join(out_root, "_setup", f"{spec['name'].replace(' ', '_')}_{int(time.time())}")
+
+def _finish(spec, key, path, out_dir, started, srec, arec):
+    write_report(out_dir, spec["name"], spec["url"] or "", started, srec, arec)
+    if os.path.exists(path):
+        return path
+    _FAILED[key] = f"setup goal '{spec['name']}' failed; see {out_dir}"
+    raise RuntimeError(_FAILED[key])
+
+def ensure_state(setup, base_dir, out_root="runs", browser=None, headless=True, **run_opts):
+    """storage_state path for a goal's `setup:`, running the setup goal if needed.
+    Returns None when the goal has no setup. Raises RuntimeError if the setup fails.
+    """
+    setup_path, ttl = resolve(setup, base_dir)
+    if not setup_path:
+        return None
+    spec, key, path, ttl = _prepare(setup_path, ttl)
+    with _LOCK:
+        lock = _KEY_LOCKS.setdefault(key, threading.Lock())
+    with lock:  # one login per state; other workers wait for it and reuse the file
+        if key in _FAILED:
+            raise RuntimeError(_FAILED[key])
+        if fresh(path, ttl):
+            return path
+        invalidate(path)
+        started = time.time()
+        out_dir, srec, arec = run_goal(spec["name"], spec["url"], spec["steps"], spec["assertions"], headless=headless,
+                                       browser=browser, out_dir=_out_dir(out_root, spec), save_state=path,
+                                       network=spec.get("network"), **run_opts)
+        return _finish(spec, key, path, out_dir, started, srec, arec)
+
+async def ensure_state_async(setup, base_dir, out_root="runs", browser=None, headless=True, **run_opts):
+    setup_path, ttl = resolve(setup, base_dir)
+    if not setup_path:
+        return None
+    from .async_executor import run_goal as run_goal_async
+    spec, key, path, ttl = _prepare(setup_path, ttl)
+    lock = _ASYNC_LOCKS.setdefault((asyncio.get_running_loop(), key), asyncio.Lock())
+    async with lock:
+        if key in _FAILED:
+            raise RuntimeError(_FAILED[key])
+        if fresh(path, ttl):
+            return path
+        invalidate(path)
+        started = time.time()
+        out_dir, srec, arec = await run_goal_async(spec["name"], spec["url"], spec["steps"], spec["assertions"],
+                                                   headless=headless, browser=browser, out_dir=_out_dir(out_root, spec),
+                                                   save_state=path, network=spec.get("network"), **run_opts)
+        return _finish(spec, key, path, out_dir, started, srec, arec)
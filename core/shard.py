@@ -0,0 +1,302 @@
+import os, io, hmac, json, time, socket, secrets, zipfile, threading, traceback
+import urllib.request, urllib.parse, urllib.error
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from .reporter import write_suite_report
+from .util import load_goal_spec
+from .session import resolve as resolve_setup
+from .schedule import order, estimates, record_goal
+
+# ---- distributed suite: coordinator + workers ----
+# The coordinator (`main.py goals/ --coordinator`) serves a pull queue over plain
+# HTTP in core.schedule order (recently failed first, then longest first). Workers
+# (`main.py --worker http://host:port`) run goals with the normal suite worker pool
+# and upload each goal's artifacts dir as a zip; the coordinator unpacks them into
+# one suite dir and writes suite.html/suite.json once every goal has reported.
+# A goal whose worker goes silent for SHARD_LEASE seconds is handed out again under a
+# new lease id; only a result carrying the goal's current lease is accepted, so a late
+# upload from the first worker cannot overwrite the re-run.
+# Jobs carry goal text (including `vars`), so every request must present the shared
+# SHARD_TOKEN as a bearer token; the coordinator binds to 127.0.0.1 unless told otherwise
+# and prints a generated token when SHARD_TOKEN is unset. A goal's `setup:` file ships
+# with the job and is written next to the worker's copy of the goal.
+_LEASE = float(os.getenv("SHARD_LEASE", "1800"))
+_POLL = float(os.getenv("SHARD_POLL", "5"))
+
+def _setup_payload(setup, path):
+    """{rel, text} of a goal's setup file, rel being its path relative to the goal's dir."""
+    setup_path, _ = resolve_setup(setup, os.path.dirname(path))
+    if not setup_path:
+        return None
+    with open(setup_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    return {"rel": os.path.relpath(setup_path, os.path.dirname(path) or "."), "text": text}
+
+class Coordinator:
+    """Pull queue of goal files plus result collection for one suite."""
+
+    def __init__(self, paths, suite_dir, history=None, lease=_LEASE):
+        self.suite_dir = suite_dir
+        self.lease = lease
+        self.start_ts = time.time()
+        self.jobs = {}
+        self.results = {}
+        for idx, path in enumerate(paths, start=1):
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            name, setup = os.path.basename(path), None
+            try:
+                spec = load_goal_spec(path)
+                name = spec["name"]
+                setup = _setup_payload(spec.get("setup"), path)
+            except Exception:
+                pass
+            self.jobs[idx] = {"index": idx, "path": path, "name": name, "text": text, "setup": setup}
+        if history is None:
+            ordered, est = order(list(self.jobs.values()), name_of=lambda j: j["name"])
+        else:
+            est = estimates([j["name"] for j in self.jobs.values()], history)
+            ordered = sorted(self.jobs.values(), key=lambda j: (-est[j["name"]], j["index"]))
+        for j in self.jobs.values():
+            j["estimate_ms"] = est[j["name"]]
+        self.pending = deque(j["index"] for j in ordered)
+        self.leases = {}
+        self.cond = threading.Condition()
+
+    def finished(self):
+        return len(self.results) == len(self.jobs)
+
+    def next(self, worker):
+        with self.cond:
+            if not self.pending:
+                now = time.time()
+                for idx, (_, deadline, _) in list(self.leases.items()):
+                    if deadline < now and idx not in self.results:
+                        del self.leases[idx]
+                        self.pending.append(idx)
+            if self.pending:
+                idx = self.pending.popleft()
+                lease = secrets.token_hex(8)
+                self.leases[idx] = (worker, time.time() + self.lease, lease)
+                return {"job": dict(self.jobs[idx], lease=lease)}
+            if self.finished():
+                return {"done": True}
+            return {"wait": _POLL}
+
+    def current(self, idx, lease):
+        """Whether `lease` is the goal's live lease (an expired or finished one is not)."""
+        with self.cond:
+            held = self.leases.get(idx)
+            return bool(lease) and held is not None and held[2] == lease and idx not in self.results
+
+    def complete(self, idx, payload: bytes, lease=None):
+        """Unpack a worker's result; None (nothing written) unless `lease` is current."""
+        if not self.current(idx, lease):
+            return None
+        job = self.jobs[idx]
+        goal_dir = os.path.join(self.suite_dir, f"{idx:03d}_{job['name'].replace(' ', '_')}")
+        os.makedirs(goal_dir, exist_ok=True)
+        root = os.path.realpath(goal_dir)
+        rec = None
+        with zipfile.ZipFile(io.BytesIO(payload)) as zf:
+            for member in zf.infolist():
+                if member.filename == "record.json":
+                    rec = json.loads(zf.read(member).decode("utf-8"))
+                    continue
+                dest = os.path.realpath(os.path.join(goal_dir, member.filename))
+                if not dest.startswith(root + os.sep) or member.is_dir():
+                    continue  # skip directories and anything escaping the goal dir
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                with zf.open(member) as src, open(dest, "wb") as out:
+                    out.write(src.read())
+        rec = rec or {"status": "error", "error": "worker sent no record"}
+        rec.update({"index": idx, "goal": job["path"]})
+        if os.path.exists(os.path.join(goal_dir, "report.html")):
+            rec["report"] = os.path.relpath(os.path.join(goal_dir, "report.html"), self.suite_dir)
+        with self.cond:
+            if idx in self.results:
+                return None  # the same lease uploaded twice at once; first one wins
+            self.results[idx] = rec
+            self.leases.pop(idx, None)
+            self.cond.notify_all()
+        record_goal(rec, goal_dir, self.suite_dir)
+        return rec
+
+    def status(self):
+        with self.cond:
+            return {"total": len(self.jobs), "done": len(self.results), "pending": len(self.pending),
+                    "running": {str(i): w for i, (w, _, _) in self.leases.items()}}
+
+    def write_report(self):
+        goals = [self.results[i] for i in sorted(self.results)]
+        return write_suite_report(self.suite_dir, self.start_ts, goals), goals
+
+def _handler(coord, token):
+    class Handler(BaseHTTPRequestHandler):
+        def _authorized(self):
+            given = self.headers.get("Authorization") or ""
+            if hmac.compare_digest(given.encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+                return True
+            self._send(401, {"error": "missing or wrong SHARD_TOKEN"})
+            return False
+
+        def _send(self, code, obj=None):
+            body = json.dumps(obj or {}).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if not self._authorized():
+                return
+            url = urllib.parse.urlparse(self.path)
+            q = urllib.parse.parse_qs(url.query)
+            if url.path == "/next":
+                self._send(200, coord.next(q.get("worker", [self.client_address[0]])[0]))
+            elif url.path == "/status":
+                self._send(200, coord.status())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if not self._authorized():
+                return
+            url = urllib.parse.urlparse(self.path)
+            q = urllib.parse.parse_qs(url.query)
+            try:
+                idx = int(q["index"][0])
+                if url.path != "/result" or idx not in coord.jobs:
+                    return self._send(404, {"error": "unknown result"})
+                payload = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                rec = coord.complete(idx, payload, q.get("lease", [None])[0])
+                if rec is None:
+                    print(f"[WARN] ignored result for goal {idx} from {q.get('worker', ['?'])[0]}: lease expired or already reported")
+                    return self._send(409, {"error": "lease expired or already reported"})
+                print(f"[{str(rec.get('status')).upper()}] {rec.get('name')} <- {q.get('worker', ['?'])[0]}")
+                self._send(200, {"ok": True})
+            except Exception as e:
+                self._send(400, {"error": f"{type(e).__name__}: {e}"})
+
+        def log_message(self, fmt, *args):
+            pass  # keep the console for goal results
+    return Handler
+
+def serve(paths, host="127.0.0.1", port=8765, history=None, token=None):
+    """Run the coordinator until every goal has a result; returns (suite_dir, records)."""
+    suite_dir = os.path.join("runs", f"suite_{int(time.time())}")
+    os.makedirs(suite_dir, exist_ok=True)
+    coord = Coordinator(paths, suite_dir, history=history)
+    token = token or os.getenv("SHARD_TOKEN")
+    generated = not token
+    token = token or secrets.token_urlsafe(24)
+    server = ThreadingHTTPServer((host, int(port)), _handler(coord, token))
+    t = threading.Thread(target=server.serve_forever, name="shard-coordinator", daemon=True)
+    t.start()
+    print(f"Coordinator on http://{host}:{port} serving {len(coord.jobs)} goals; suite dir {suite_dir}")
+    if generated:
+        print(f"Workers need SHARD_TOKEN={token}")
+    try:
+        with coord.cond:
+            while not coord.finished():
+                coord.cond.wait(timeout=_POLL)
+    finally:
+        # let workers polling /next see {"done": true} before the server goes away
+        time.sleep(min(_POLL, 2) if coord.finished() else 0)
+        server.shutdown()
+        server.server_close()
+    _, goals = coord.write_report()
+    return suite_dir, goals
+
+def _zip_dir(out_dir, rec):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("record.json", json.dumps(rec, ensure_ascii=False))
+        if out_dir and os.path.isdir(out_dir):
+            for dirpath, _, files in os.walk(out_dir):
+                for fn in files:
+                    full = os.path.join(dirpath, fn)
+                    zf.write(full, os.path.relpath(full, out_dir))
+    return buf.getvalue()
+
+def _request(url, token, data=None, timeout=60):
+    headers = {"Authorization": f"Bearer {token}"}
+    if data is not None:
+        headers["Content-Type"] = "application/zip"
+    req = urllib.request.Request(url, data=data, method="POST" if data is not None else "GET", headers=headers)
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read().decode("utf-8") or "{}")
+
+def _materialize(goal_dir, job):
+    """Write the job's goal (and setup goal) under goal_dir/<index>/; returns the goal's path.
+    The goal sits deep enough that a `../` setup path still lands inside that dir."""
+    root = os.path.join(goal_dir, f"{job['index']:03d}")
+    setup = job.get("setup")
+    rel = os.path.normpath(setup["rel"]) if setup else ""
+    up = len([part for part in rel.split(os.sep) if part == ".."])
+    home = os.path.join(root, *(["_"] * up))
+    os.makedirs(home, exist_ok=True)
+    load_path = os.path.join(home, os.path.basename(job["path"]))
+    with open(load_path, "w", encoding="utf-8") as f:
+        f.write(job["text"])
+    if setup:
+        dest = os.path.realpath(os.path.join(home, rel))
+        if not dest.startswith(os.path.realpath(root) + os.sep):
+            raise ValueError(f"setup path escapes the job dir: {setup['rel']}")
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with open(dest, "w", encoding="utf-8") as f:
+            f.write(setup["text"])
+    return load_path
+
+def work(coordinator, workers=1, headless=True, token=None, **run_opts):
+    """Pull goals from `coordinator` with `workers` local browsers until the queue is done."""
+    from .suite import _start_workers
+    token = token or os.getenv("SHARD_TOKEN")
+    if not token:
+        raise RuntimeError("SHARD_TOKEN is required to talk to the coordinator (printed by it when unset there)")
+    base = coordinator.rstrip("/")
+    name = f"{socket.gethostname()}-{os.getpid()}"
+    suite_dir = os.path.join("runs", f"shard_{int(time.time())}")
+    goal_dir = os.path.join(suite_dir, "_goals")
+    os.makedirs(goal_dir, exist_ok=True)
+    leases = {}  # goal index -> lease id of the job being run
+
+    def next_job():
+        while True:
+            try:
+                r = _request(f"{base}/next?worker={urllib.parse.quote(name)}", token)
+            except urllib.error.HTTPError as e:
+                if e.code == 401:
+                    print("[ERROR] coordinator rejected SHARD_TOKEN")
+                return None
+            except Exception:
+                return None  # coordinator gone: suite finished or aborted
+            if r.get("job"):
+                job = r["job"]
+                leases[job["index"]] = job.get("lease") or ""
+                return job["index"], job["path"], _materialize(goal_dir, job)
+            if r.get("done"):
+                return None
+            time.sleep(float(r.get("wait") or _POLL))
+
+    def done(rec, out_dir):
+        for attempt in range(3):
+            try:
+                _request(f"{base}/result?index={rec['index']}&lease={leases.get(rec['index'], '')}"
+                         f"&worker={urllib.parse.quote(name)}", token, _zip_dir(out_dir, rec), timeout=300)
+                return
+            except urllib.error.HTTPError as e:
+                if e.code == 409:
+                    print(f"[WARN] coordinator ignored result for goal {rec['index']}: lease expired or already reported")
+                    return
+                if attempt == 2:
+                    print(f"[WARN] could not upload result for goal {rec['index']}: {e}")
+                time.sleep(2 ** attempt)
+            except Exception:
+                if attempt == 2:
+                    print(f"[WARN] could not upload result for goal {rec['index']}: {traceback.format_exc(limit=1)}")
+                time.sleep(2 ** attempt)
+
+    _start_workers(max(1, int(workers or 1)), next_job, done, headless, suite_dir, run_opts)
+    return suite_dir
@@ -0,0 +1,117 @@
+import weakref
+from .digest import dom_digest, dom_digest_async
+
+# ---- per-step page snapshot ----
+# The page digest (DOM + accessibility-style element list, same-origin frames inlined)
+# is captured once and shared by the planner and the oracle, and healer hits are
+# memoized, until the page changes. An init script keeps a per-document mutation counter
+# (also bumped by input/change events and by same-origin child frames), so checking
+# whether a digest or a hit is still current is one tiny evaluate instead of a
+# re-serialization or a re-resolve. Hits are checked against the version of the frame
+# they were resolved in, so async renders the executor did not cause also drop them.
+# The executor also invalidates the snapshot after every action and on navigation.
+_GEN_JS = r"""
+(() => {
+  if (window.__pwuDom) return;
+  const st = window.__pwuDom = {doc: Math.random().toString(36).slice(2), gen: 0};
+  const bump = () => {
+    st.gen++;
+    try { if (window !== window.top && window.top.__pwuDom) window.top.__pwuDom.gen++; } catch (e) { /* cross-origin */ }
+  };
+  new MutationObserver(bump).observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+  document.addEventListener('input', bump, true);
+  document.addEventListener('change', bump, true);
+})();
+"""
+_VERSION_JS = "() => window.__pwuDom ? [window.__pwuDom.doc, window.__pwuDom.gen, location.href] : null"
+
+def install(context):
+    try:
+        context.add_init_script(_GEN_JS)
+        return True
+    except Exception:
+        return False
+
+async def install_async(context):
+    try:
+        await context.add_init_script(_GEN_JS)
+        return True
+    except Exception:
+        return False
+
+class PageSnapshot:
+    """Lazily captured view of one page, reused while its DOM version is unchanged."""
+
+    def __init__(self, page):
+        self._page = weakref.ref(page)  # _SNAPSHOTS values must not keep their page alive
+        self._version = None
+        self._digest = None
+        self._hits = {}   # key -> (scope version, healer resolution info); hits only
+        self._pins = {}   # id(locator) -> (locator, {selector, frame}) for locators handed out
+
+    @property
+    def page(self):
+        return self._page()
+
+    def invalidate(self):
+        self._version = None
+        self._digest = None
+        self._hits.clear()
+        self._pins.clear()
+
+    def _current(self, version):
+        if version is None or version != self._version:
+            self.invalidate()
+            self._version = version
+            return False
+        return self._digest is not None
+
+    def digest(self):
+        try:
+            version = self.page.evaluate(_VERSION_JS)
+        except Exception:
+            version = None
+        if not self._current(version):
+            self._digest = dom_digest(self.page)
+        return self._digest
+
+    async def digest_async(self):
+        try:
+            version = await self.page.evaluate(_VERSION_JS)
+        except Exception:
+            version = None
+        if not self._current(version):
+            self._digest = await dom_digest_async(self.page)
+        return self._digest
+
+    def recall(self, key):
+        """(scope version, info) of a remembered hit; the resolver checks the version
+        in the same evaluate that would resolve the hint again (core.resolver)."""
+        return self._hits.get(key)
+
+    def remember(self, key, value, version):
+        if version is not None:
+            self._hits[key] = (version, value)
+
+    def pin(self, loc, selector, frame=None):
+        """Note the unique selector a healer/replay locator was built from, so the
+        replay script can record it without another evaluate (core.replay.describe)."""
+        if loc is not None and selector:
+            self._pins[id(loc)] = (loc, {"selector": selector, "frame": frame})
+
+    def pin_of(self, loc):
+        hit = self._pins.get(id(loc))
+        return hit[1] if hit is not None and hit[0] is loc else None
+
+_SNAPSHOTS = weakref.WeakKeyDictionary()
+
+def snapshot_for(page):
+    """The page's shared snapshot; invalidated on main-frame navigation."""
+    snap = _SNAPSHOTS.get(page)
+    if snap is None:
+        snap = _SNAPSHOTS[page] = PageSnapshot(page)
+        try:
+            page.on("framenavigated", lambda fr: snap.invalidate() if fr.parent_frame is None else None)
+        except Exception:
+            pass
+    return snap
@@ -0,0 +1,332 @@
+import os, re, json, time, asyncio, traceback
+from contextlib import contextmanager, asynccontextmanager
+from .eventlog import EventLog
+from .planner import forget_plan, CACHE_ONLY
+from .util import flush_aliases
+from .healstats import flush_stats
+from .noise import flush_rules
+from .waits import FAST
+from .replay import load_script, save_script, script_path
+from . import capture as cap
+from . import har as hm
+from . import metrics
+from .phases import start as start_phases, finish as finish_phases, step_totals
+
+# ---- step logic shared by the sync and async engines ----
+# core.executor and core.async_executor only differ in how they await Playwright.
+# Everything that does not touch the page lives here: action validation, plan-ahead
+# bookkeeping, step/assertion records, metrics and the per-goal setup and teardown.
+
+_ALLOWED_ACTIONS = {
+    "navigate","click","fill","press","wait_for","wait_for_selector",
+    "assert_text","assert_url_contains","select","combo_select",
+    "date_set","file_upload","hover","scroll_into_view","drag_and_drop"
+}
+# actions that leave the page as it was; the step's snapshot stays valid after them
+_READ_ONLY = {"wait_for","wait_for_selector","assert_text","assert_url_contains"}
+# actions whose target must resolve on the live page before a pre-planned step is trusted
+_TARGETED = {"click","fill","select","hover","scroll_into_view","assert_text","drag_and_drop"}
+
+# navigate targets that are URLs (not frame hints like "iframe" / "top-level document")
+_URL_RX = re.compile(r"^(https?://|file://|about:|data:|/|[a-z0-9.-]+\.[a-z]{2,})", re.I)
+# wait_for_selector hints that look like CSS rather than visible text
+_CSS_RX = re.compile(r"^[a-z0-9_\-\.#\[\]=:>'\"\s]+$", re.I)
+# datepicker click hints: "March 2026" navigates, "15" / "15 March 2026" picks a day
+_MONTH_RX = re.compile(r"^(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{4}$", re.I)
+_DAY_RX = re.compile(r"^(\d{1,2})(\s+[A-Za-z]+\s+\d{4})?$")
+_DATEPICKERS = (".ui-datepicker:visible", ".ui-datepicker-div", ".datepick")
+_CAL_NEXT = (".ui-datepicker-next", "button[aria-label*='Next' i]", "button:has-text('›')")
+_CAL_PREV = (".ui-datepicker-prev", "button[aria-label*='Prev' i]", "button:has-text('‹')")
+# element around a clicked label/text that holds the real checkbox/radio input
+_CHOICE_CONTAINER = "xpath=ancestor-or-self::*[self::label or self::div or self::section][1]"
+
+def _safe_filename(prefix, idx):
+    return f"{prefix}_{idx:03d}.png"
+
+def _mklog(out_dir):
+    """Buffered JSON-lines run log (core.eventlog); call .close() to flush."""
+    return EventLog(os.path.join(out_dir, "events.jsonl"))
+
+def _safe(s: str, limit: int = 800):
+    s = str(s).replace("\r", "").replace("\x00", "")
+    return s if len(s) <= limit else s[:limit] + "…"
+
+def is_url(dest):
+    return bool(_URL_RX.match(dest or ""))
+
+def radio_token(hint):
+    """Last-resort radio value for gender-style hints ("male"/"female")."""
+    hl = (hint or "").lower()
+    return "male" if "male" in hl else ("female" if "female" in hl else None)
+
+def skip_reason(atype, target, value):
+    """Why a planned action cannot run, or None."""
+    if not atype:
+        return "missing action type"
+    if atype not in _ALLOWED_ACTIONS:
+        return f"unknown action type: {atype}"
+    if atype not in {"press","wait_for"} and not target and not value:
+        return "empty target/value"
+    return None
+
+def with_check_click(desc, actions, log, i):
+    """Safeguard: if the step asks to "check" but no click is planned, inject a click."""
+    if "check" not in (desc or "").lower():
+        return actions
+    if any((a.get("type") or "").lower() == "click" for a in actions):
+        return actions
+    m = re.search(r"'([^']+)'|\"([^\"]+)\"", desc or "")
+    label = (m.group(1) or m.group(2)) if m else "privacy"
+    log(f"PLAN {i} UPDATED: injected click for check -> {label}")
+    return ([{"type":"click","target":label}] + actions)[:10]
+
+# ---- plan-ahead ----
+def plan_window(steps, i, plan_ahead):
+    return [s["description"] for s in steps[i-1:i-1+plan_ahead]]
+
+def stash_plans(plans, i, pending, log):
+    """Keep look-ahead plans for later steps in `pending`; returns step i's plan."""
+    for k, later in enumerate(plans[1:], start=i+1):
+        if later:
+            pending[k] = later
+    log(f"PLAN-AHEAD {i}-{i+len(plans)-1}: {sum(1 for p in plans if p)} planned")
+    return plans[0]
+
+def first_target(actions):
+    """(type, hint) of the first element-targeting action, or None.
+    Only that one is revalidated: later targets often appear only after earlier
+    actions run (e.g. a form revealed by a click).
+    """
+    for a in actions:
+        atype = (a.get("type") or "").strip()
+        if atype in _TARGETED:
+            target = (a.get("target") or "").strip()
+            return atype, ((target or a.get("value") or "") if atype == "click" else target)
+    return None
+
+# ---- per-step bookkeeping ----
+class Step:
+    """Notes, executed actions, metrics and the report record of one goal step."""
+    def __init__(self, i, desc):
+        self.index, self.desc = i, desc
+        self.started = time.time()
+        self.status, self.error, self.notes, self.screenshot = "pass", None, None, None
+        self.html = None        # digest the step was planned from (plan cache key)
+        self.done = []          # executed actions with the selectors they used
+        self.running = "plan"   # action type on the metrics when the step fails
+
+    def planned(self, actions, replayed, log):
+        text = json.dumps(actions, ensure_ascii=False)
+        log(f"{'REPLAY' if replayed else 'PLAN'} {self.index}: {text}")
+        self.notes = f"Replayed: {text}" if replayed else f"AI plan: {text}"
+
+    def begin(self, act, log):
+        """(type, target, value, resolved) for a planned action, or None to skip it."""
+        atype = (act.get("type") or "").strip()
+        target = (act.get("target") or "").strip()
+        value = act.get("value")
+        log(f"EXEC {self.index}: type={atype} target={target} value={value}")
+        why = skip_reason(atype, target, value)
+        if why:
+            log(f"SKIP {self.index}: {why}")
+            return None
+        self.running = atype
+        return atype, target, value, {"type": atype, "target": target, "value": value}
+
+    def ran(self, atype, resolved, err, snap, log):
+        metrics.inc("actions_total", action=atype)
+        if atype not in _READ_ONLY:
+            snap.invalidate()
+        self.done.append(resolved)
+        if err:
+            log(f"WARN {self.index}: {_safe(err)}")
+            self.notes = (self.notes + "\n" + err) if self.notes else err
+
+    def fail(self, e, base_url, log):
+        """Call from the except block (keeps the traceback)."""
+        self.status = "fail"
+        metrics.inc("action_failures_total", action=self.running)
+        self.error = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+        log(f"FAIL {self.index}: {_safe(self.error)}")
+        if self.html is not None and forget_plan(self.html, self.desc, base_url):
+            log(f"PLAN {self.index}: cached plan invalidated")
+
+    def end(self, out_dir):
+        """Books the step duration; returns (step record, executed entry for the replay script)."""
+        elapsed = time.time() - self.started
+        metrics.observe("step_seconds", elapsed, status=self.status)
+        return {
+            "index": self.index,
+            "description": self.desc,
+            "status": self.status,
+            "error": self.error,
+            "screenshot": os.path.relpath(self.screenshot, out_dir) if self.screenshot else None,
+            "elapsed_ms": int(elapsed*1000),
+            "phases": step_totals(self.index),
+            "notes": self.notes
+        }, {"index": self.index, "description": self.desc, "actions": self.done}
+
+# ---- assertions ----
+class Verdicts:
+    """Assertion verdicts of a goal: compiled claims checked on the live page together,
+    the rest judged by the LLM oracle on one shared digest."""
+    def __init__(self, assertions):
+        self.assertions = assertions
+        self.verdicts, self.elapsed, self.fuzzy = {}, {}, []
+        self.started = time.time()
+
+    def checked(self, verdicts, log):
+        """Takes the compiled verdicts; returns the claims left for the oracle."""
+        self.verdicts = dict(verdicts)
+        self.elapsed = dict.fromkeys(self.verdicts, int((time.time()-self.started)*1000 / max(1, len(self.verdicts))))
+        self.fuzzy = [j for j in range(1, len(self.assertions)+1) if j not in self.verdicts]
+        log(f"ASSERT {len(self.verdicts)}/{len(self.assertions)} checked on the page, {len(self.fuzzy)} to the oracle")
+        self.started = time.time()
+        return [self.assertions[j-1] for j in self.fuzzy]
+
+    def judged(self, judged):
+        for j, v in zip(self.fuzzy, judged):
+            self.verdicts[j] = v
+            self.elapsed[j] = int((time.time()-self.started)*1000 / len(self.fuzzy))
+
+    def offline(self, log):
+        """HAR replay makes no LLM calls: claims that did not compile fail with a reason."""
+        log(f"ASSERT {len(self.fuzzy)} free-form assertion(s) not judged: HAR replay does not call the oracle")
+        self.judged([(False, "FAIL: not checkable under --har replay (the oracle needs the LLM); "
+                             "rephrase it in a compiled shape (see Goal file format) or run without --har replay")]
+                    * len(self.fuzzy))
+
+    def judge_failed(self, e):
+        self.judged([(False, f"{type(e).__name__}: {e}")] * len(self.fuzzy))
+
+    def records(self):
+        out = []
+        for j, text in enumerate(self.assertions, start=1):
+            passed, explain = self.verdicts[j]
+            out.append({
+                "index": j,
+                "text": text,
+                "passed": bool(passed),
+                "explanation": explain,
+                "elapsed_ms": self.elapsed[j]
+            })
+        return out
+
+# ---- goal setup and teardown ----
+def _goal_outcome(step_records, assertion_records):
+    green = all(r["status"] == "pass" for r in step_records) and all(r["passed"] for r in assertion_records)
+    return "pass" if green else "fail"
+
+def _save_state(state, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def _write_phases(out_dir, phases, log):
+    """Phase totals and spans of the run (core.phases) -> out_dir/phases.json."""
+    totals = phases.totals()
+    log(f"PHASES {json.dumps(totals)}")
+    try:
+        with open(os.path.join(out_dir, "phases.json"), "w", encoding="utf-8") as f:
+            json.dump({"phases": totals, "spans": phases.spans}, f)
+    except Exception:
+        pass
+
+def goal_dir(name, out_dir=None):
+    if out_dir is None:
+        out_dir = os.path.join("runs", f"{name.replace(' ','_')}_{int(time.time())}")
+    os.makedirs(out_dir, exist_ok=True)
+    return out_dir
+
+def _goal_enter(fast, har):
+    return {"fast": FAST.set(bool(fast)) if fast is not None else None,
+            "offline": CACHE_ONLY.set(True) if har == "replay" else None,
+            "phases": start_phases(), "goal": {"outcome": "error"}, "t0": time.perf_counter()}
+
+def _goal_flush(out_dir, log, scope):
+    """End-of-goal I/O: learned stores, metrics, phases.json and the event log."""
+    flush_aliases()
+    flush_stats()
+    flush_rules()
+    metrics.flush_metrics()
+    _write_phases(out_dir, scope["phases"][0], log)
+    log.close()
+
+def _goal_exit(scope):
+    outcome = scope["goal"]["outcome"]
+    metrics.inc("goals_total", status=outcome)
+    metrics.observe("goal_seconds", time.perf_counter() - scope["t0"], status=outcome)
+
+def _goal_reset(scope):
+    finish_phases(scope["phases"][1])
+    if scope["fast"] is not None:
+        FAST.reset(scope["fast"])
+    if scope["offline"] is not None:
+        CACHE_ONLY.reset(scope["offline"])
+
+@contextmanager
+def goal_scope(out_dir, log, fast=None, har=None):
+    """Per-goal context: fast mode, cache-only planning under HAR replay and the phase
+    collector. On exit books goals_total/goal_seconds, flushes the learned stores and
+    metrics, writes phases.json and closes the log. Set goal["outcome"] when done.
+    """
+    scope = _goal_enter(fast, har)
+    try:
+        yield scope["goal"]
+    finally:
+        _goal_exit(scope)
+        try:
+            _goal_flush(out_dir, log, scope)
+        finally:
+            _goal_reset(scope)
+
+@asynccontextmanager
+async def goal_scope_async(out_dir, log, fast=None, har=None):
+    """goal_scope for the async engine: the end-of-goal SQLite and file writes run in a
+    worker thread so they do not stall the other goals on the event loop."""
+    scope = _goal_enter(fast, har)
+    try:
+        yield scope["goal"]
+    finally:
+        _goal_exit(scope)
+        try:
+            await asyncio.to_thread(_goal_flush, out_dir, log, scope)
+        finally:
+            _goal_reset(scope)
+
+def context_options(pol, out_dir, har, storage_state, headless, log):
+    """browser.new_context kwargs. Headed runs inherit the OS window size (viewport=None);
+    headless keeps a fixed viewport for deterministic layout."""
+    opts = cap.context_options(pol, out_dir)
+    opts.update(hm.context_options(har, out_dir))
+    if storage_state:
+        opts["storage_state"] = storage_state
+        log(f"STATE storage_state <- {storage_state}")
+    opts["viewport"] = None if not headless else {"width":1280, "height":800}
+    return opts
+
+def watch_page(page, log):
+    """Console/request/response logging and default timeouts (sync calls in both APIs)."""
+    page.on("console", lambda m: log(f"CONSOLE[{m.type}] {m.text}"))
+    page.on("request", lambda r: log(f"REQ {r.method} {r.url}", url=r.url, resource_type=r.resource_type))
+    page.on("response", lambda r: log(f"RES {r.status} {r.url}", url=r.url, resource_type=r.request.resource_type))
+    page.set_default_timeout(10_000)
+    page.set_default_navigation_timeout(20_000)
+
+def replay_script(name, replay, log):
+    script = load_script(name) if replay else {}
+    if replay:
+        log(f"REPLAY script: {len(script)} steps from {script_path(name)}" if script else "REPLAY no script; planning every step")
+    return script
+
+def write_scripts(out_dir, name, url, executed, green, log):
+    """The executed actions -> out_dir/replay.json; a green run also refreshes the goal's script."""
+    try:
+        save_script(os.path.join(out_dir, "replay.json"), name, url, executed)
+        if green:
+            save_script(script_path(name), name, url, executed)
+            log(f"REPLAY script saved: {script_path(name)}")
+    except Exception as e:
+        log(f"WARN replay script not written: {_safe(e)}")
@@ -0,0 +1,184 @@
+import os, time, threading, queue, traceback, asyncio
+from playwright.sync_api import sync_playwright
+from .executor import run_goal, _launch_browser
+from .reporter import write_report, write_suite_report
+from .util import load_goal_spec
+from .schedule import order, lpt_bins, record_goal, _ENABLED as _SCHEDULED
+from .capture import for_goal
+from .session import ensure_state
+
+def _slug(name):
+    return name.replace(" ", "_")
+
+def _summarize(rec, suite_dir, report_path, srec, arec):
+    failed_steps = sum(1 for s in srec if s["status"] != "pass")
+    failed_asserts = sum(1 for a in arec if not a["passed"])
+    rec.update({
+        "status": "pass" if not (failed_steps or failed_asserts) else "fail",
+        "report": os.path.relpath(report_path, suite_dir),
+        "steps": len(srec),
+        "failed_steps": failed_steps,
+        "assertions": len(arec),
+        "failed_assertions": failed_asserts,
+    })
+    return rec
+
+def _new_record(idx, path):
+    return {"index": idx, "goal": path, "name": os.path.basename(path), "status": "error",
+            "report": None, "steps": 0, "failed_steps": 0, "assertions": 0, "failed_assertions": 0,
+            "error": None}
+
+def _goal_name(path):
+    try:
+        return load_goal_spec(path)["name"]
+    except Exception:
+        return os.path.basename(path)
+
+def _schedule(jobs, name_of):
+    """Fail-fast + longest-first order (core.schedule); workers pull from it in turn."""
+    return order(jobs, name_of=name_of)[0]
+
+def predicted_makespan(paths, workers=1):
+    """Estimated wall time (ms) of a suite run on `workers` workers.
+    Only an estimate: goals are not assigned to workers up front; each idle worker
+    takes the next goal of the shared queue, which is how lpt_bins() packs them too.
+    None with SCHEDULE=0 (file order, no history).
+    """
+    if not _SCHEDULED:
+        return None
+    names = [_goal_name(p) for p in paths]
+    _, est = order(names)
+    n = max(1, min(int(workers or 1), len(paths) or 1))
+    return lpt_bins({k: est[name] for k, name in enumerate(names)}, n)[1]
+
+def _worker(next_job, done, headless, suite_dir, run_opts):
+    """One worker = one thread owning one long-lived browser.
+    Playwright's sync API is bound to the thread that started it, so the pool is
+    a set of threads each with its own Chromium; every goal gets a fresh context.
+    `next_job()` returns (idx, path, load_path) or None when there is no more work
+    (a goal's `setup:` resolves against load_path, the local copy a shard worker runs);
+    `done(rec, out_dir)` receives each finished goal record.
+    """
+    with sync_playwright() as p:
+        browser = None
+        try:
+            while True:
+                job = next_job()
+                if job is None:
+                    return
+                idx, path, load_path = job
+                started = time.time()
+                rec = _new_record(idx, path)
+                out_dir = None
+                try:
+                    g = load_goal_spec(load_path)
+                    rec["name"] = g["name"]
+                    # (re)launch lazily so a crashed browser does not poison the rest of the queue
+                    if browser is None or not browser.is_connected():
+                        browser = _launch_browser(p, headless)
+                    state = ensure_state(g["setup"], os.path.dirname(load_path), suite_dir, browser=browser,
+                                         headless=headless, **run_opts)
+                    out_dir = os.path.join(suite_dir, f"{idx:03d}_{_slug(g['name'])}")
+                    out_dir, srec, arec = run_goal(g["name"], g["url"], g["steps"], g["assertions"],
+                                                   headless=headless, browser=browser, out_dir=out_dir,
+                                                   storage_state=state, network=g.get("network"), **for_goal(g, run_opts))
+                    report_path = write_report(out_dir, g["name"], g["url"] or "", started, srec, arec)
+                    _summarize(rec, suite_dir, report_path, srec, arec)
+                except Exception as e:
+                    rec["error"] = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+                finally:
+                    rec["elapsed_ms"] = int((time.time()-started)*1000)
+                    done(rec, out_dir)
+                    print(f"[{rec['status'].upper()}] {rec['name']} ({rec['elapsed_ms']} ms)")
+        finally:
+            if browser is not None:
+                try: browser.close()
+                except: pass
+
+def _start_workers(n, next_job, done, headless, suite_dir, run_opts):
+    threads = [
+        threading.Thread(target=_worker, args=(next_job, done, headless, suite_dir, run_opts), name=f"suite-worker-{k}", daemon=True)
+        for k in range(n)
+    ]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+def run_suite(paths, workers=1, headless=True, **run_opts):
+    """Run many goal files across `workers` long-lived browsers.
+    Extra keyword options are passed to every run_goal call.
+    Returns (suite_dir, goal_records) with records in input order.
+    """
+    start_ts = time.time()
+    suite_dir = os.path.join("runs", f"suite_{int(start_ts)}")
+    os.makedirs(suite_dir, exist_ok=True)
+
+    n = max(1, min(int(workers or 1), len(paths) or 1))
+    jobs = queue.Queue()
+    for idx, path, _ in _schedule([(idx, path, _goal_name(path)) for idx, path in enumerate(paths, start=1)],
+                                  lambda j: j[2]):
+        jobs.put((idx, path, path))
+    results = []
+    lock = threading.Lock()
+
+    def next_job():
+        try:
+            return jobs.get_nowait()
+        except queue.Empty:
+            return None
+
+    def done(rec, out_dir):
+        with lock:
+            results.append(rec)
+        record_goal(rec, out_dir, suite_dir)
+
+    _start_workers(n, next_job, done, headless, suite_dir, run_opts)
+
+    results.sort(key=lambda r: r["index"])
+    write_suite_report(suite_dir, start_ts, results)
+    return suite_dir, results
+
+def run_suite_async(paths, concurrency=4, headless=True, **run_opts):
+    """Suite mode on the asyncio engine: one event loop, one browser, `concurrency`
+    goals in flight at once. Same outputs as run_suite.
+    """
+    from .async_executor import run_goals
+    start_ts = time.time()
+    suite_dir = os.path.join("runs", f"suite_{int(start_ts)}")
+    os.makedirs(suite_dir, exist_ok=True)
+
+    results = []
+    specs = []
+    for idx, path in enumerate(paths, start=1):
+        rec = _new_record(idx, path)
+        try:
+            g = load_goal_spec(path)
+            rec["name"] = g["name"]
+            specs.append((rec, g))
+        except Exception as e:
+            rec["error"] = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+            rec["elapsed_ms"] = 0
+        results.append(rec)
+
+    specs = _schedule(specs, lambda sg: sg[1]["name"])
+    recs = {id(g): rec for rec, g in specs}
+
+    def done(g, out_dir, srec, arec, started):
+        rec = recs[id(g)]
+        try:
+            if isinstance(srec, Exception):
+                rec["error"] = f"{type(srec).__name__}: {srec}"
+                out_dir = None
+            else:
+                report_path = write_report(out_dir, g["name"], g["url"] or "", started, srec, arec)
+                _summarize(rec, suite_dir, report_path, srec, arec)
+        except Exception as e:
+            rec["error"] = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+        finally:
+            rec["elapsed_ms"] = int((time.time()-started)*1000)
+            record_goal(rec, out_dir, suite_dir)
+            print(f"[{rec['status'].upper()}] {rec['name']} ({rec['elapsed_ms']} ms)")
+
+    asyncio.run(run_goals([g for _, g in specs], concurrency=concurrency, headless=headless, out_root=suite_dir,
+                          indices=[rec["index"] for rec, _ in specs], on_done=done, **run_opts))
+    write_suite_report(suite_dir, start_ts, results)
+    return suite_dir, results
@@ -1,4 +1,4 @@
-import os
+import os, re, time, atexit, sqlite3, threading
 from urllib.parse import urlparse
 
 try:
@@ -6,8 +6,71 @@ try:
 except Exception:
     yaml = None
 
-# ---- hint alias loader ----
-_ALIASES_CACHE = {"path": None, "mtime": None, "data": {}}
+# ---- small on-disk stores ----
+def connect_db(path: str):
+    """Open a SQLite store shared by threads/processes (WAL + busy timeout)."""
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    except Exception:
+        pass
+    return conn
+
+def host_of(url: str):
+    try:
+        return urlparse(url or "").hostname or ""
+    except Exception:
+        return ""
+
+# ---- goal loader ----
+def subst(text, mapping):
+    return re.sub(r"\$\{([^}]+)\}", lambda m: str(mapping.get(m.group(1), m.group(0))), text)
+
+def load_goal_spec(path: str):
+    """Parse a goal YAML into a dict with `${var}` placeholders substituted.
+    Keys: path, name, url, steps, assertions, capture, setup, state_ttl, network.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        y = yaml.safe_load(f)
+    vars_map = y.get("vars", {})
+    steps = y["steps"]
+    for s in steps:
+        s["description"] = subst(s["description"], vars_map)
+    return {
+        "path": path,
+        "name": y.get("name", "Unnamed Goal"),
+        "url": y.get("url"),
+        "steps": steps,
+        "assertions": [subst(a, vars_map) for a in y.get("assertions", [])],
+        "capture": y.get("capture"),
+        "setup": y.get("setup"),
+        "state_ttl": y.get("state_ttl"),
+        "network": y.get("network"),
+    }
+
+def goal_files(path: str):
+    """Expand a goal file or a directory of goal YAMLs into a sorted list of paths."""
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, n) for n in os.listdir(path)
+            if n.endswith((".yaml", ".yml"))
+        )
+    return [path]
+
+# ---- hint alias store ----
+# Seed aliases live in fixtures/aliases.yaml (hand-edited, hot-reloaded by mtime).
+# Learned aliases go to an indexed SQLite table next to it (ALIASES_DB); new ones are
+# buffered in memory and written in one transaction by flush_aliases() at end of run,
+# so parallel workers never lose each other's updates and the YAML is never rewritten.
+# Lookups hit a per-host merged dict built once per host.
+_ALIASES_CACHE = {"path": None, "mtime": None, "data": {}, "checked": 0.0}
+_HOST_CACHE = {}
+_PENDING = []
+_ALIAS_LOCK = threading.RLock()
+_STAT_INTERVAL = 1.0
 
 def _read_yaml(path: str):
     if not os.path.exists(path):
@@ -21,104 +84,144 @@ def _read_yaml(path: str):
     except Exception:
         return {}
 
-def load_aliases(page_url: str):
-    """Load hint→selector aliases from fixtures/aliases.yaml or aliases.yaml.
-    Structure:
-      global: { hint: selector | [selectors] }
-      <host>: { hint: selector | [selectors] }
-    Returns a dict with lowercased hints.
-    """
-    # Reuse cache if file unchanged
+def _alias_yaml_path():
     candidate_paths = [
         os.path.join("fixtures", "aliases.yaml"),
         os.path.join("aliases.yaml"),
     ]
-    alias_path = next((p for p in candidate_paths if os.path.exists(p)), None)
-    cache_path = _ALIASES_CACHE.get("path")
-    cache_mtime = _ALIASES_CACHE.get("mtime")
+    return next((p for p in candidate_paths if os.path.exists(p)), None)
+
+def _alias_db_path():
+    return os.getenv("ALIASES_DB", os.path.join("fixtures", "aliases.sqlite"))
+
+def _alias_conn():
+    conn = connect_db(_alias_db_path())
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS aliases ("
+        " host TEXT NOT NULL, hint TEXT NOT NULL, selector TEXT NOT NULL, created REAL,"
+        " PRIMARY KEY (host, hint, selector))"
+    )
+    return conn
+
+def _refresh_yaml():
+    """Reload the YAML seed if it changed (stat at most once per _STAT_INTERVAL)."""
+    now = time.monotonic()
+    if now - _ALIASES_CACHE["checked"] < _STAT_INTERVAL and _ALIASES_CACHE["checked"]:
+        return
+    _ALIASES_CACHE["checked"] = now
+    alias_path = _alias_yaml_path()
     current_mtime = None
-    if alias_path and os.path.exists(alias_path):
+    if alias_path:
         try:
             current_mtime = os.path.getmtime(alias_path)
         except Exception:
             current_mtime = None
-    if alias_path != cache_path or (current_mtime is not None and current_mtime != cache_mtime):
+    if alias_path != _ALIASES_CACHE["path"] or current_mtime != _ALIASES_CACHE["mtime"]:
         data = _read_yaml(alias_path) if alias_path else {}
         _ALIASES_CACHE["path"] = alias_path
         _ALIASES_CACHE["mtime"] = current_mtime
         _ALIASES_CACHE["data"] = data if isinstance(data, dict) else {}
+        _HOST_CACHE.clear()
 
-    data = _ALIASES_CACHE.get("data") or {}
-    host = ""
+def _learned_for(host: str):
+    if not os.path.exists(_alias_db_path()):
+        return []
     try:
-        host = urlparse(page_url or "").hostname or ""
+        conn = _alias_conn()
+        try:
+            return conn.execute(
+                "SELECT hint, selector FROM aliases WHERE host=? ORDER BY created", (host,)
+            ).fetchall()
+        finally:
+            conn.close()
     except Exception:
-        host = ""
+        return []
 
-    def norm_map(d):
-        if not isinstance(d, dict):
-            return {}
-        return {str(k).lower(): v for k, v in d.items()}
+def _add_alias(merged: dict, hint_lc: str, selector: str):
+    existing = merged.get(hint_lc)
+    if existing is None:
+        merged[hint_lc] = selector
+    elif isinstance(existing, list):
+        if selector not in existing:
+            merged[hint_lc] = existing + [selector]
+    elif existing != selector:
+        merged[hint_lc] = [existing, selector]
 
-    global_map = norm_map(data.get("global") or data.get("default") or {})
-    host_map = norm_map(data.get(host) or {})
-    merged = {**global_map, **host_map}
-    return merged
+def load_aliases(page_url: str):
+    """Hint→selector aliases for the page's host.
+    YAML structure:
+      global: { hint: selector | [selectors] }
+      <host>: { hint: selector | [selectors] }
+    Returns a dict with lowercased hints (global, then host, then learned entries).
+    """
+    host = host_of(page_url)
+    with _ALIAS_LOCK:
+        _refresh_yaml()
+        merged = _HOST_CACHE.get(host)
+        if merged is not None:
+            return merged
+        data = _ALIASES_CACHE.get("data") or {}
+
+        def norm_map(d):
+            if not isinstance(d, dict):
+                return {}
+            return {str(k).lower(): v for k, v in d.items()}
+
+        merged = {**norm_map(data.get("global") or data.get("default") or {}), **norm_map(data.get(host) or {})}
+        for hint_lc, selector in _learned_for(host):
+            _add_alias(merged, hint_lc, selector)
+        for h, hint_lc, selector in _PENDING:
+            if h == host:
+                _add_alias(merged, hint_lc, selector)
+        _HOST_CACHE[host] = merged
+        return merged
 
 def update_aliases(page_url: str, hint: str, selector: str):
-    """Persist a learned hint→selector mapping to fixtures/aliases.yaml.
-    - Writes under host section keyed by URL hostname
-    - Keeps existing entries; avoids duplicates
-    - No-op if yaml is unavailable
+    """Record a learned hint→selector mapping for the page's host.
+    Visible to lookups in this process immediately; persisted by flush_aliases().
     """
-    if yaml is None:
-        return False
     hint_lc = (hint or "").strip().lower()
     if not hint_lc or not selector:
         return False
+    host = host_of(page_url)
+    with _ALIAS_LOCK:
+        entry = (host, hint_lc, selector)
+        if entry in _PENDING:
+            return True
+        merged = load_aliases(page_url)
+        before = merged.get(hint_lc)
+        if before == selector or (isinstance(before, list) and selector in before):
+            return True
+        _PENDING.append(entry)
+        _add_alias(merged, hint_lc, selector)
+        return True
 
-    candidate_paths = [
-        os.path.join("fixtures", "aliases.yaml"),
-        os.path.join("aliases.yaml"),
-    ]
-    alias_path = next((p for p in candidate_paths if os.path.exists(p)), None)
-    if alias_path is None:
-        # prefer fixtures/aliases.yaml
-        os.makedirs("fixtures", exist_ok=True)
-        alias_path = os.path.join("fixtures", "aliases.yaml")
-
-    data = _read_yaml(alias_path) if alias_path else {}
-    if not isinstance(data, dict):
-        data = {}
-
-    try:
-        host = urlparse(page_url or "").hostname or ""
-    except Exception:
-        host = ""
-    if host not in data or not isinstance(data.get(host), dict):
-        data[host] = {}
-
-    existing = data[host].get(hint_lc)
-    if existing is None:
-        data[host][hint_lc] = selector
-    else:
-        if isinstance(existing, list):
-            if selector not in existing:
-                existing.append(selector)
-        else:
-            if existing != selector:
-                data[host][hint_lc] = [existing, selector]
-
-    try:
-        with open(alias_path, "w", encoding="utf-8") as f:
-            yaml.safe_dump(data, f, sort_keys=True, allow_unicode=True)
-        # refresh cache
-        _ALIASES_CACHE["path"] = alias_path
+def flush_aliases():
+    """Write buffered learned aliases in a single transaction (SQLite locks the file
+    across worker processes). Returns the number of new rows."""
+    with _ALIAS_LOCK:
+        batch = list(_PENDING)
+        if not batch:
+            return 0
         try:
-            _ALIASES_CACHE["mtime"] = os.path.getmtime(alias_path)
+            conn = _alias_conn()
+            try:
+                before = conn.total_changes
+                now = time.time()
+                conn.executemany(
+                    "INSERT OR IGNORE INTO aliases(host, hint, selector, created) VALUES (?,?,?,?)",
+                    [(h, k, sel, now) for h, k, sel in batch],
+                )
+                conn.commit()
+                written = conn.total_changes - before
+            finally:
+                conn.close()
         except Exception:
-            _ALIASES_CACHE["mtime"] = None
-        _ALIASES_CACHE["data"] = data
-        return True
-    except Exception:
-        return False
+            return 0
+        del _PENDING[:len(batch)]
+        # other workers may have learned entries for these hosts meanwhile
+        for h, _, _ in batch:
+            _HOST_CACHE.pop(h, None)
+        return written
+
+atexit.register(flush_aliases)
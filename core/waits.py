@@ -0,0 +1,113 @@
+import os, contextvars
+from .phases import timed, timed_async
+
+# ---- condition-based waits ----
+# Replacements for fixed sleeps on the action hot path. Each wait returns as soon as
+# its condition holds and gives up silently after a bounded timeout, so a page that
+# never settles costs at most the cap instead of a sleep on every action.
+SETTLE_QUIET_MS = int(os.getenv("SETTLE_QUIET_MS", "50"))
+SETTLE_TIMEOUT_MS = int(os.getenv("SETTLE_TIMEOUT_MS", "1000"))
+
+# Fast mode skips cosmetic work (element highlighting). Per run via run_goal(fast=...)
+# or the --fast flag; FAST_MODE=1 sets the default.
+FAST = contextvars.ContextVar(
+    "fast_mode", default=os.getenv("FAST_MODE", "0").strip().lower() in ("1", "true", "yes", "on")
+)
+
+# resolves once the document has had no DOM mutations for `quiet` ms (capped at
+# `timeout`) and a frame has been painted
+SETTLE_JS = r"""
+([quiet, timeout]) => new Promise(resolve => {
+  let timer = null;
+  const done = () => { obs.disconnect(); clearTimeout(timer); clearTimeout(cap); requestAnimationFrame(() => resolve(true)); };
+  const obs = new MutationObserver(() => { clearTimeout(timer); timer = setTimeout(done, quiet); });
+  obs.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+  timer = setTimeout(done, quiet);
+  const cap = setTimeout(done, timeout);
+})
+"""
+
+# resolves once the element's box is unchanged across two animation frames and it has
+# no running animations/transitions (floating labels, slide-in forms)
+STABLE_JS = r"""
+(el, timeout) => new Promise(resolve => {
+  const t0 = performance.now();
+  let last = null;
+  const busy = () => (el.getAnimations ? el.getAnimations({subtree: false}) : []).some(a => a.playState === 'running');
+  const tick = () => {
+    if (!el.isConnected) return resolve(false);
+    const r = el.getBoundingClientRect();
+    const box = [r.x, r.y, r.width, r.height].join(',');
+    if (box === last && !busy()) return resolve(true);
+    if (performance.now() - t0 > timeout) return resolve(false);
+    last = box;
+    requestAnimationFrame(tick);
+  };
+  requestAnimationFrame(tick);
+})
+"""
+
+# outline the element for one painted frame (visible in video/trace), then restore
+HIGHLIGHT_JS = r"""
+e => new Promise(resolve => {
+  const old = e.style.outline;
+  e.style.outline = '3px solid magenta';
+  requestAnimationFrame(() => requestAnimationFrame(() => { e.style.outline = old; resolve(true); }));
+})
+"""
+
+def fast_mode():
+    return FAST.get()
+
+@timed("wait")
+def settle(page, quiet=None, timeout=None):
+    """Wait for DOM quiescence in `page` (a Page or Frame)."""
+    try:
+        page.evaluate(SETTLE_JS, [SETTLE_QUIET_MS if quiet is None else quiet, SETTLE_TIMEOUT_MS if timeout is None else timeout])
+    except Exception:
+        pass
+
+@timed_async("wait")
+async def settle_async(page, quiet=None, timeout=None):
+    try:
+        await page.evaluate(SETTLE_JS, [SETTLE_QUIET_MS if quiet is None else quiet, SETTLE_TIMEOUT_MS if timeout is None else timeout])
+    except Exception:
+        pass
+
+@timed("wait")
+def stable(el, timeout=None):
+    """Wait until the element stops moving/animating."""
+    try:
+        el.evaluate(STABLE_JS, SETTLE_TIMEOUT_MS if timeout is None else timeout)
+    except Exception:
+        pass
+
+@timed_async("wait")
+async def stable_async(el, timeout=None):
+    try:
+        await el.evaluate(STABLE_JS, SETTLE_TIMEOUT_MS if timeout is None else timeout)
+    except Exception:
+        pass
+
+@timed("wait")
+def text_changed(loc, before, timeout=None):
+    """Wait until `loc`'s text differs from `before` (e.g. a calendar title after Next)."""
+    try:
+        loc.page.wait_for_function(
+            "([el, before]) => !el.isConnected || (el.textContent || '').trim() !== before",
+            arg=[loc.element_handle(timeout=500), before], timeout=SETTLE_TIMEOUT_MS if timeout is None else timeout,
+        )
+        return True
+    except Exception:
+        return False
+
+@timed_async("wait")
+async def text_changed_async(loc, before, timeout=None):
+    try:
+        await loc.page.wait_for_function(
+            "([el, before]) => !el.isConnected || (el.textContent || '').trim() !== before",
+            arg=[await loc.element_handle(timeout=500), before], timeout=SETTLE_TIMEOUT_MS if timeout is None else timeout,
+        )
+        return True
+    except Exception:
+        return False
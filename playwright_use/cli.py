@@ -1,34 +1,63 @@
-import os, sys, time, yaml, re
+import os, sys, time
 from core.executor import run_goal
 from core.reporter import write_report
+from core.suite import run_suite, run_suite_async, predicted_makespan
+from core.shard import serve, work
+from core.capture import for_goal
+from core.session import ensure_state
+from core.util import load_goal_spec, goal_files
 
 
-def _subst(text, mapping):
-    return re.sub(r"\$\{([^}]+)\}", lambda m: str(mapping.get(m.group(1), m.group(0))), text)
+def _arg(flag, default=None):
+    """Value of `--flag N` or `--flag=N` from argv."""
+    for k, a in enumerate(sys.argv):
+        if a == flag and k + 1 < len(sys.argv):
+            return sys.argv[k + 1]
+        if a.startswith(flag + "="):
+            return a.split("=", 1)[1]
+    return default
 
 
-def _load_goal(path):
-    with open(path, "r", encoding="utf-8") as f:
-        y = yaml.safe_load(f)
-    name = y.get("name", "Unnamed Goal")
-    url = y.get("url")
-    steps = y["steps"]
-    assertions = y.get("assertions", [])
-    vars_map = y.get("vars", {})
-    for s in steps:
-        s["description"] = _subst(s["description"], vars_map)
-    assertions = [_subst(a, vars_map) for a in assertions]
-    return name, url, steps, assertions
-
-
-def main():
+def main(prog="playwright-use"):
     if len(sys.argv) < 2:
-        print("Usage: playwright-use goals/<file>.yaml [--headed]")
+        pad = " " * len(prog)
+        print(f"Usage: {prog} goals/<file>.yaml|goals/ [--headed] [--workers N] [--async] [--plan-ahead N] [--replay] [--fast]\n"
+              f"       {pad} [--capture off|on-failure|retain-on-failure|always|trace=..,video=..,screenshots=..] [--har record|replay]\n"
+              f"       {prog} goals/ --coordinator [--port 8765] [--bind 127.0.0.1] [--token T]\n"
+              f"       {prog} --worker http://<coordinator>:8765 [--token T] [--workers N] [--headed] [...]")
         sys.exit(1)
-    goal_file = sys.argv[1]
+    goal_path = sys.argv[1]
     headed = "--headed" in sys.argv
-    name, url, steps, assertions = _load_goal(goal_file)
+    run_opts = {"plan_ahead": int(_arg("--plan-ahead", "0")), "replay": "--replay" in sys.argv}
+    if "--fast" in sys.argv:
+        run_opts["fast"] = True
+    if _arg("--capture"):
+        run_opts["capture"] = _arg("--capture")
+    if _arg("--har"):
+        run_opts["har"] = _arg("--har")
+    if _arg("--worker"):
+        shard_dir = work(_arg("--worker"), int(_arg("--workers", "1")), headless=not headed, token=_arg("--token"), **run_opts)
+        print(f"\n✅ Worker done. Local artifacts: {shard_dir}")
+        return
+    if os.path.isdir(goal_path):
+        if "--coordinator" in sys.argv:
+            suite_dir, results = serve(goal_files(goal_path), _arg("--bind", "127.0.0.1"), int(_arg("--port", "8765")),
+                                        token=_arg("--token"))
+        else:
+            runner = run_suite_async if "--async" in sys.argv else run_suite
+            paths, workers = goal_files(goal_path), int(_arg("--workers", "1"))
+            makespan = predicted_makespan(paths, workers)
+            if makespan is not None:
+                print(f"Running {len(paths)} goals on {workers} worker(s), failed-last-time then longest first; "
+                      f"estimated makespan ~{makespan/1000:.0f}s")
+            suite_dir, results = runner(paths, workers, headless=not headed, **run_opts)
+        failed = sum(1 for r in results if r["status"] != "pass")
+        print(f"\n✅ Done. {len(results)-failed}/{len(results)} goals passed. Suite report: {os.path.join(suite_dir, 'suite.html')}")
+        return
+    g = load_goal_spec(goal_path)
     start_ts = time.time()
-    out_dir, srec, arec = run_goal(name, url, steps, assertions, headless=not headed)
-    report_path = write_report(out_dir, name, url or "", start_ts, srec, arec)
-    print(f"\n✅ Done. Report: {report_path}\nArtifacts dir: {out_dir}") 
+    state = ensure_state(g["setup"], os.path.dirname(goal_path), headless=not headed, **run_opts)
+    out_dir, srec, arec = run_goal(g["name"], g["url"], g["steps"], g["assertions"], headless=not headed,
+                                   storage_state=state, network=g.get("network"), **for_goal(g, run_opts))
+    report_path = write_report(out_dir, g["name"], g["url"] or "", start_ts, srec, arec)
+    print(f"\n✅ Done. Report: {report_path}\nArtifacts dir: {out_dir}")